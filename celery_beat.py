@@ -9,6 +9,10 @@ app = Celery("governanceplatform")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.conf.beat_schedule = {
+    "email_outbox": {
+        "task": "email_outbox",
+        "schedule": crontab(),  # every minute
+    },
     "email_reminder": {
         "task": "email_reminder",
         "schedule": crontab(minute=0),  # every hour
@@ -17,6 +21,10 @@ app.conf.beat_schedule = {
         "task": "incident_cleaning",
         "schedule": crontab(hour=20, minute=30),
     },
+    "incident_export_cleaning": {
+        "task": "incident_export_cleaning",
+        "schedule": crontab(minute=30),  # every hour
+    },
     "log_cleaning": {"task": "log_cleaning", "schedule": crontab(hour=21, minute=00)},
     "workflow_update_status": {
         "task": "workflow_update_status",
@@ -1,6 +1,9 @@
 import os
 
 from celery import Celery
+from celery.signals import task_postrun, task_prerun
+
+from governanceplatform.shared_cache import close_task_scope, open_task_scope
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "governanceplatform.settings")
 
@@ -8,3 +11,7 @@ app = Celery("governanceplatform")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks(["incidents", "governanceplatform"])
+
+# the rules read by a task are cached until its end
+task_prerun.connect(open_task_scope)
+task_postrun.connect(close_task_scope)
@@ -5,7 +5,16 @@ from django.contrib.admin import SimpleListFilter
 from django.contrib.auth.models import Group
 from django.contrib.sites.models import Site
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Count, Max, Model, Q, Value
+from django.db.models import (
+    Avg,
+    Count,
+    Max,
+    Model,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
 from django.db.models.fields import TextField
 from django.db.models.functions import Coalesce
 from django.http import Http404
@@ -53,6 +62,7 @@ from .models import (  # OperatorType,; Service,
 )
 from .permissions import set_platform_admin_permissions
 from .settings import SITE_NAME
+from .signals import force_logout_users
 
 
 # get the id of a group by name
@@ -726,28 +736,42 @@ class userRegulatorMultipleInline(userRegulatorInline):
     max_num = None
 
 
+# check if the request user can reset the 2FA or the sessions of the user
+def can_reset_user(request_user, user):
+    # conditions for regulatoradmin issue #550
+    if user_in_group(request_user, "RegulatorAdmin") and not (
+        user_in_group(user, "RegulatorAdmin") or user_in_group(user, "RegulatorUser")
+    ):
+        return False
+    # conditions for RegulatorUser issue #577
+    if user_in_group(request_user, "RegulatorUser") and (
+        user_in_group(user, "RegulatorAdmin") or user_in_group(user, "RegulatorUser")
+    ):
+        return False
+    return True
+
+
 # reset the 2FA we delete the TOTP devices
 @admin.action(description=_("Reset 2FA"))
 def reset_2FA(modeladmin, request, queryset):
     request_user = request.user
     for user in queryset:
-        # conditions for regulatoradmin issue #550
-        if user_in_group(request_user, "RegulatorAdmin") and not (
-            user_in_group(user, "RegulatorAdmin")
-            or user_in_group(user, "RegulatorUser")
-        ):
-            continue
-        # conditions for RegulatorUser issue #577
-        if user_in_group(request_user, "RegulatorUser") and (
-            user_in_group(user, "RegulatorAdmin")
-            or user_in_group(user, "RegulatorUser")
-        ):
+        if not can_reset_user(request_user, user):
             continue
         devices = devices_for_user(user)
         for device in devices:
             device.delete()
 
 
+# log out the users, all their sessions are deleted at once
+@admin.action(description=_("Log out"))
+def force_logout(modeladmin, request, queryset):
+    request_user = request.user
+    force_logout_users(
+        [user for user in queryset if can_reset_user(request_user, user)]
+    )
+
+
 class UserRegulatorsListFilter(SimpleListFilter):
     title = _("Regulators")
     parameter_name = "regulators"
@@ -941,7 +965,7 @@ class UserAdmin(admin.ModelAdmin):
             },
         ),
     ]
-    actions = [reset_2FA]
+    actions = [reset_2FA, force_logout]
     change_list_template = "admin/reset_accepted_terms.html"
 
     def get_actions(self, request):
@@ -1559,14 +1583,83 @@ for name, method in generate_display_methods(["label"]).items():
     setattr(RegulationAdmin, name, method)
 
 
+# change of a metric compared to the average of the previous runs of the script
+def get_trend(value, average):
+    if value is None or not average:
+        return "-"
+    return f"{(value / average - 1) * 100:+.0f} %"
+
+
 @admin.register(ScriptLogEntry, site=admin_site)
 class ScriptLogEntryAdmin(admin.ModelAdmin):
-    list_display = ["action_time", "action", "object_repr", "additional_info"]
+    list_display = [
+        "action_time",
+        "action",
+        "object_repr",
+        "additional_info",
+        "script_name",
+        "duration_display",
+        "duration_trend",
+        "scanned",
+        "affected",
+        "affected_trend",
+        "emails",
+        "errors",
+    ]
+    list_filter = ["script_name"]
     readonly_fields = [
         "action_time",
         "action",
         "object_id",
         "object_repr",
         "additional_info",
+        "script_name",
+        "duration",
+        "scanned",
+        "affected",
+        "emails",
+        "errors",
     ]
     search_fields = ["object_repr"]
+
+    # number of previous runs of a script used for the trends
+    trend_runs = 10
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+
+        # average of the previous runs of the script in a subquery, the filters
+        # of the list don't change the trends
+        def previous_runs_average(field):
+            previous_run_ids = (
+                ScriptLogEntry.objects.filter(
+                    script_name=OuterRef(OuterRef("script_name")),
+                    action_time__lt=OuterRef(OuterRef("action_time")),
+                )
+                .exclude(script_name="")
+                .order_by("-action_time", "-pk")
+                .values("pk")[: self.trend_runs]
+            )
+            return Subquery(
+                ScriptLogEntry.objects.filter(pk__in=previous_run_ids)
+                .values("script_name")
+                .annotate(average=Avg(field))
+                .values("average")
+            )
+
+        return queryset.annotate(
+            average_duration=previous_runs_average("duration"),
+            average_affected=previous_runs_average("affected"),
+        )
+
+    @admin.display(description=_("Duration"), ordering="duration")
+    def duration_display(self, obj):
+        return f"{obj.duration:.2f} s" if obj.duration is not None else "-"
+
+    @admin.display(description=_("Duration trend"))
+    def duration_trend(self, obj):
+        return get_trend(obj.duration, obj.average_duration)
+
+    @admin.display(description=_("Affected trend"))
+    def affected_trend(self, obj):
+        return get_trend(obj.affected, obj.average_affected)
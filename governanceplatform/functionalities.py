@@ -0,0 +1,86 @@
+import functools
+import re
+
+from django.urls import get_resolver
+
+from .settings import FUNCTIONALITY_ROUTING_CACHE_TIMEOUT
+from .shared_cache import delete_cached, get_cached
+
+FUNCTIONALITY_ROUTING_CACHE_KEY = "governanceplatform_functionality_routing"
+LITERAL_SEGMENT_PATTERN = re.compile(r"[\w.-]+")
+
+
+class FunctionalityRouting:
+    """Functionality types, with the types given to at least one regulator
+    and the types of each regulator."""
+
+    def __init__(self, types, regulator_types):
+        self.types = frozenset(types)
+        # types by regulator id
+        self.regulator_types = regulator_types
+        self.enabled_types = frozenset().union(*regulator_types.values())
+
+    def is_regulator_allowed(self, functionality_type, regulator_id):
+        return functionality_type in self.regulator_types.get(regulator_id, ())
+
+
+def load_functionality_routing():
+    from .models import Functionality, Regulator
+
+    regulator_types = {}
+    for (
+        regulator_id,
+        functionality_type,
+    ) in Regulator.functionalities.through.objects.values_list(
+        "regulator_id", "functionality__type"
+    ):
+        regulator_types.setdefault(regulator_id, set()).add(functionality_type)
+    return FunctionalityRouting(
+        Functionality.objects.values_list("type", flat=True),
+        {
+            regulator_id: frozenset(types)
+            for regulator_id, types in regulator_types.items()
+        },
+    )
+
+
+def get_functionality_routing():
+    """Return the cached FunctionalityRouting."""
+    return get_cached(
+        FUNCTIONALITY_ROUTING_CACHE_KEY,
+        load_functionality_routing,
+        FUNCTIONALITY_ROUTING_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_functionality_routing():
+    delete_cached(FUNCTIONALITY_ROUTING_CACHE_KEY)
+
+
+def list_routes(patterns, prefix=""):
+    for pattern in patterns:
+        if hasattr(pattern, "url_patterns"):
+            yield from list_routes(pattern.url_patterns, prefix + str(pattern.pattern))
+        else:
+            yield prefix + str(pattern.pattern)
+
+
+@functools.cache
+def get_url_modules(urlconf=None):
+    """Return the literal first segments of the routes of the URLconf, a
+    functionality module is served under one of them."""
+    return frozenset(
+        segment
+        for segment in (
+            route.split("/")[0]
+            for route in list_routes(get_resolver(urlconf).url_patterns)
+        )
+        if LITERAL_SEGMENT_PATTERN.fullmatch(segment)
+    )
+
+
+def get_path_module(path):
+    """Return the module of a request path, None if no route starts with its
+    first segment."""
+    segment = path.lstrip("/").split("/")[0]
+    return segment if segment in get_url_modules() else None
@@ -1,11 +1,15 @@
+import hashlib
+import re
 import secrets
+import threading
 from collections import defaultdict
 from typing import Any, Optional
 
-import bleach
 from bleach.css_sanitizer import CSSSanitizer
+from bleach.sanitizer import Cleaner
 from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
 from django.db import connection
 from django.db.models import F, Max, Q, Value
 from django.db.models.fields import TextField
@@ -28,7 +32,16 @@ from incidents.models import (
     Workflow,
 )
 
+from .identity import get_identity
 from .models import Company, User
+from .settings import MARKDOWN_HTML_CACHE_TIMEOUT
+
+MARKDOWN_HTML_CACHE_KEY = "governanceplatform_markdown_html_{}"
+EMAIL_VARIABLE_PATTERN = re.compile(r"#[A-Z_]+#")
+PROTECTED_EMAIL_VARIABLE_PATTERN = re.compile(r"EMAILVARIABLE(\d+)END")
+
+# bleach Cleaners by thread
+html_cleaners = threading.local()
 
 
 def table_exists(table_name: str) -> bool:
@@ -46,9 +59,49 @@ def user_in_group(user, group_name) -> bool:
     """Check user group"""
     if not user.is_authenticated:
         return False
+    identity = get_identity(user)
+    if identity is not None:
+        return group_name in identity.group_names
     return any(user_group.name == group_name for user_group in user.groups.all())
 
 
+def get_user_role(user) -> str:
+    """Name of the first group of the user"""
+    identity = get_identity(user)
+    if identity is not None:
+        return identity.group_names[0] if identity.group_names else ""
+    group = user.groups.first()
+    return group.name if group else ""
+
+
+def get_user_regulator(user):
+    identity = get_identity(user)
+    if identity is not None:
+        return identity.regulator
+    return user.regulators.first()
+
+
+def get_user_observer(user):
+    identity = get_identity(user)
+    if identity is not None:
+        return identity.observer
+    return user.observers.first()
+
+
+def is_user_approved_in_company(user, company_id) -> bool:
+    identity = get_identity(user)
+    if identity is not None:
+        return company_id in identity.approved_company_ids
+    return user.companyuser_set.filter(company__id=company_id, approved=True).exists()
+
+
+def get_user_sector_ids(user):
+    identity = get_identity(user)
+    if identity is not None:
+        return identity.sector_ids
+    return user.get_sectors().values_list("pk", flat=True)
+
+
 def instance_user_in_group(user_instance, group_name) -> bool:
     return any(
         user_group.name == group_name for user_group in user_instance.groups.all()
@@ -70,7 +123,7 @@ def is_observer_user(user: User) -> bool:
 def is_observer_user_viewing_all_incident(user: User) -> bool:
     if not is_observer_user(user):
         return False
-    observer = user.observers.first()
+    observer = get_user_observer(user)
     return observer is not None and observer.is_receiving_all_incident
 
 
@@ -89,7 +142,7 @@ def can_access_incident(user: User, incident: Incident, company_id=-1) -> bool:
         is_user_regulator(user)
         and Incident.objects.filter(
             pk=incident.id,
-            regulator=user.regulators.first(),
+            regulator=get_user_regulator(user),
         ).exists()
     ):
         return True
@@ -98,25 +151,25 @@ def can_access_incident(user: User, incident: Incident, company_id=-1) -> bool:
     if (
         user_in_group(user, "RegulatorUser")
         and Incident.objects.filter(
-            pk=incident.id, sector_regulation__regulator=user.regulators.first()
+            pk=incident.id, sector_regulation__regulator=get_user_regulator(user)
         ).exists()
     ):
         return incident.affected_sectors.filter(
-            id__in=user.get_sectors().all()
+            id__in=get_user_sector_ids(user)
         ).exists()
 
     # RegulatorAdmin can access only incidents from accessible regulators.
     if (
         user_in_group(user, "RegulatorAdmin")
         and Incident.objects.filter(
-            pk=incident.id, sector_regulation__regulator=user.regulators.first()
+            pk=incident.id, sector_regulation__regulator=get_user_regulator(user)
         ).exists()
     ):
         return True
     # OperatorAdmin/User can access only incidents related to selected company.
     if (
         is_user_operator(user)
-        and user.companyuser_set.filter(company__id=company_id, approved=True).exists()
+        and is_user_approved_in_company(user, company_id)
         and Incident.objects.filter(pk=incident.id, company__id=company_id).exists()
     ):
         return True
@@ -130,8 +183,8 @@ def can_access_incident(user: User, incident: Incident, company_id=-1) -> bool:
     if is_observer_user_viewing_all_incident(user):
         return True
     if is_observer_user(user):
-        incident_lists = user.observers.first().get_incidents()
-        if incident in incident_lists:
+        observer = get_user_observer(user)
+        if observer and observer.can_access_incident(incident):
             return True
 
     return False
@@ -150,7 +203,7 @@ def can_create_incident_report(user: User, incident: Incident, company_id=-1) ->
     if (
         company_id
         and incident.contact_user == user
-        and user.companyuser_set.filter(company__id=company_id, approved=True).exists()
+        and is_user_approved_in_company(user, company_id)
     ):
         return True
 
@@ -159,7 +212,7 @@ def can_create_incident_report(user: User, incident: Incident, company_id=-1) ->
         is_user_regulator(user)
         and Incident.objects.filter(
             pk=incident.id,
-            regulator=user.regulators.first(),
+            regulator=get_user_regulator(user),
         ).exists()
     ):
         return True
@@ -168,7 +221,7 @@ def can_create_incident_report(user: User, incident: Incident, company_id=-1) ->
     if (
         company_id
         and is_user_operator(user)
-        and user.companyuser_set.filter(company__id=company_id, approved=True).exists()
+        and is_user_approved_in_company(user, company_id)
         and Incident.objects.filter(pk=incident.id, company__id=company_id).exists()
     ):
         return True
@@ -190,7 +243,7 @@ def can_edit_incident_report(user: User, incident: Incident, company_id=-1) -> b
     if (
         company_id
         and incident.contact_user == user
-        and user.companyuser_set.filter(company__id=company_id, approved=True).exists()
+        and is_user_approved_in_company(user, company_id)
     ):
         return True
 
@@ -199,7 +252,7 @@ def can_edit_incident_report(user: User, incident: Incident, company_id=-1) -> b
         is_user_regulator(user)
         and Incident.objects.filter(
             pk=incident.id,
-            regulator=user.regulators.first(),
+            regulator=get_user_regulator(user),
         ).exists()
     ):
         return True
@@ -208,31 +261,29 @@ def can_edit_incident_report(user: User, incident: Incident, company_id=-1) -> b
     if (
         company_id
         and is_user_operator(user)
-        and user.companyuser_set.filter(company__id=company_id, approved=True).exists()
+        and is_user_approved_in_company(user, company_id)
         and Incident.objects.filter(pk=incident.id, company__id=company_id).exists()
     ):
         return True
 
     # if he is the regulator admin of the incident need to be link to his regulator
-    if (
-        user_in_group(user, "RegulatorAdmin")
-        and incident.sector_regulation.regulator == user.regulators.first()
-    ):
+    if user_in_group(
+        user, "RegulatorAdmin"
+    ) and incident.sector_regulation.regulator == get_user_regulator(user):
         return True
     # if he is the regulator user of the incident, he need to have the sectors
-    if (
-        user_in_group(user, "RegulatorUser")
-        and incident.sector_regulation.regulator == user.regulators.first()
-    ):
+    if user_in_group(
+        user, "RegulatorUser"
+    ) and incident.sector_regulation.regulator == get_user_regulator(user):
         return incident.affected_sectors.filter(
-            id__in=user.get_sectors().all()
+            id__in=get_user_sector_ids(user)
         ).exists()
 
     return False
 
 
 def set_creator(request: HttpRequest, obj: Any, change: bool) -> Any:
-    regulator = request.user.regulators.first()
+    regulator = get_user_regulator(request.user)
     if regulator is None:
         return obj
     if not change:
@@ -290,7 +341,7 @@ def can_change_or_delete_obj(request: HttpRequest, obj: Any, message="") -> bool
     if isinstance(obj, SectorRegulation):
         in_use = Incident.objects.filter(sector_regulation=obj).exists()
 
-    regulator = request.user.regulators.first()
+    regulator = get_user_regulator(request.user)
     if creator == regulator and not in_use:
         cache[cache_key] = True
         return True
@@ -519,14 +570,15 @@ def render_to_string_multi_languages(
     for lang_code, lang_name in settings.LANGUAGES:
         with translation.override(lang_code):
             if content and object and replace_email_variables:
+                # the variables are replaced in the cached HTML of the content
                 context["content"] = replace_email_variables(
-                    content.safe_translation_getter("content", language_code=lang_code),
+                    markdown_to_safe_html(
+                        content.safe_translation_getter(
+                            "content", language_code=lang_code
+                        )
+                    ),
                     object,
                 )
-                context["content"] = markdown(
-                    text=context["content"], output_format="html"
-                )
-                context["content"] = sanitize_html(context["content"])
             rendered = render_to_string(template_name, context)
 
             if rendered == baseline and lang_code not in settings.LANGUAGE_CODE:
@@ -543,14 +595,41 @@ def render_to_string_multi_languages(
     return "<hr>".join(parts)
 
 
-def sanitize_html(html, tags=None, attributes=None, styles=None):
+def markdown_to_safe_html(text):
     """
-    Docstring for sanitize_html with bleach
-    :param html: The HTML to sanitize
-    :param tags: allowed tags in a set []
-    :param attributes: allowed attributes in a dict {"key":["attribute1", "attribute2"]}
-    :param styles: allowed styles in a set []
+    Convert a Markdown content to sanitized HTML, cached by content.
+    The #VARIABLES# of the content are kept as they are, to be replaced in the
+    HTML by values generated by the platform (dates, identifiers, links).
     """
+    text = text or ""
+    key = MARKDOWN_HTML_CACHE_KEY.format(hashlib.sha256(text.encode()).hexdigest())
+    html = cache.get(key)
+    if html is None:
+        variables = []
+
+        # the variables are protected from the Markdown syntax (#, _)
+        def protect_variable(match):
+            variables.append(match.group(0))
+            return f"EMAILVARIABLE{len(variables) - 1}END"
+
+        protected_text = EMAIL_VARIABLE_PATTERN.sub(protect_variable, text)
+        html = sanitize_html(markdown(text=protected_text, output_format="html"))
+        html = PROTECTED_EMAIL_VARIABLE_PATTERN.sub(
+            lambda match: variables[int(match.group(1))], html
+        )
+        cache.set(key, html, MARKDOWN_HTML_CACHE_TIMEOUT)
+    return html
+
+
+def get_html_cleaner(tags=None, attributes=None, styles=None):
+    """
+    Return a bleach Cleaner, the Cleaner of the default rules is created once
+    per thread as a Cleaner can't be shared between threads.
+    """
+    is_default = tags is None and attributes is None and styles is None
+    if is_default and getattr(html_cleaners, "default", None) is not None:
+        return html_cleaners.default
+
     if tags is None:
         tags = [
             "p",
@@ -590,13 +669,33 @@ def sanitize_html(html, tags=None, attributes=None, styles=None):
         styles = ["color", "font-weight", "font-style", "text-decoration"]
     css_sanitizer = CSSSanitizer(allowed_css_properties=styles)
 
-    return bleach.clean(
-        html,
+    cleaner = Cleaner(
         tags=tags,
         attributes=attributes,
         strip=True,
         css_sanitizer=css_sanitizer,
     )
+    if is_default:
+        html_cleaners.default = cleaner
+    return cleaner
+
+
+def sanitize_html(html, tags=None, attributes=None, styles=None):
+    """
+    Docstring for sanitize_html with bleach
+    :param html: The HTML to sanitize
+    :param tags: allowed tags in a set []
+    :param attributes: allowed attributes in a dict {"key":["attribute1", "attribute2"]}
+    :param styles: allowed styles in a set []
+    """
+    return get_html_cleaner(tags, attributes, styles).clean(html)
+
+
+# name of the field used to sort a queryset by sort_queryset_by_field
+def get_sort_field_name(field):
+    if "__translations__" in field:
+        return f"sort_{field.replace('__', '_')}"
+    return field
 
 
 def sort_queryset_by_field(
@@ -615,7 +714,7 @@ def sort_queryset_by_field(
     is_string = config_field["type"] == "string"
 
     if "__translations__" in field:
-        annotated_name = f"sort_{field.replace('__', '_')}"
+        annotated_name = get_sort_field_name(field)
         qs = annotate_translated_field_from_related_models(
             qs,
             full_path=field,
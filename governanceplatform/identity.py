@@ -0,0 +1,55 @@
+from functools import cached_property
+
+# attribute of the user of the request which holds its identity context
+IDENTITY_ATTRIBUTE = "identity_context"
+
+
+class IdentityContext:
+    """Groups and entities of the user of a request, each of them is loaded
+    at most once per request, when it is first used.
+
+    The context is attached to request.user by IdentityContextMiddleware, the
+    changes made to the groups or entities of the user during the request are
+    not seen by the helpers before the next request.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def group_names(self):
+        # ordered as user.groups.first()
+        return tuple(self.user.groups.order_by("pk").values_list("name", flat=True))
+
+    @cached_property
+    def regulator(self):
+        return self.user.regulators.first()
+
+    @cached_property
+    def observer(self):
+        return self.user.observers.first()
+
+    @cached_property
+    def approved_company_ids(self):
+        return frozenset(
+            self.user.companyuser_set.filter(approved=True).values_list(
+                "company_id", flat=True
+            )
+        )
+
+    @cached_property
+    def sector_ids(self):
+        # sectors of a RegulatorUser, all the sectors for a RegulatorAdmin
+        return frozenset(self.user.get_sectors().values_list("pk", flat=True))
+
+
+def set_identity(user):
+    identity = IdentityContext(user)
+    setattr(user, IDENTITY_ATTRIBUTE, identity)
+    return identity
+
+
+def get_identity(user):
+    """Return the identity context of the user of the request, None outside
+    of a request."""
+    return getattr(user, IDENTITY_ATTRIBUTE, None)
@@ -0,0 +1,118 @@
+import functools
+import logging
+import secrets
+import time
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .metrics import current_metrics, new_metrics, save_run_metrics
+from .models import ScriptLease, ScriptLogEntry
+from .settings import SCRIPT_LEASE_TIMEOUT_IN_SECOND
+
+logger = logging.getLogger(__name__)
+
+# lease of the script running in the current context, it is handed over to
+# the celery subtasks of the script which release it when they are done
+current_lease = ContextVar("current_lease", default=None)
+
+
+def acquire_lease(name, timeout=None):
+    """Return a token if the lease of the script is acquired, None if it is
+    held by a run which has not expired."""
+    timeout = timeout or SCRIPT_LEASE_TIMEOUT_IN_SECOND
+    now = timezone.now()
+    token = secrets.token_hex(16)
+    ScriptLease.objects.get_or_create(name=name)
+    # one conditional update, only one run gets the lease
+    acquired = (
+        ScriptLease.objects.filter(name=name)
+        .filter(Q(holder="") | Q(expires_at__isnull=True) | Q(expires_at__lte=now))
+        .update(
+            holder=token,
+            expires_at=now + timedelta(seconds=timeout),
+            started_at=now,
+        )
+    )
+    return token if acquired else None
+
+
+def release_lease(name, token):
+    """Release the lease of the script and return the duration of the run."""
+    now = timezone.now()
+    lease = ScriptLease.objects.filter(name=name, holder=token).first()
+    if lease is None:
+        # expired and taken by another run
+        logger.warning("Lease of %s expired before the end of the run", name)
+        return None
+    duration = (now - lease.started_at).total_seconds() if lease.started_at else None
+    ScriptLease.objects.filter(pk=lease.pk, holder=token).update(
+        holder="", expires_at=None, finished_at=now, last_duration=duration
+    )
+    logger.info("%s done in %.3f s", name, duration or 0)
+    return duration
+
+
+def hand_over_lease():
+    """Return the lease of the running script and keep it held when the
+    script returns, the caller must release it."""
+    lease = current_lease.get()
+    if lease is not None:
+        lease["handed_over"] = True
+        return lease["name"], lease["token"]
+    return None
+
+
+def single_run(name, timeout=None, log_skipped=True, log_empty_runs=True):
+    """Decorator of the scheduled scripts: the script is skipped when a
+    previous run still holds its lease, the metrics of the run are recorded
+    when it is done (see governanceplatform.metrics)."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = acquire_lease(name, timeout)
+            if token is None:
+                logger.warning("%s skipped, the previous run is not finished", name)
+                if log_skipped:
+                    ScriptLogEntry.objects.create(
+                        object_id=None,
+                        object_repr=f"System:{name} skipped, "
+                        "the previous run is not finished",
+                        action_flag=2,
+                    )
+                return None
+
+            lease = {"name": name, "token": token, "handed_over": False}
+            metrics = new_metrics()
+            context_token = current_lease.set(lease)
+            metrics_token = current_metrics.set(metrics)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                metrics["errors"] += 1
+                save_run_metrics(
+                    name, release_lease(name, token), metrics, f"System:{name} failed"
+                )
+                raise
+            finally:
+                current_lease.reset(context_token)
+                current_metrics.reset(metrics_token)
+
+            if lease["handed_over"]:
+                # the metrics are recorded when the subtasks are done
+                logger.info(
+                    "%s dispatched in %.3f s", name, time.perf_counter() - start
+                )
+            else:
+                duration = release_lease(name, token)
+                if log_empty_runs or any(metrics.values()):
+                    save_run_metrics(name, duration, metrics)
+            return result
+
+        return wrapper
+
+    return decorator
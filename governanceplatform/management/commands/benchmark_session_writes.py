@@ -0,0 +1,96 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from governanceplatform.models import UserSession
+from governanceplatform.session_store import SessionStore
+from governanceplatform.settings import SESSION_STORE_CACHE_ALIAS
+
+
+# session written in the database at each request, as before the coalescing
+class EveryRequestSessionStore(SessionStore):
+    persist_remaining_fraction = 1
+
+
+def simulate_requests(store_class, number, interval, session_age):
+    """Return the number of writes in the database of a session requested
+    number times, every interval seconds."""
+    store = store_class()
+    store["company_in_use"] = 1
+    store.save()
+    table = UserSession._meta.db_table
+
+    with CaptureQueriesContext(connection) as context:
+        for _i in range(number):
+            time.sleep(interval)
+            session = store_class(store.session_key)
+            # as SessionExpiryMiddleware
+            session["_session_expiry"] = time.time() + session_age
+            session.modified = True
+            session.save()
+
+    return sum(
+        1
+        for query in context.captured_queries
+        if query["sql"].startswith(("UPDATE", "INSERT")) and table in query["sql"]
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the number of writes of a session in the database per request "
+        "before and after the coalescing of the writes, the sessions are rolled "
+        "back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--number",
+            type=int,
+            default=200,
+            help="number of requests",
+        )
+        parser.add_argument(
+            "-r",
+            "--requests-per-lifetime",
+            type=int,
+            default=50,
+            help="number of requests during the lifetime of a session",
+        )
+        parser.add_argument(
+            "-i",
+            "--interval",
+            type=float,
+            default=0.01,
+            help="seconds between two requests",
+        )
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        interval = options["interval"]
+        # a short lifetime to simulate the requests of a long session
+        session_age = options["requests_per_lifetime"] * interval
+        self.stdout.write(
+            f"{number} requests, {options['requests_per_lifetime']} per session "
+            f"lifetime, cache: {SESSION_STORE_CACHE_ALIAS or 'none'}"
+        )
+
+        with override_settings(SESSION_COOKIE_AGE=session_age):
+            with transaction.atomic():
+                for label, store_class in (
+                    ("legacy", EveryRequestSessionStore),
+                    ("coalesced", SessionStore),
+                ):
+                    writes = simulate_requests(
+                        store_class, number, interval, session_age
+                    )
+                    self.stdout.write(
+                        f"{label:10} {writes:5} writes "
+                        f"({writes / number:.3f} writes per request)"
+                    )
+                transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark done."))
@@ -0,0 +1,136 @@
+import logging
+from contextvars import ContextVar
+
+from .models import ScriptLogEntry
+
+logger = logging.getLogger(__name__)
+
+# counters of a run of a scheduled script
+METRIC_KEYS = ("scanned", "affected", "emails", "errors")
+
+# metrics of the script running in the current context, they are handed over
+# with the lease to the celery subtasks of the script
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+def new_metrics():
+    return dict.fromkeys(METRIC_KEYS, 0)
+
+
+def record_metrics(**counts):
+    """Add counts to the metrics of the running script, e.g.
+    record_metrics(scanned=10, affected=2)."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return
+    for key, count in counts.items():
+        metrics[key] += count
+
+
+def record_message(object_repr, action_flag=2):
+    """Write a message of the running script in the ScriptLogEntry of its run,
+    or in its own ScriptLogEntry outside a scheduled script."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return ScriptLogEntry.objects.create(
+            object_id=None, object_repr=object_repr, action_flag=action_flag
+        )
+    metrics.setdefault("messages", []).append(object_repr)
+    metrics["action_flag"] = action_flag
+    return None
+
+
+def save_run_metrics(name, duration, metrics, object_repr=None, additional_info=None):
+    """Record the metrics and the messages of a run in a ScriptLogEntry."""
+    messages = list(metrics.get("messages", []))
+    if object_repr is not None:
+        messages.append(object_repr)
+    action_flag = metrics.get("action_flag", 2)
+    metrics = {key: metrics.get(key, 0) for key in METRIC_KEYS}
+    logger.info(
+        "%s finished in %.3f s",
+        name,
+        duration or 0,
+        extra={"script": name, "duration": duration, **metrics},
+    )
+    if messages:
+        object_repr = "; ".join(messages)[
+            : ScriptLogEntry._meta.get_field("object_repr").max_length
+        ]
+    else:
+        object_repr = (
+            f"System:{name} {metrics['scanned']} scanned, "
+            f"{metrics['affected']} affected, "
+            f"{metrics['emails']} email(s), "
+            f"{metrics['errors']} error(s)"
+        )
+    return ScriptLogEntry.objects.create(
+        object_id=None,
+        object_repr=object_repr,
+        action_flag=action_flag,
+        additional_info=additional_info,
+        script_name=name,
+        duration=duration,
+        **metrics,
+    )
+
+
+# metrics of the last run of the scripts in the Prometheus text format
+PROMETHEUS_METRICS = [
+    (
+        "nisinp_script_last_run_timestamp_seconds",
+        "End of the last run of the script",
+        lambda entry: entry.action_time.timestamp(),
+    ),
+    (
+        "nisinp_script_last_run_duration_seconds",
+        "Duration of the last run of the script",
+        lambda entry: entry.duration,
+    ),
+    (
+        "nisinp_script_last_run_scanned",
+        "Rows scanned by the last run of the script",
+        lambda entry: entry.scanned,
+    ),
+    (
+        "nisinp_script_last_run_affected",
+        "Rows changed or deleted by the last run of the script",
+        lambda entry: entry.affected,
+    ),
+    (
+        "nisinp_script_last_run_emails",
+        "Emails sent by the last run of the script",
+        lambda entry: entry.emails,
+    ),
+    (
+        "nisinp_script_last_run_errors",
+        "Errors of the last run of the script",
+        lambda entry: entry.errors,
+    ),
+]
+
+
+def get_last_runs():
+    return (
+        ScriptLogEntry.objects.exclude(script_name="")
+        .order_by("script_name", "-action_time")
+        .distinct("script_name")
+    )
+
+
+def get_prometheus_metrics(last_runs):
+    lines = []
+    for metric_name, description, get_value in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {metric_name} {description}")
+        lines.append(f"# TYPE {metric_name} gauge")
+        for entry in last_runs:
+            value = get_value(entry)
+            if value is None:
+                continue
+            script_name = (
+                entry.script_name.replace("\\", "\\\\")
+                .replace('"', '\\"')
+                .replace("\n", "\\n")
+            )
+            lines.append(f'{metric_name}{{script="{script_name}"}} {value}')
+    return "\n".join(lines) + "\n"
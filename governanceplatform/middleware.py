@@ -3,18 +3,19 @@ from django.contrib import messages
 from django.contrib.auth import logout
 from django.http import Http404, JsonResponse
 from django.shortcuts import redirect
-from django.urls import resolve, reverse
+from django.urls import reverse
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 
-from governanceplatform.helpers import (
-    is_observer_user,
-    is_user_operator,
-    is_user_regulator,
-    user_in_group,
+from governanceplatform.functionalities import (
+    get_functionality_routing,
+    get_path_module,
 )
-from governanceplatform.models import Functionality
+from governanceplatform.helpers import get_user_regulator, user_in_group
+from governanceplatform.identity import set_identity
+from governanceplatform.route_policy import get_restricted_roles, get_route_policies
 from governanceplatform.settings import TERMS_ACCEPTANCE_TIME_IN_DAYS
+from governanceplatform.shared_cache import cache_scope
 from governanceplatform.views import select_company
 
 
@@ -31,6 +32,31 @@ def is_user_verified(user):
     return user.is_verified()
 
 
+class CacheScopeMiddleware:
+    """Keep the rules read during the request (see shared_cache.get_cached)
+    until its end."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with cache_scope():
+            return self.get_response(request)
+
+
+class IdentityContextMiddleware:
+    """Attach the identity context (groups, regulator, observer, companies and
+    sectors) to the user, the helpers load each of them once per request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.user.is_authenticated:
+            set_identity(request.user)
+        return self.get_response(request)
+
+
 class SessionExpiryMiddleware:
     """Middleware to check if the session has expired."""
 
@@ -102,56 +128,17 @@ class RestrictViewsMiddleware:
             if settings.DEBUG:
                 user.is_verified = lambda: True
 
-            if (
-                not is_user_verified(user)
-                and not request.path == reverse("two_factor:profile")
-                and not request.path == reverse("two_factor:setup")
-                and not request.path == reverse("two_factor:qr")
-                and not request.path == reverse("logout")
-            ):
+            path = request.path
+            policies = get_route_policies()
+            if not is_user_verified(user) and not policies["unverified"].matches(path):
                 return redirect("two_factor:profile")
 
             if user_in_group(user, "PlatformAdmin"):
-                if request.path == reverse("index") or request.path.startswith(
-                    "/incidents/"
-                ):
+                if policies["PlatformAdmin"].matches(path):
                     return redirect("admin:index")
 
-            if user_in_group(user, "IncidentUser"):
-                if (
-                    request.path.startswith("/incidents/incident/")
-                    or request.path == reverse("regulator_incidents")
-                    or request.path == reverse("export_incidents")
-                ):
-                    raise Http404()
-
-            if is_user_regulator(user) and not request.session.get(
-                "is_regulator_incidents", False
-            ):
-                if (
-                    request.path == reverse("declaration")
-                    or request.path.startswith("/incidents/delete/")
-                    or request.path == reverse("create_workflow")
-                ):
-                    raise Http404()
-
-            if is_observer_user(user):
-                if (
-                    request.path == reverse("declaration")
-                    or request.path == reverse("regulator_incidents")
-                    or request.path.startswith("/incidents/delete/")
-                    or request.path.startswith("/incidents/incident/")
-                    or request.path == reverse("create_workflow")
-                    or request.path == reverse("edit_workflow")
-                ):
-                    raise Http404()
-
-            if is_user_operator(user):
-                if (
-                    request.path.startswith("/incidents/incident/")
-                    or request.path == reverse("regulator_incidents")
-                    or request.path == reverse("export_incidents")
-                ):
+            for role in get_restricted_roles(user, request):
+                if policies[role].matches(path):
                     raise Http404()
 
         return self.get_response(request)
@@ -166,27 +153,18 @@ class TermsAcceptanceMiddleware:
         # Only check for authenticated users
         user = request.user
         if user.is_authenticated and is_user_verified(user):
-            # let the user logout and read terms
-            if request.path == reverse("logout") or request.path == reverse("terms"):
+            # let the user logout, read and accept the terms
+            if get_route_policies()["terms"].matches(request.path):
                 return self.get_response(request)
-            if not request.user.accepted_terms and not request.path == reverse(
-                "accept_terms"
-            ):
+            if not request.user.accepted_terms:
                 return redirect("accept_terms")
             # we want also to check the last checked
             if TERMS_ACCEPTANCE_TIME_IN_DAYS != 0:
-                if (
-                    request.user.accepted_terms_date is None
-                    and not request.path == reverse("accept_terms")
-                ):
+                if request.user.accepted_terms_date is None:
+                    return redirect("accept_terms")
+                dt = now().date() - request.user.accepted_terms_date.date()
+                if dt.days > TERMS_ACCEPTANCE_TIME_IN_DAYS:
                     return redirect("accept_terms")
-                if (
-                    request.user.accepted_terms_date is not None
-                    and not request.path == reverse("accept_terms")
-                ):
-                    dt = now().date() - request.user.accepted_terms_date.date()
-                    if dt.days > TERMS_ACCEPTANCE_TIME_IN_DAYS:
-                        return redirect("accept_terms")
         return self.get_response(request)
 
 
@@ -198,25 +176,22 @@ class CheckFunctionalityAccessMiddleware:
     def __call__(self, request):
         user = request.user
         if user.is_authenticated:
-            functionalities_types = Functionality.objects.filter(
-                regulator__isnull=False
-            ).values_list("type", flat=True)
-
-            functionality_path = resolve(request.path).route.split("/")[0]
-            if not Functionality.objects.filter(type=functionality_path).exists():
+            functionality_path = get_path_module(request.path)
+            if functionality_path is None:
+                return self.get_response(request)
+            routing = get_functionality_routing()
+            if functionality_path not in routing.types:
                 return self.get_response(request)
 
-            if functionality_path not in functionalities_types:
+            if functionality_path not in routing.enabled_types:
                 raise Http404()
 
             # regulator case
-            if request.user.regulators.first() is not None:
-                regulator = request.user.regulators.first()
-                regulator_functionalities = regulator.functionalities.values_list(
-                    "type", flat=True
-                )
-                if functionality_path not in regulator_functionalities:
-                    raise Http404()
+            regulator = get_user_regulator(user)
+            if regulator is not None and not routing.is_regulator_allowed(
+                functionality_path, regulator.pk
+            ):
+                raise Http404()
 
         return self.get_response(request)
 
@@ -228,14 +203,7 @@ class ForceReloginMiddleware:
 
     def __call__(self, request):
         user = request.user
-        force_relogin_paths = [
-            "/account/edit/",
-            "/account/password_change/",
-            "/account/two_factor/backup/tokens/",
-            "/account/two_factor/disable/",
-        ]
-
-        if request.path in force_relogin_paths:
+        if get_route_policies()["relogin"].matches(request.path):
             relogin_flag = request.session.get("force_relogin_done")
             if relogin_flag:
                 request.session.pop("force_relogin_done", None)
@@ -0,0 +1,70 @@
+# Generated by Django 6.0.4 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "governanceplatform",
+            "0060_alter_entitycategorytranslation_unique_together_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScriptLease",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=100, unique=True, verbose_name="Script"
+                    ),
+                ),
+                (
+                    "holder",
+                    models.CharField(
+                        blank=True, default="", max_length=64, verbose_name="Holder"
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Expiration date"
+                    ),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Last start"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Last end"
+                    ),
+                ),
+                (
+                    "last_duration",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="Last duration in seconds"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Script lease",
+                "verbose_name_plural": "Script leases",
+            },
+        ),
+    ]
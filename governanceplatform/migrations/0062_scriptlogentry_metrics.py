@@ -0,0 +1,54 @@
+# Generated by Django 6.0.4 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("governanceplatform", "0061_scriptlease"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scriptlogentry",
+            name="script_name",
+            field=models.CharField(
+                blank=True, default="", max_length=100, verbose_name="Script"
+            ),
+        ),
+        migrations.AddField(
+            model_name="scriptlogentry",
+            name="duration",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Duration (seconds)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="scriptlogentry",
+            name="scanned",
+            field=models.IntegerField(blank=True, null=True, verbose_name="Scanned"),
+        ),
+        migrations.AddField(
+            model_name="scriptlogentry",
+            name="affected",
+            field=models.IntegerField(blank=True, null=True, verbose_name="Affected"),
+        ),
+        migrations.AddField(
+            model_name="scriptlogentry",
+            name="emails",
+            field=models.IntegerField(blank=True, null=True, verbose_name="Emails"),
+        ),
+        migrations.AddField(
+            model_name="scriptlogentry",
+            name="errors",
+            field=models.IntegerField(blank=True, null=True, verbose_name="Errors"),
+        ),
+        migrations.AddIndex(
+            model_name="scriptlogentry",
+            index=models.Index(
+                fields=["script_name", "action_time"],
+                name="scriptlogentry_script_idx",
+            ),
+        ),
+    ]
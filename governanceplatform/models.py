@@ -3,6 +3,7 @@ import uuid
 from cryptography.fernet import Fernet
 from django.contrib import admin
 from django.contrib.auth.models import AbstractUser, PermissionsMixin
+from django.contrib.sessions.base_session import AbstractBaseSession
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
 from django.db import models
@@ -17,6 +18,7 @@ from incidents.models import Incident
 
 from .globals import ACTION_FLAG_CHOICES, get_functionality_choices
 from .managers import CustomUserManager
+from .observer_rules import can_observer_access_incident
 from .settings import RT_SECRET_KEY
 from .validators import validate_rt_url
 
@@ -358,8 +360,13 @@ class Observer(TranslatableModel):
                 for condition in conditions:
                     condition_q = Q()
 
+                    # one subquery by code, the operator has all the codes
                     for code in condition.get("include", []):
-                        condition_q &= Q(company__entity_categories__code=code)
+                        condition_q &= Q(
+                            company__in=Company.objects.filter(
+                                entity_categories__code=code
+                            )
+                        )
 
                     for code in condition.get("exclude", []):
                         condition_q &= ~Q(company__entity_categories__code=code)
@@ -420,9 +427,7 @@ class Observer(TranslatableModel):
     #     return combined_queryset
 
     def can_access_incident(self, incident):
-        if incident in self.get_incidents():
-            return True
-        return False
+        return can_observer_access_incident(self.pk, incident)
 
     def __str__(self):
         name_translation = self.safe_translation_getter("name", any_language=True)
@@ -799,8 +804,25 @@ class ScriptLogEntry(models.Model):
     additional_info = models.TextField(
         null=True, blank=True, verbose_name=_("Additional information")
     )
+    # metrics of a run of a scheduled script (see governanceplatform.metrics)
+    script_name = models.CharField(
+        max_length=100, blank=True, default="", verbose_name=_("Script")
+    )
+    duration = models.FloatField(
+        null=True, blank=True, verbose_name=_("Duration (seconds)")
+    )
+    scanned = models.IntegerField(null=True, blank=True, verbose_name=_("Scanned"))
+    affected = models.IntegerField(null=True, blank=True, verbose_name=_("Affected"))
+    emails = models.IntegerField(null=True, blank=True, verbose_name=_("Emails"))
+    errors = models.IntegerField(null=True, blank=True, verbose_name=_("Errors"))
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["script_name", "action_time"],
+                name="scriptlogentry_script_idx",
+            ),
+        ]
         verbose_name = _("Script execution logs")
         verbose_name_plural = _("Script execution logs")
 
@@ -810,3 +832,55 @@ class ScriptLogEntry(models.Model):
     # Define a method to return human-readable action names
     def action(self):
         return ACTION_FLAG_CHOICES.get(self.action_flag, "Unknown")
+
+
+# lease held by a scheduled script while it runs, to not run it twice at the
+# same time (see governanceplatform.leases)
+class ScriptLease(models.Model):
+    name = models.CharField(max_length=100, unique=True, verbose_name=_("Script"))
+    # token of the run which holds the lease, empty when it is free
+    holder = models.CharField(
+        max_length=64, blank=True, default="", verbose_name=_("Holder")
+    )
+    expires_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Expiration date")
+    )
+    started_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Last start")
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Last end")
+    )
+    last_duration = models.FloatField(
+        null=True, blank=True, verbose_name=_("Last duration in seconds")
+    )
+
+    class Meta:
+        verbose_name = _("Script lease")
+        verbose_name_plural = _("Script leases")
+
+    def __str__(self):
+        return self.name
+
+
+# session indexed by its user, to log out a user without decoding all the
+# sessions (see governanceplatform.session_store)
+class UserSession(AbstractBaseSession):
+    user = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="user_sessions",
+        verbose_name=_("User"),
+    )
+
+    class Meta:
+        verbose_name = _("User session")
+        verbose_name_plural = _("User sessions")
+
+    @classmethod
+    def get_session_store_class(cls):
+        from .session_store import SessionStore
+
+        return SessionStore
@@ -0,0 +1,110 @@
+from .settings import OBSERVER_RULES_CACHE_TIMEOUT
+from .shared_cache import delete_cached, get_cached
+
+OBSERVER_RULES_CACHE_KEY = "governanceplatform_observer_rules"
+
+
+class IncidentRuleCondition:
+    """A condition of ObserverRegulation.incident_rule: the operator of the
+    incident has all the included entity categories and none of the excluded
+    ones."""
+
+    __slots__ = ("include", "exclude")
+
+    def __init__(self, include, exclude):
+        self.include = frozenset(include)
+        self.exclude = frozenset(exclude)
+
+    def matches(self, entity_category_codes):
+        return self.include <= entity_category_codes and not (
+            self.exclude & entity_category_codes
+        )
+
+
+class ObserverRules:
+    """Incidents received by an observer, compiled from its ObserverRegulation."""
+
+    def __init__(self, observer_id, is_receiving_all_incident, regulations=None):
+        self.observer_id = observer_id
+        self.is_receiving_all_incident = is_receiving_all_incident
+        # conditions by regulation id, no condition gives all the incidents
+        self.regulations = regulations or {}
+
+    def matches(self, regulation_id, entity_category_codes):
+        # the incidents without workflow are not received by the observers
+        if regulation_id is None:
+            return False
+        if self.is_receiving_all_incident:
+            return True
+        if regulation_id not in self.regulations:
+            return False
+        conditions = self.regulations[regulation_id]
+        return not conditions or any(
+            condition.matches(entity_category_codes) for condition in conditions
+        )
+
+
+def load_observers_rules():
+    from .models import Observer, ObserverRegulation
+
+    observers_rules = {
+        observer_id: ObserverRules(observer_id, is_receiving_all_incident)
+        for observer_id, is_receiving_all_incident in Observer.objects.values_list(
+            "id", "is_receiving_all_incident"
+        )
+    }
+    for (
+        observer_id,
+        regulation_id,
+        incident_rule,
+    ) in ObserverRegulation.objects.values_list(
+        "observer_id", "regulation_id", "incident_rule"
+    ):
+        conditions = (incident_rule or {}).get("conditions", [])
+        observers_rules[observer_id].regulations[regulation_id] = tuple(
+            IncidentRuleCondition(
+                condition.get("include", []), condition.get("exclude", [])
+            )
+            for condition in conditions
+        )
+    return observers_rules
+
+
+def get_observers_rules():
+    """Return the cached ObserverRules of all the observers by observer id."""
+    return get_cached(
+        OBSERVER_RULES_CACHE_KEY, load_observers_rules, OBSERVER_RULES_CACHE_TIMEOUT
+    )
+
+
+def invalidate_observers_rules():
+    delete_cached(OBSERVER_RULES_CACHE_KEY)
+
+
+def get_incident_attributes(incident):
+    """Return the regulation id and the entity category codes of the operator
+    of an incident, which are matched against the rules of the observers."""
+    sector_regulation = incident.sector_regulation
+    regulation_id = sector_regulation.regulation_id if sector_regulation else None
+    if incident.company_id is None:
+        return regulation_id, frozenset()
+    return regulation_id, frozenset(
+        incident.company.entity_categories.values_list("code", flat=True)
+    )
+
+
+def get_incident_observer_ids(incident):
+    """Return the ids of the observers which receive an incident."""
+    incident_attributes = get_incident_attributes(incident)
+    return [
+        observer_id
+        for observer_id, observer_rules in get_observers_rules().items()
+        if observer_rules.matches(*incident_attributes)
+    ]
+
+
+def can_observer_access_incident(observer_id, incident):
+    observer_rules = get_observers_rules().get(observer_id)
+    if observer_rules is None:
+        return False
+    return observer_rules.matches(*get_incident_attributes(incident))
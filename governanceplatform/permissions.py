@@ -14,6 +14,7 @@ GROUP_PERMISSIONS = {
         "observerregulation": ["add", "change", "delete"],
         "entitycategory": ["add", "change", "delete"],
         "settingsdummy": ["view"],
+        "outgoingemail": ["view", "change"],
     },
     "RegulatorAdmin": {
         # Administration
@@ -0,0 +1,90 @@
+import functools
+
+from django.urls import reverse
+
+from .helpers import (
+    is_observer_user,
+    is_user_operator,
+    is_user_regulator,
+    user_in_group,
+)
+
+# routes of each policy, by URL name and by path prefix
+ROUTES = {
+    # routes reachable before the OTP verification
+    "unverified": (
+        ["two_factor:profile", "two_factor:setup", "two_factor:qr", "logout"],
+        [],
+    ),
+    # routes from which a PlatformAdmin is redirected to the admin
+    "PlatformAdmin": (["index"], ["/incidents/"]),
+    # routes forbidden to each role
+    "IncidentUser": (
+        ["regulator_incidents", "export_incidents"],
+        ["/incidents/incident/"],
+    ),
+    "Regulator": (["declaration", "create_workflow"], ["/incidents/delete/"]),
+    "Observer": (
+        [
+            "declaration",
+            "regulator_incidents",
+            "create_workflow",
+            "edit_workflow",
+        ],
+        ["/incidents/delete/", "/incidents/incident/"],
+    ),
+    "Operator": (
+        ["regulator_incidents", "export_incidents"],
+        ["/incidents/incident/"],
+    ),
+    # routes reachable before the terms are accepted
+    "terms": (["logout", "terms", "accept_terms"], []),
+    # routes which need to log in again
+    "relogin": (
+        [
+            "edit_account",
+            "password_change",
+            "two_factor:backup_tokens",
+            "two_factor:disable",
+        ],
+        [],
+    ),
+}
+
+
+class RoutePolicy:
+    """Paths of URL names and path prefixes of a policy."""
+
+    def __init__(self, paths, prefixes):
+        self.paths = frozenset(paths)
+        self.prefixes = tuple(prefixes)
+
+    def matches(self, path):
+        return path in self.paths or path.startswith(self.prefixes)
+
+
+@functools.cache
+def get_route_policies():
+    """Return the RoutePolicy of each policy of ROUTES, the URL names are
+    reversed once per process."""
+    return {
+        policy: RoutePolicy([reverse(name) for name in names], prefixes)
+        for policy, (names, prefixes) in ROUTES.items()
+    }
+
+
+def get_restricted_roles(user, request):
+    """Return the roles of the user whose forbidden routes apply."""
+    roles = []
+    if user_in_group(user, "IncidentUser"):
+        roles.append("IncidentUser")
+    # the regulators declare their own incidents in the regulator incidents
+    if is_user_regulator(user) and not request.session.get(
+        "is_regulator_incidents", False
+    ):
+        roles.append("Regulator")
+    if is_observer_user(user):
+        roles.append("Observer")
+    if is_user_operator(user):
+        roles.append("Operator")
+    return roles
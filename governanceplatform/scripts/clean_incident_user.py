@@ -6,7 +6,9 @@ from django.contrib.auth.models import Group
 from django.db import DatabaseError
 from django.db.models.functions import Now
 
-from governanceplatform.models import ScriptLogEntry, User
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_message, record_metrics
+from governanceplatform.models import User
 from governanceplatform.settings import DAY_BEFORE_DELETING_INC_USER_WITHOUT_INCIDENT
 
 logger = logging.getLogger(__name__)
@@ -17,6 +19,7 @@ logger = logging.getLogger(__name__)
 # if now > last_login + DAY_BEFORE_DELETING_INC_USER_WITHOUT_INCIDENT
 # if last_login is null we take the date_joined
 @shared_task(name="clean_incident_user")
+@single_run("clean_incident_user")
 def run(logger=logger):
     logger.info("clean_incident_user.py")
     try:
@@ -43,9 +46,8 @@ def run(logger=logger):
         deleted_number = (
             not_logged_user_to_delete_qs.count() + logged_user_to_delete_qs.count()
         )
-        ScriptLogEntry.objects.create(
-            object_id=None,
-            object_repr="System:IncidentUser script deletion "
+        record_message(
+            "System:IncidentUser script deletion "
             + str(deleted_number)
             + " user(s) deleted",
             action_flag=3,
@@ -54,5 +56,6 @@ def run(logger=logger):
         logger.error("Failed to write application log: %s", e, exc_info=True)
         raise
     logger.info("Deleting %s incident user(s) who have never logged in", deleted_number)
+    record_metrics(scanned=deleted_number, affected=deleted_number)
     not_logged_user_to_delete_qs.delete()
     logged_user_to_delete_qs.delete()
@@ -6,7 +6,9 @@ from django.contrib.auth.models import Group
 from django.db import DatabaseError
 from django.db.models.functions import Now
 
-from governanceplatform.models import ScriptLogEntry, User
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_message, record_metrics
+from governanceplatform.models import User
 from governanceplatform.settings import PASSWORD_RESET_TIMEOUT
 
 logger = logging.getLogger(__name__)
@@ -15,6 +17,7 @@ logger = logging.getLogger(__name__)
 # Script to run every hour
 # remove users who are inactive, never logged, and recently joined
 @shared_task(name="unactive_account_cleaning")
+@single_run("unactive_account_cleaning")
 def run(logger=logger):
     logger.info("running incident_cleaning.py")
     try:
@@ -30,9 +33,8 @@ def run(logger=logger):
         raise
 
     try:
-        ScriptLogEntry.objects.create(
-            object_id=None,
-            object_repr="System:Inactive user script deletion "
+        record_message(
+            "System:Inactive user script deletion "
             + str(user_to_delete_qs.count())
             + " user(s) deleted",
             action_flag=3,
@@ -41,4 +43,6 @@ def run(logger=logger):
         logger.error("Failed to write application log: %s", e, exc_info=True)
         raise
     logger.info("Deleting %s user(s)", user_to_delete_qs.count())
+    user_count = user_to_delete_qs.count()
     user_to_delete_qs.delete()
+    record_metrics(scanned=user_count, affected=user_count)
@@ -0,0 +1,157 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+
+from .settings import SESSION_PERSIST_REMAINING_FRACTION, SESSION_STORE_CACHE_ALIAS
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "governanceplatform.session_store"
+# time of the last write of the session in the database
+PERSISTED_AT_KEY = "_session_persisted_at"
+# keys rewritten at each request (see SessionExpiryMiddleware), their changes
+# alone do not write the session in the database
+VOLATILE_KEYS = ("_session_expiry", PERSISTED_AT_KEY)
+
+
+class SessionStore(DBStore):
+    """Database sessions which store the id of their user in an indexed
+    column, the row is written at login and removed at logout or by
+    clearsessions when it expires.
+
+    A session whose data did not change is only written in the database when
+    less than persist_remaining_fraction of its lifetime is left since its
+    last write, its sliding expiry is kept in the cache of
+    SESSION_STORE_CACHE_ALIAS in between. Without cache, an inactive session
+    expires between persist_remaining_fraction and 1 lifetime after the last
+    request.
+    """
+
+    cache_key_prefix = CACHE_KEY_PREFIX
+    persist_remaining_fraction = SESSION_PERSIST_REMAINING_FRACTION
+
+    def __init__(self, session_key=None):
+        self._cache = (
+            caches[SESSION_STORE_CACHE_ALIAS] if SESSION_STORE_CACHE_ALIAS else None
+        )
+        # persisted data of the loaded session, without the volatile keys
+        self._persisted_data = None
+        super().__init__(session_key)
+
+    @classmethod
+    def get_model_class(cls):
+        from .models import UserSession
+
+        return UserSession
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    @classmethod
+    def delete_cached_sessions(cls, session_keys):
+        if not SESSION_STORE_CACHE_ALIAS:
+            return
+        caches[SESSION_STORE_CACHE_ALIAS].delete_many(
+            [cls.cache_key_prefix + session_key for session_key in session_keys]
+        )
+
+    def get_persisted_data(self, data):
+        return self.serializer().dumps(
+            {key: value for key, value in data.items() if key not in VOLATILE_KEYS}
+        )
+
+    def get_cache_timeout(self):
+        # the sessions are expired after SESSION_COOKIE_AGE without request
+        return min(self.get_expiry_age(), settings.SESSION_COOKIE_AGE)
+
+    def load(self):
+        data = None
+        if self._cache is not None:
+            try:
+                data = self._cache.get(self.cache_key)
+            except Exception:
+                # read in the database when the cache is unavailable
+                logger.warning("Error loading the session from the cache")
+
+        if data is None:
+            s = self._get_session_from_db()
+            data = self.decode(s.session_data) if s else {}
+
+        self._persisted_data = self.get_persisted_data(data)
+        return data
+
+    def exists(self, session_key):
+        if self._cache is not None and session_key:
+            try:
+                if (self.cache_key_prefix + session_key) in self._cache:
+                    return True
+            except Exception:
+                logger.warning("Error reading the session in the cache")
+        return super().exists(session_key)
+
+    def is_persist_due(self, data):
+        if self._persisted_data is None or self._persisted_data != (
+            self.get_persisted_data(data)
+        ):
+            return True
+        persisted_at = data.get(PERSISTED_AT_KEY)
+        if persisted_at is None:
+            return True
+        remaining = persisted_at + settings.SESSION_COOKIE_AGE - time.time()
+        return remaining < self.persist_remaining_fraction * settings.SESSION_COOKIE_AGE
+
+    def create_model_instance(self, data):
+        obj = super().create_model_instance(data)
+        try:
+            obj.user_id = int(data.get(SESSION_KEY))
+        except (TypeError, ValueError):
+            obj.user_id = None
+        # the cached expiry is extended after the last write, the row is kept
+        # until it can not be in the cache anymore
+        obj.expire_date += timedelta(
+            seconds=(1 - self.persist_remaining_fraction) * settings.SESSION_COOKIE_AGE
+        )
+        return obj
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+
+        if not must_create and not self.is_persist_due(data):
+            if self._cache is None:
+                return
+            try:
+                self._cache.set(self.cache_key, data, self.get_cache_timeout())
+                return
+            except Exception:
+                # the expiry is kept in the database instead
+                logger.warning("Error saving the session in the cache")
+
+        data[PERSISTED_AT_KEY] = time.time()
+        super().save(must_create)
+        self._persisted_data = self.get_persisted_data(data)
+        if self._cache is not None:
+            try:
+                self._cache.set(self.cache_key, data, self.get_cache_timeout())
+            except Exception:
+                logger.warning("Error saving the session in the cache")
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self.delete_cached_sessions([session_key])
+
+    def flush(self):
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
@@ -205,6 +205,8 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django_otp.middleware.OTPMiddleware",
+    "governanceplatform.middleware.CacheScopeMiddleware",
+    "governanceplatform.middleware.IdentityContextMiddleware",
     "governanceplatform.middleware.SessionExpiryMiddleware",
     "governanceplatform.middleware.RestrictViewsMiddleware",
     "governanceplatform.middleware.TermsAcceptanceMiddleware",
@@ -427,6 +429,41 @@ IMPORT_EXPORT_ESCAPE_FORMULAE_ON_EXPORT = True
 PHONENUMBER_DEFAULT_FORMAT = "INTERNATIONAL"
 PHONENUMBER_DB_FORMAT = "INTERNATIONAL"
 
+# SESSIONS
+# the sessions are indexed by user to log out a user (see
+# governanceplatform.signals.force_logout_user)
+SESSION_ENGINE = "governanceplatform.session_store"
+
+# a session whose data did not change is written in the database when less
+# than this fraction of its lifetime is left since its last write, 1 writes
+# it at each request
+try:
+    SESSION_PERSIST_REMAINING_FRACTION = config.SESSION_PERSIST_REMAINING_FRACTION
+except AttributeError:
+    SESSION_PERSIST_REMAINING_FRACTION = 0.8
+
+# caches, e.g. a Redis cache shared by the processes for the sessions
+try:
+    CACHES = config.CACHES
+except AttributeError:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# cache which keeps the sliding expiry of the sessions between their writes
+# in the database, it must be shared by all the processes (e.g. Redis)
+try:
+    SESSION_STORE_CACHE_ALIAS = config.SESSION_STORE_CACHE_ALIAS
+except AttributeError:
+    SESSION_STORE_CACHE_ALIAS = None
+
+# cache of the rules read at each request or task (reports of the workflows,
+# incident rules of the observers, functionalities of the regulators), it
+# must be shared by all the processes (e.g. Redis) as a change clears it for
+# all of them, without it the rules are read once per request or task
+try:
+    SHARED_CACHE_ALIAS = config.SHARED_CACHE_ALIAS
+except AttributeError:
+    SHARED_CACHE_ALIAS = None
+
 # TIMEOUT
 SESSION_SAVE_EVERY_REQUEST = True  # the timeout is extended at each action
 SESSION_COOKIE_AGE = config.SESSION_COOKIE_AGE
@@ -562,6 +599,26 @@ try:
 except AttributeError:
     RT_SECRET_KEY = HASH_KEY
 
+# the RT tickets are sent by a celery job, a ticket which can't be sent is
+# retried RT_MAX_RETRIES times after RT_RETRY_DELAY_IN_SECOND, doubled at each
+# retry, the checks of the RT queues are cached RT_CACHE_TIMEOUT seconds
+try:
+    RT_REQUEST_TIMEOUT = config.RT_REQUEST_TIMEOUT
+except AttributeError:
+    RT_REQUEST_TIMEOUT = 5
+try:
+    RT_MAX_RETRIES = config.RT_MAX_RETRIES
+except AttributeError:
+    RT_MAX_RETRIES = 5
+try:
+    RT_RETRY_DELAY_IN_SECOND = config.RT_RETRY_DELAY_IN_SECOND
+except AttributeError:
+    RT_RETRY_DELAY_IN_SECOND = 30
+try:
+    RT_CACHE_TIMEOUT = config.RT_CACHE_TIMEOUT
+except AttributeError:
+    RT_CACHE_TIMEOUT = 5 * 60
+
 try:
     DAY_BEFORE_DELETING_INC_USER_WITHOUT_INCIDENT = (
         config.DAY_BEFORE_DELETING_INC_USER_WITHOUT_INCIDENT
@@ -569,6 +626,172 @@ try:
 except AttributeError:
     DAY_BEFORE_DELETING_INC_USER_WITHOUT_INCIDENT = 90
 
+# pagination of the incidents list: "page" (numbered pages) or "cursor"
+# (keyset pagination, faster for deep pages), the cursor mode is also used
+# when a cursor is given in the url
+try:
+    INCIDENTS_PAGINATION_MODE = config.INCIDENTS_PAGINATION_MODE
+except AttributeError:
+    INCIDENTS_PAGINATION_MODE = "page"
+
+# in cursor mode, use the estimation of the database planner for the total
+# number of incidents instead of a COUNT(*)
+try:
+    INCIDENTS_APPROXIMATE_COUNT = config.INCIDENTS_APPROXIMATE_COUNT
+except AttributeError:
+    INCIDENTS_APPROXIMATE_COUNT = False
+
+# seconds during which the ordered reports of a workflow are kept in the
+# shared cache, the cache is also cleared when the reports of the workflow
+# change
+try:
+    REPORT_CHAIN_CACHE_TIMEOUT = config.REPORT_CHAIN_CACHE_TIMEOUT
+except AttributeError:
+    REPORT_CHAIN_CACHE_TIMEOUT = 60 * 60
+
+# seconds during which the incident rules of the observers are kept in the
+# shared cache, the cache is also cleared when the observers or their rules
+# change
+try:
+    OBSERVER_RULES_CACHE_TIMEOUT = config.OBSERVER_RULES_CACHE_TIMEOUT
+except AttributeError:
+    OBSERVER_RULES_CACHE_TIMEOUT = 60 * 60
+
+# seconds during which the functionalities of the regulators are kept in the
+# shared cache, the cache is also cleared when the functionalities or the
+# regulators change
+try:
+    FUNCTIONALITY_ROUTING_CACHE_TIMEOUT = config.FUNCTIONALITY_ROUTING_CACHE_TIMEOUT
+except AttributeError:
+    FUNCTIONALITY_ROUTING_CACHE_TIMEOUT = 60 * 60
+
+# seconds during which the sanitized HTML of the Markdown contents of the
+# emails is kept in cache, the cache key changes with the content
+try:
+    MARKDOWN_HTML_CACHE_TIMEOUT = config.MARKDOWN_HTML_CACHE_TIMEOUT
+except AttributeError:
+    MARKDOWN_HTML_CACHE_TIMEOUT = 24 * 60 * 60
+
+# hours during which a reminder email which was not sent when it was due
+# (e.g. the workers were stopped) is still sent
+try:
+    EMAIL_REMINDER_CATCH_UP_IN_HOUR = config.EMAIL_REMINDER_CATCH_UP_IN_HOUR
+except AttributeError:
+    EMAIL_REMINDER_CATCH_UP_IN_HOUR = 24
+
+# hours during which the email of a report whose deadline was crossed is still
+# sent when it was not sent by the run following the deadline (e.g. the workers
+# were stopped)
+try:
+    OVERDUE_EMAIL_CATCH_UP_IN_HOUR = config.OVERDUE_EMAIL_CATCH_UP_IN_HOUR
+except AttributeError:
+    OVERDUE_EMAIL_CATCH_UP_IN_HOUR = 24
+
+# the hourly tasks on the ongoing incidents are split in celery subtasks of
+# MAINTENANCE_TASK_CHUNK_SIZE objects, the chunks are larger when there would
+# be more than MAINTENANCE_TASK_CONCURRENCY subtasks
+try:
+    MAINTENANCE_TASK_CHUNK_SIZE = config.MAINTENANCE_TASK_CHUNK_SIZE
+except AttributeError:
+    MAINTENANCE_TASK_CHUNK_SIZE = 200
+try:
+    MAINTENANCE_TASK_CONCURRENCY = config.MAINTENANCE_TASK_CONCURRENCY
+except AttributeError:
+    MAINTENANCE_TASK_CONCURRENCY = 8
+
+# a scheduled task is skipped while its previous run holds the lease, the lease
+# expires after this time when the worker running the task was killed
+try:
+    SCRIPT_LEASE_TIMEOUT_IN_SECOND = config.SCRIPT_LEASE_TIMEOUT_IN_SECOND
+except AttributeError:
+    SCRIPT_LEASE_TIMEOUT_IN_SECOND = 3 * 60 * 60
+
+# bearer token of the Prometheus scraper of the metrics of the scheduled
+# scripts (/metrics), the metrics are not served without token
+try:
+    METRICS_TOKEN = config.METRICS_TOKEN
+except AttributeError:
+    METRICS_TOKEN = None
+
+# the incidents and the logs past their retention time are deleted by batches
+# of RETENTION_CLEANING_BATCH_SIZE objects, a run stops after
+# RETENTION_CLEANING_TIME_BUDGET_IN_SECOND and the next run continues
+try:
+    RETENTION_CLEANING_BATCH_SIZE = config.RETENTION_CLEANING_BATCH_SIZE
+except AttributeError:
+    RETENTION_CLEANING_BATCH_SIZE = 100
+try:
+    RETENTION_CLEANING_TIME_BUDGET_IN_SECOND = (
+        config.RETENTION_CLEANING_TIME_BUDGET_IN_SECOND
+    )
+except AttributeError:
+    RETENTION_CLEANING_TIME_BUDGET_IN_SECOND = 15 * 60
+
+# the emails are sent by a celery job in batches of EMAIL_OUTBOX_BATCH_SIZE
+# over one SMTP connection, an email which can't be sent is retried after
+# EMAIL_OUTBOX_RETRY_DELAY_IN_SECOND, doubled at each attempt, and is given up
+# after EMAIL_OUTBOX_MAX_ATTEMPTS attempts
+try:
+    EMAIL_OUTBOX_BATCH_SIZE = config.EMAIL_OUTBOX_BATCH_SIZE
+except AttributeError:
+    EMAIL_OUTBOX_BATCH_SIZE = 50
+try:
+    EMAIL_OUTBOX_RETRY_DELAY_IN_SECOND = config.EMAIL_OUTBOX_RETRY_DELAY_IN_SECOND
+except AttributeError:
+    EMAIL_OUTBOX_RETRY_DELAY_IN_SECOND = 60
+try:
+    EMAIL_OUTBOX_MAX_ATTEMPTS = config.EMAIL_OUTBOX_MAX_ATTEMPTS
+except AttributeError:
+    EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+
+# a run of the email outbox holds its lease for EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND
+# at most, the emails left are sent by the next run
+try:
+    EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND = config.EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND
+except AttributeError:
+    EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND = 5 * 60
+
+# days after which the sent and the given up emails are removed from the outbox
+try:
+    EMAIL_OUTBOX_RETENTION_TIME_IN_DAY = config.EMAIL_OUTBOX_RETENTION_TIME_IN_DAY
+except AttributeError:
+    EMAIL_OUTBOX_RETENTION_TIME_IN_DAY = 30
+
+# the incidents mass exports are generated by a celery job in this directory,
+# which must not be served by the web server
+try:
+    PATH_FOR_INCIDENT_EXPORTS = config.PATH_FOR_INCIDENT_EXPORTS
+except AttributeError:
+    PATH_FOR_INCIDENT_EXPORTS = f"{os.getcwd()}/tmp/exports/"
+
+# generate the incidents mass exports in a celery job instead of the request,
+# the export modal has no download area for the jobs yet
+try:
+    INCIDENT_EXPORT_ASYNC = config.INCIDENT_EXPORT_ASYNC
+except AttributeError:
+    INCIDENT_EXPORT_ASYNC = False
+
+# seconds during which a download link of an export is valid
+try:
+    INCIDENT_EXPORT_LINK_MAX_AGE = config.INCIDENT_EXPORT_LINK_MAX_AGE
+except AttributeError:
+    INCIDENT_EXPORT_LINK_MAX_AGE = 15 * 60
+
+# hours after which the exports and their files are removed
+try:
+    INCIDENT_EXPORT_RETENTION_TIME_IN_HOUR = (
+        config.INCIDENT_EXPORT_RETENTION_TIME_IN_HOUR
+    )
+except AttributeError:
+    INCIDENT_EXPORT_RETENTION_TIME_IN_HOUR = 24
+
+# hours after which a pending or running export is considered interrupted (e.g.
+# the broker or the worker was stopped) and is marked as failed
+try:
+    INCIDENT_EXPORT_TIMEOUT_IN_HOUR = config.INCIDENT_EXPORT_TIMEOUT_IN_HOUR
+except AttributeError:
+    INCIDENT_EXPORT_TIMEOUT_IN_HOUR = 2
+
 # variable unvisible in admin
 try:
     ADMIN_UNVISIBLE_VARIABLES = config.ADMIN_UNVISIBLE_VARIABLES
@@ -0,0 +1,74 @@
+import contextlib
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+# values cached during the current request or celery task
+scope_values = ContextVar("scope_values", default=None)
+
+
+@contextlib.contextmanager
+def cache_scope():
+    """Cache the values read with get_cached until the end of the block (a
+    request or a celery task)."""
+    token = scope_values.set({})
+    try:
+        yield
+    finally:
+        scope_values.reset(token)
+
+
+# tokens of the cache scopes of the running celery tasks by task id
+task_scope_tokens = {}
+
+
+def open_task_scope(task_id=None, **kwargs):
+    task_scope_tokens[task_id] = scope_values.set({})
+
+
+def close_task_scope(task_id=None, **kwargs):
+    token = task_scope_tokens.pop(task_id, None)
+    if token is not None:
+        scope_values.reset(token)
+
+
+def get_shared_cache():
+    """Return the cache shared by all the processes, None when
+    SHARED_CACHE_ALIAS is not set."""
+    if not settings.SHARED_CACHE_ALIAS:
+        return None
+    return caches[settings.SHARED_CACHE_ALIAS]
+
+
+def get_cached(key, compute, timeout):
+    """Return the value of key, computed with compute() when it is not cached.
+
+    The value is kept in the shared cache, where delete_cached clears it for
+    all the processes, and until the end of the current cache scope. Without
+    shared cache it is only kept in the scope: a cache local to the process
+    would keep a value deleted by another process.
+    """
+    values = scope_values.get()
+    if values is not None and key in values:
+        return values[key]
+
+    shared_cache = get_shared_cache()
+    value = shared_cache.get(key) if shared_cache is not None else None
+    if value is None:
+        value = compute()
+        if shared_cache is not None:
+            shared_cache.set(key, value, timeout)
+
+    if values is not None:
+        values[key] = value
+    return value
+
+
+def delete_cached(key):
+    values = scope_values.get()
+    if values is not None:
+        values.pop(key, None)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete(key)
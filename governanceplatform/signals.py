@@ -4,16 +4,32 @@ from threading import local
 from django.contrib.admin.models import LogEntry
 from django.contrib.auth.models import Group
 from django.contrib.auth.signals import user_logged_in, user_logged_out
-from django.contrib.sessions.models import Session
 from django.db import transaction
-from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
-from django.utils.timezone import now
 
 from governanceplatform.models import User
 
+from .functionalities import invalidate_functionality_routing
 from .helpers import user_in_group
-from .models import CompanyUser, ObserverUser, PasswordUserHistory, RegulatorUser
+from .models import (
+    CompanyUser,
+    Functionality,
+    Observer,
+    ObserverRegulation,
+    ObserverUser,
+    PasswordUserHistory,
+    Regulator,
+    RegulatorUser,
+    UserSession,
+)
+from .observer_rules import invalidate_observers_rules
 from .permissions import (
     set_incident_user_permissions,
     set_observer_admin_permissions,
@@ -23,6 +39,7 @@ from .permissions import (
     set_regulator_admin_permissions,
     set_regulator_staff_permissions,
 )
+from .session_store import SessionStore
 
 _thread_locals = local()
 _thread_locals.deleting_users = set()
@@ -275,13 +292,37 @@ def delete_user_groups(sender, instance, **kwargs):
 
 
 def force_logout_user(user):
-    user_id = str(user.id)
-
-    sessions_to_delete = [
-        session.session_key
-        for session in Session.objects.filter(expire_date__gte=now()).iterator()
-        if session.get_decoded().get("_auth_user_id") == user_id
-    ]
-
-    if sessions_to_delete:
-        Session.objects.filter(session_key__in=sessions_to_delete).delete()
+    force_logout_users([user])
+
+
+# delete the sessions of the users with one query on the indexed user of the
+# sessions, and their cached copies (see governanceplatform.session_store)
+def force_logout_users(users):
+    sessions = UserSession.objects.filter(user__in=users)
+    session_keys = list(sessions.values_list("session_key", flat=True))
+    sessions.delete()
+    SessionStore.delete_cached_sessions(session_keys)
+
+
+# the cached incident rules of the observers are cleared when an observer or
+# its rules change, and again once the transaction is committed
+@receiver(post_save, sender=Observer)
+@receiver(post_delete, sender=Observer)
+@receiver(post_save, sender=ObserverRegulation)
+@receiver(post_delete, sender=ObserverRegulation)
+def clear_observers_rules(sender, instance, **kwargs):
+    invalidate_observers_rules()
+    transaction.on_commit(invalidate_observers_rules)
+
+
+# the cached functionalities of the regulators are cleared when a
+# functionality or a regulator changes, and again once the transaction is
+# committed
+@receiver(post_save, sender=Functionality)
+@receiver(post_delete, sender=Functionality)
+@receiver(post_save, sender=Regulator)
+@receiver(post_delete, sender=Regulator)
+@receiver(m2m_changed, sender=Regulator.functionalities.through)
+def clear_functionality_routing(sender, instance, **kwargs):
+    invalidate_functionality_routing()
+    transaction.on_commit(invalidate_functionality_routing)
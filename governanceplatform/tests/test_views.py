@@ -1,8 +1,34 @@
+import time
+from datetime import timedelta
+
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import get_resolver, reverse
+from django.utils import timezone
 
 from conftest import list_admin_add_urls, list_urls, test_get_with_otp
+from governanceplatform.admin import ScriptLogEntryAdmin, admin_site
 from governanceplatform.helpers import user_in_group
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_message, record_metrics, save_run_metrics
+from governanceplatform.middleware import (
+    CacheScopeMiddleware,
+    CheckFunctionalityAccessMiddleware,
+    RestrictViewsMiddleware,
+)
+from governanceplatform.models import (
+    Functionality,
+    Regulator,
+    ScriptLogEntry,
+    User,
+    UserSession,
+)
+from governanceplatform.session_store import SessionStore
+from governanceplatform.signals import force_logout_user, force_logout_users
 
 # Restricted URL
 restricted_names = [
@@ -143,3 +169,325 @@ def test_superuser_restricted_access(otp_client, populate_db):
             assert response.status_code == 404
         u.is_superuser = False
         u.save()
+
+
+@pytest.mark.django_db
+def test_metrics(client, monkeypatch):
+    """
+    Verify that the metrics of the scripts are only served with the token
+    """
+    url = reverse("metrics")
+    assert client.get(url).status_code == 404
+
+    monkeypatch.setattr("governanceplatform.views.METRICS_TOKEN", "secret")
+    save_run_metrics("email_reminder", 1.5, {"scanned": 3, "emails": 2})
+    save_run_metrics("email_reminder", 0.5, {"scanned": 1})
+
+    assert client.get(url).status_code == 401
+    response = client.get(url, headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    content = response.content.decode()
+    # the last run of the script
+    label = '{script="email_reminder"}'
+    assert f"nisinp_script_last_run_duration_seconds{label} 0.5" in content
+    assert f"nisinp_script_last_run_scanned{label} 1" in content
+    assert f"nisinp_script_last_run_emails{label} 0" in content
+
+
+@pytest.mark.django_db
+def test_script_log_trends(rf):
+    """
+    Verify that the trends of a run are computed on the previous runs of its
+    script, whatever the filters of the list
+    """
+    entries = [
+        save_run_metrics("email_reminder", duration, {"affected": affected})
+        for duration, affected in ((1.0, 2), (3.0, 4), (4.0, 6))
+    ]
+    entries.append(save_run_metrics("log_cleaning", 10.0, {"affected": 100}))
+    now = timezone.now()
+    for i, entry in enumerate(entries):
+        ScriptLogEntry.objects.filter(pk=entry.pk).update(
+            action_time=now - timedelta(minutes=len(entries) - i)
+        )
+
+    script_log_admin = ScriptLogEntryAdmin(ScriptLogEntry, admin_site)
+    last_run = script_log_admin.get_queryset(rf.get("/")).filter(pk=entries[2].pk).get()
+    assert last_run.average_duration == 2.0
+    assert last_run.average_affected == 3.0
+    assert script_log_admin.duration_trend(last_run) == "+100 %"
+    assert script_log_admin.affected_trend(last_run) == "+100 %"
+
+
+@pytest.mark.django_db
+def test_script_log_messages():
+    """
+    Verify that the messages of a run are written in the ScriptLogEntry of its
+    metrics
+    """
+
+    @single_run("test_script")
+    def run():
+        record_message("System:Test script 2 object(s) deleted", action_flag=3)
+        record_metrics(scanned=2, affected=2)
+
+    run()
+
+    log_entry = ScriptLogEntry.objects.get(script_name="test_script")
+    assert log_entry.object_repr == "System:Test script 2 object(s) deleted"
+    assert log_entry.action_flag == 3
+    assert (log_entry.scanned, log_entry.affected) == (2, 2)
+    assert not ScriptLogEntry.objects.exclude(pk=log_entry.pk).exists()
+
+
+@pytest.mark.django_db
+def test_force_logout_user(populate_db):
+    """
+    Verify that only the sessions of the user are deleted
+    """
+    users = populate_db["users"][:3]
+    clients = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        clients.append(client)
+    session_key = clients[0].session.session_key
+    assert UserSession.objects.get(session_key=session_key).user == users[0]
+
+    force_logout_user(users[0])
+    assert not UserSession.objects.filter(user=users[0]).exists()
+    assert UserSession.objects.filter(user=users[1]).exists()
+
+    force_logout_users(users[1:])
+    assert not UserSession.objects.filter(user__in=users).exists()
+
+
+def request_session(session_key):
+    """
+    Save the session as SessionExpiryMiddleware and return the writes in the
+    database
+    """
+    with CaptureQueriesContext(connection) as context:
+        session = SessionStore(session_key)
+        session["_session_expiry"] = time.time() + 60
+        session.modified = True
+        session.save()
+    return [
+        query["sql"]
+        for query in context.captured_queries
+        if query["sql"].startswith("UPDATE")
+    ]
+
+
+@pytest.mark.django_db
+def test_session_writes_coalesced(monkeypatch):
+    """
+    Verify that a session is only written when its data change or when its
+    expiry must be extended in the database
+    """
+    session = SessionStore()
+    session["company_in_use"] = 1
+    session.save()
+
+    assert request_session(session.session_key) == []
+
+    session = SessionStore(session.session_key)
+    session["company_in_use"] = 2
+    session.save()
+    assert SessionStore(session.session_key)["company_in_use"] == 2
+
+    monkeypatch.setattr(SessionStore, "persist_remaining_fraction", 1)
+    assert len(request_session(session.session_key)) == 1
+
+
+@pytest.mark.django_db
+def test_functionality_access(populate_db, rf, settings, django_assert_num_queries):
+    """
+    Verify that the regulators only reach the modules of their functionalities
+    """
+    middleware = CheckFunctionalityAccessMiddleware(lambda request: HttpResponse())
+
+    def get(email, path):
+        request = rf.get(path)
+        request.user = User.objects.get(email=email)
+        return middleware(request)
+
+    assert get("regadmin@reg1.lu", "/incidents/").status_code == 200
+
+    # the incidents become a functionality given to no regulator
+    functionality = Functionality.objects.create(type="incidents")
+    with pytest.raises(Http404):
+        get("regadmin@reg1.lu", "/incidents/")
+
+    Regulator.objects.get(pk=1).functionalities.add(functionality)
+    assert get("regadmin@reg1.lu", "/incidents/").status_code == 200
+    assert get("opadmin@com1.lu", "/incidents/").status_code == 200
+    with pytest.raises(Http404):
+        get("regadmin@reg2.lu", "/incidents/")
+
+    # the routes which are not a functionality module need no query once the
+    # shared cache is warm
+    settings.SHARED_CACHE_ALIAS = "default"
+    cache.clear()
+    request = rf.get("/logout")
+    request.user = User.objects.get(email="regadmin@reg2.lu")
+    middleware(request)
+    with django_assert_num_queries(0):
+        assert middleware(request).status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("shared_cache_alias", [None, "default"])
+def test_functionality_changed_by_another_process(
+    populate_db, rf, settings, shared_cache_alias
+):
+    """
+    Verify that a functionality removed by another process is applied by the
+    next requests, with or without shared cache
+    """
+    settings.SHARED_CACHE_ALIAS = shared_cache_alias
+    cache.clear()
+    middleware = CacheScopeMiddleware(
+        CheckFunctionalityAccessMiddleware(lambda request: HttpResponse())
+    )
+    regulator = Regulator.objects.get(pk=1)
+    functionality = Functionality.objects.create(type="incidents")
+    regulator.functionalities.add(functionality)
+
+    def get(email, path):
+        request = rf.get(path)
+        request.user = User.objects.get(email=email)
+        return middleware(request)
+
+    assert get("regadmin@reg1.lu", "/incidents/").status_code == 200
+    # the signals of the other process clear the shared cache
+    if shared_cache_alias:
+        regulator.functionalities.remove(functionality)
+    else:
+        Regulator.functionalities.through.objects.filter(regulator=regulator).delete()
+
+    with pytest.raises(Http404):
+        get("regadmin@reg1.lu", "/incidents/")
+
+
+# routes checked by RestrictViewsMiddleware, by URL name and arguments
+POLICY_ROUTES = [
+    ("index", []),
+    ("incidents", []),
+    ("declaration", []),
+    ("regulator_incidents", []),
+    ("export_incidents", []),
+    ("create_workflow", []),
+    ("edit_workflow", []),
+    ("regulator_incident_edit", [1]),
+    ("delete_incident", [1]),
+    ("logout", []),
+]
+
+# response of RestrictViewsMiddleware for each role, for the routes which are
+# not allowed
+ROLE_ROUTE_POLICIES = [
+    (
+        "pa@pa.lu",
+        {},
+        {
+            "index": "admin",
+            "incidents": "admin",
+            "declaration": "admin",
+            "regulator_incidents": "admin",
+            "export_incidents": "admin",
+            "create_workflow": "admin",
+            "edit_workflow": "admin",
+            "regulator_incident_edit": "admin",
+            "delete_incident": "admin",
+        },
+    ),
+    (
+        "iu1@iu.lu",
+        {},
+        {
+            "regulator_incidents": 404,
+            "export_incidents": 404,
+            "regulator_incident_edit": 404,
+        },
+    ),
+    (
+        "regadmin@reg1.lu",
+        {},
+        {"declaration": 404, "create_workflow": 404, "delete_incident": 404},
+    ),
+    (
+        "reguser@reg1.lu",
+        {},
+        {"declaration": 404, "create_workflow": 404, "delete_incident": 404},
+    ),
+    # the regulators declare their own incidents in the regulator incidents
+    ("regadmin@reg1.lu", {"is_regulator_incidents": True}, {}),
+    (
+        "obsadm@cert1.lu",
+        {},
+        {
+            "declaration": 404,
+            "regulator_incidents": 404,
+            "create_workflow": 404,
+            "edit_workflow": 404,
+            "regulator_incident_edit": 404,
+            "delete_incident": 404,
+        },
+    ),
+    (
+        "opadmin@com1.lu",
+        {},
+        {
+            "regulator_incidents": 404,
+            "export_incidents": 404,
+            "regulator_incident_edit": 404,
+        },
+    ),
+    (
+        "opuser@com1.lu",
+        {},
+        {
+            "regulator_incidents": 404,
+            "export_incidents": 404,
+            "regulator_incident_edit": 404,
+        },
+    ),
+]
+
+
+def get_policy_response(rf, user, session, url):
+    middleware = RestrictViewsMiddleware(lambda request: HttpResponse())
+    request = rf.get(url)
+    request.user = user
+    request.session = session
+    try:
+        response = middleware(request)
+    except Http404:
+        return 404
+    if response.status_code == 302:
+        return response.url
+    return response.status_code
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("email, session, forbidden_routes", ROLE_ROUTE_POLICIES)
+def test_route_policies(populate_db, rf, email, session, forbidden_routes):
+    """
+    Verify the response of each route for each role
+    """
+    user = User.objects.get(email=email)
+    user.is_verified = lambda: True
+    expected_responses = {"admin": reverse("admin:index"), 404: 404}
+
+    for name, args in POLICY_ROUTES:
+        url = reverse(name, args=args)
+        expected = expected_responses.get(forbidden_routes.get(name), 200)
+        assert get_policy_response(rf, user, session, url) == expected, url
+
+    # the users verify their OTP device first
+    user.is_verified = lambda: False
+    for name, args in POLICY_ROUTES:
+        url = reverse(name, args=args)
+        expected = 200 if name == "logout" else reverse("two_factor:profile")
+        assert get_policy_response(rf, user, session, url) == expected, url
@@ -119,6 +119,8 @@ urlpatterns = [
             ]
         ),
     ),
+    # metrics of the scheduled scripts
+    path("metrics", views.metrics, name="metrics"),
     # URL patterns to serve the translations in JavaScript
     path("jsi18n/", JavaScriptCatalog.as_view(), name="javascript-catalog"),
 ]
@@ -1,3 +1,4 @@
+import hmac
 from collections import OrderedDict
 
 from django.conf import settings
@@ -9,6 +10,7 @@ from django.contrib.auth.models import Group
 from django.contrib.auth.views import PasswordResetConfirmView, PasswordResetView
 from django.core.mail import EmailMessage
 from django.db.models.functions import Now
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse, reverse_lazy
 from django.utils.translation import gettext_lazy as _
@@ -24,7 +26,9 @@ from .forms import (
     TermsAcceptanceForm,
 )
 from .helpers import is_user_regulator
+from .metrics import get_last_runs, get_prometheus_metrics
 from .permissions import set_operator_admin_permissions, set_operator_user_permissions
+from .settings import METRICS_TOKEN
 
 
 @login_required
@@ -295,6 +299,20 @@ def contact(request):
     return render(request, "home/contact.html", context)
 
 
+# metrics of the scheduled scripts for Prometheus, the scraper authenticates
+# with the METRICS_TOKEN bearer token
+def metrics(request):
+    if not METRICS_TOKEN:
+        raise Http404()
+    authorization = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        get_prometheus_metrics(list(get_last_runs())),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 def custom_404_view(request, exception):
     return render(request, "parts/404.html", status=404)
 
@@ -36,11 +36,13 @@ from governanceplatform.settings import (
     LOG_RETENTION_TIME_IN_DAY,
     PARLER_DEFAULT_LANGUAGE_CODE,
 )
+from incidents.email import send_outbox
 from incidents.forms import QuestionOptionsInlineForm
 from incidents.models import (
     Answer,
     Email,
     Impact,
+    OutgoingEmail,
     PredefinedAnswer,
     Question,
     QuestionCategory,
@@ -989,3 +991,48 @@ for name, method in generate_display_methods(
     ]
 ).items():
     setattr(SectorRegulationWorkflowEmailAdmin, name, method)
+
+
+# send again the emails which were given up
+@admin.action(description=_("Send again"), permissions=["change"])
+def send_again(modeladmin, request, queryset):
+    queryset.exclude(status="SENT").update(
+        status="PENDING", attempts=0, next_attempt_at=timezone.now()
+    )
+    transaction.on_commit(send_outbox)
+
+
+@admin.register(OutgoingEmail, site=admin_site)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    date_hierarchy = "created_at"
+    actions = [send_again]
+    list_display = [
+        "created_at",
+        "subject",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+    ]
+    list_filter = ["status"]
+    search_fields = ["subject"]
+    readonly_fields = [
+        "subject",
+        "content",
+        "recipients",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "last_error",
+        "created_at",
+        "sent_at",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if "delete_selected" in actions:
+            del actions["delete_selected"]
+        return actions
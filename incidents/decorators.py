@@ -6,6 +6,8 @@ from django.shortcuts import redirect
 from django.utils.translation import gettext_lazy as _
 
 from governanceplatform.helpers import (
+    get_user_observer,
+    get_user_regulator,
     is_observer_user,
     is_user_operator,
     is_user_regulator,
@@ -25,10 +27,10 @@ def check_user_is_correct(view_func):
         if user_in_group(user, "PlatformAdmin") or user_in_group(user, "IncidentUser"):
             return view_func(request, *args, **kwargs)
 
-        if is_user_regulator(user) and user.regulators.exists():
+        if is_user_regulator(user) and get_user_regulator(user) is not None:
             return view_func(request, *args, **kwargs)
 
-        if is_observer_user(user) and user.observers.exists():
+        if is_observer_user(user) and get_user_observer(user) is not None:
             return view_func(request, *args, **kwargs)
 
         if is_user_operator(user) and user.companies.exists():
@@ -1,20 +1,29 @@
+import functools
 import logging
 from datetime import date
 
-import requests
+from celery import shared_task
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.mail import EmailMessage
 from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
 from django.urls import reverse
 from django.utils import timezone
 
 from governanceplatform.helpers import render_to_string_multi_languages
 from governanceplatform.models import Observer, RegulatorUser
-from governanceplatform.validators import validate_rt_url
+from governanceplatform.observer_rules import get_incident_observer_ids
+from governanceplatform.settings import RT_MAX_RETRIES, RT_RETRY_DELAY_IN_SECOND
 from incidents.globals import INCIDENT_EMAIL_VARIABLES
+from incidents.scripts import email_outbox
 
-from .models import RTTicket
+from .models import Incident, OutgoingEmail
+from .rt import (
+    RTDeliveryError,
+    check_rt_config,
+    create_or_update_rt_ticket,
+    has_rt_config,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -84,6 +93,8 @@ def replace_email_variables(content, incident):
     return modify_content
 
 
+# the email is written in the outbox in the transaction of the caller and sent
+# by a celery job when the transaction is committed
 def send_html_email(subject, content, recipient_list):
     valid_recipient_list = [email for email in recipient_list if is_valid_email(email)]
     if not valid_recipient_list:
@@ -93,45 +104,47 @@ def send_html_email(subject, content, recipient_list):
         )
         return False
 
-    email = EmailMessage(
-        subject,
-        content,
-        settings.EMAIL_SENDER,
-        bcc=valid_recipient_list,
-    )
-    email.content_subtype = "html"
-
     try:
-        sent_count = email.send()
-
-        if sent_count == 0:
-            logger.error(
-                "Email send returned 0 (no email sent)",
-                extra={
-                    "subject": subject,
-                    "recipients": valid_recipient_list,
-                },
-            )
-            return False
-
-        return True
-
-    except Exception:
+        OutgoingEmail.objects.create(
+            subject=subject,
+            content=content,
+            recipients=valid_recipient_list,
+        )
+    except DatabaseError:
         logger.exception(
             "Email sending failed",
             extra={
                 "subject": subject,
                 "recipients": valid_recipient_list,
-                "sender": settings.EMAIL_SENDER,
             },
         )
         return False
 
+    transaction.on_commit(send_outbox)
+    return True
+
+
+def send_outbox():
+    try:
+        email_outbox.run.delay()
+    except Exception:
+        # the email is sent at the next scheduled run
+        logger.exception("Failed to start the email outbox job")
+
 
 def get_emails_from_qs(queryset):
     return [obj.user.email for obj in queryset]
 
 
+def get_observer_emails(observer):
+    # Observer's mail
+    observer_emails = [observer.email_for_notification]
+    # Observer users' email
+    observer_user_qs = observer.observeruser_set.all().select_related("user")
+    observer_emails.extend(get_emails_from_qs(observer_user_qs))
+    return observer_emails
+
+
 def get_recipient_list(incident):
     # Contact user's email
     recipient_list = []
@@ -197,104 +210,61 @@ def send_email(email, incident, send_to_observers=False):
     )
     recipient_list = get_recipient_list(incident)
 
+    rt_observer_ids = []
     if send_to_observers:
         observer_emails = []
-        observers = Observer.objects.all()
+        observers = Observer.objects.filter(pk__in=get_incident_observer_ids(incident))
         for observer in observers:
-            if observer.can_access_incident(incident):
-                if check_rt_config(observer):
-                    create_or_update_rt_ticket(
-                        observer, subject, html_content, incident
-                    )
-                else:
-                    # Observer's mail
-                    observer_emails.append(observer.email_for_notification)
-                    # Observer users' email
-                    observer_user_qs = observer.observeruser_set.all().select_related(
-                        "user"
-                    )
-                    observer_emails.extend(get_emails_from_qs(observer_user_qs))
+            if has_rt_config(observer):
+                # the ticket is sent by a celery job, RT is not requested here
+                rt_observer_ids.append(observer.pk)
+            else:
+                observer_emails.extend(get_observer_emails(observer))
 
         recipient_list.extend(observer_emails)
 
+    for observer_id in rt_observer_ids:
+        transaction.on_commit(
+            functools.partial(
+                start_rt_ticket, observer_id, incident.pk, subject, html_content
+            )
+        )
+
     # Remove duplicates
     recipient_list = list(dict.fromkeys(recipient_list))
 
     send_html_email(subject, html_content, recipient_list)
 
 
-def create_or_update_rt_ticket(recipient, subject, content, incident):
-    base_url = recipient.rt_url.rstrip("/")
+def start_rt_ticket(observer_id, incident_id, subject, content):
     try:
-        validate_rt_url(base_url)
-    except ValidationError:
-        logger.error("Blocked unsafe RT URL: %s", base_url)
-        return None
-
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Authorization": f"token {recipient.rt_token}",
-    }
-
-    try:
-        ticket = RTTicket.objects.filter(incident=incident, observer=recipient).first()
-        is_new_ticket = ticket is None
-        if is_new_ticket:
-            url = f"{base_url}/REST/2.0/ticket"
-            payload = {
-                "Requestor": settings.EMAIL_SENDER,
-                "Queue": recipient.rt_queue,
-                "Subject": subject,
-                "Content": content,
-                "ContentType": "text/html",
-            }
-        else:
-            url = f"{base_url}/REST/2.0/ticket/{ticket.ticket_id}/correspond"
-            payload = {
-                "Content": content,
-                "ContentType": "text/html",
-            }
-
-        response = requests.post(url, json=payload, headers=headers, timeout=5)
-
-        if response.ok:
-            if is_new_ticket and response.status_code == 201:
-                ticket_data = response.json()
-                RTTicket.objects.create(
-                    incident=incident,
-                    observer=recipient,
-                    ticket_id=ticket_data.get("id"),
-                )
-        else:
-            logger.error("RT API Error %s: %s", response.status_code, response.text)
-    except requests.RequestException as e:
-        logger.error("Error connecting to RT API: %s", e)
+        send_rt_ticket.delay(observer_id, incident_id, subject, content)
+    except Exception:
+        logger.exception("Failed to start the RT ticket job")
 
 
-def check_rt_config(observer):
-    if not observer.rt_url or not observer.rt_queue or not observer.rt_token:
-        return False
+# create or update the RT ticket of the incident, the observer is notified by
+# email when its RT queue is not valid or when RT is not available after the
+# retries
+@shared_task(name="rt_ticket", bind=True, max_retries=RT_MAX_RETRIES)
+def send_rt_ticket(self, observer_id, incident_id, subject, content):
+    observer = Observer.objects.filter(pk=observer_id).first()
+    incident = Incident.objects.filter(pk=incident_id).first()
+    if observer is None or incident is None:
+        return
 
-    base_url = observer.rt_url.rstrip("/")
-    url = f"{base_url}/REST/2.0/queue/{observer.rt_queue}"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"token {observer.rt_token}",
-    }
     try:
-        response = requests.get(url, headers=headers, timeout=5)
-        if response.status_code == 200:
-            return True
-        elif response.status_code == 401:
-            logger.warning("RT token unauthorized (401) for %s", str(observer))
-        elif response.status_code == 404:
-            logger.warning("RT queue '%s' not found at %s", observer.rt_queue, url)
-        else:
-            logger.warning(
-                "Unexpected RT response (%s): %s", response.status_code, response.text
+        if check_rt_config(observer):
+            create_or_update_rt_ticket(observer, subject, content, incident)
+            return
+    except RTDeliveryError as e:
+        if self.request.retries < self.max_retries:
+            # exponential backoff
+            raise self.retry(
+                exc=e, countdown=RT_RETRY_DELAY_IN_SECOND * 2**self.request.retries
             )
-        return False
-    except requests.RequestException as e:
-        logger.error("Error connecting to RT API: %s", e)
-        return False
+        logger.error(
+            "RT ticket of incident %s not sent to %s: %s", incident_id, observer, e
+        )
+
+    send_html_email(subject, content, get_observer_emails(observer))
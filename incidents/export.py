@@ -0,0 +1,514 @@
+import csv
+import io
+import secrets
+import tempfile
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import Group
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count, Max, Value
+from django.db.models.functions import Length, Replace
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.translation import gettext_lazy as _
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+from governanceplatform.helpers import (
+    is_observer_user,
+    render_to_string_multi_languages,
+    user_in_group,
+)
+from governanceplatform.models import Sector, User
+from governanceplatform.settings import (
+    INCIDENT_EXPORT_LINK_MAX_AGE,
+    PARLER_DEFAULT_LANGUAGE_CODE,
+    PATH_FOR_INCIDENT_EXPORTS,
+    SITE_NAME,
+)
+
+from .email import send_html_email
+from .helpers import get_latest_incident_workflows
+from .models import Answer, Incident, IncidentExport, IncidentWorkflow, QuestionOptions
+
+EXPORT_DATE_FORMAT = "%d-%m-%Y %H:%M:%S"
+EXPORT_CHUNK_SIZE = 200
+EXPORT_DOWNLOAD_SALT = "incidents.export.download"
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+EXPORT_FIXED_COLUMNS = [
+    "Name of operator",
+    "Reference",
+    "Incident notification creation date",
+    "Incident detection date",
+    "Incident start date",
+    "Incident resolution date",
+    "Legal basis",
+    "Significative impact",
+    "Incident Status",
+    "Incident notification manager",
+    "Incident technical contact",
+    "Report",
+    "Report status",
+    "Report creation date",
+]
+
+# question types with one column per predefined answer
+MULTIPLE_ANSWERS_QUESTION_TYPES = ["MULTI", "MT"]
+# question types with one column per selected item of a list
+LIST_QUESTION_TYPES = ["CL", "RL"]
+
+
+def format_date(value):
+    return value.strftime(EXPORT_DATE_FORMAT) if value else ""
+
+
+def get_export_incidents_queryset(
+    user, regulation, sectorregulation, workflow, from_date, to_date
+):
+    """Return the incidents of the export which the user can access."""
+    incidents = Incident.objects.none()
+    if user_in_group(user, "RegulatorAdmin"):
+        incidents = Incident.objects.filter(
+            sector_regulation__regulator__in=user.regulators.all(),
+        )
+    elif is_observer_user(user):
+        incidents = user.observers.first().get_incidents()
+
+    # bounds of the date range in the current time zone, compared to the
+    # notification date without casting it, so that its index is used
+    start = timezone.make_aware(datetime.combine(from_date, time.min))
+    end = timezone.make_aware(datetime.combine(to_date + timedelta(days=1), time.min))
+
+    return incidents.filter(
+        sector_regulation=sectorregulation,
+        sector_regulation__regulation=regulation,
+        incident_notification_date__gte=start,
+        incident_notification_date__lt=end,
+        incidentworkflow__workflow=workflow,
+    ).distinct()
+
+
+def get_export_columns(incidents, workflow, regulation):
+    """Return the columns of the export of a report of the incidents.
+
+    The columns are derived from the definition of the report (questions,
+    impacts of the regulation) and from a few aggregates on the incidents,
+    without loading the incidents.
+    """
+    columns = list(EXPORT_FIXED_COLUMNS)
+
+    max_sectors = (
+        incidents.annotate(sectors_count=Count("affected_sectors", distinct=True))
+        .aggregate(max_sectors=Max("sectors_count"))
+        .get("max_sectors")
+        or 0
+    )
+    columns += [f"Impacted sectors {idx}" for idx in range(1, max_sectors + 1)]
+
+    answers = Answer.objects.filter(
+        incident_workflow__incident__in=incidents,
+        incident_workflow__workflow=workflow,
+    )
+    question_options = (
+        QuestionOptions.objects.filter(report=workflow)
+        .select_related("question", "category_option")
+        .prefetch_related("question__translations")
+        .annotate(predefined_answers_count=Count("question__predefinedanswer"))
+        .order_by("category_option__position", "position")
+    )
+    for question_option in question_options:
+        question = question_option.question
+        if question.question_type in MULTIPLE_ANSWERS_QUESTION_TYPES:
+            question_columns = [f"{question}"] + [
+                f"{question} {idx}"
+                for idx in range(1, question_option.predefined_answers_count + 1)
+            ]
+        elif question.question_type in LIST_QUESTION_TYPES:
+            # number of items of the longest answer
+            max_items = (
+                answers.filter(question_options=question_option)
+                .exclude(answer__isnull=True)
+                .annotate(
+                    items_count=Length("answer")
+                    - Length(Replace("answer", Value(","), Value("")))
+                    + 1
+                )
+                .aggregate(max_items=Max("items_count"))
+                .get("max_items")
+                or 0
+            )
+            question_columns = [f"{question} {idx}" for idx in range(1, max_items + 1)]
+        else:
+            question_columns = [f"{question}"]
+
+        for column in question_columns:
+            if column not in columns:
+                columns.append(column)
+
+    max_impacts = (
+        IncidentWorkflow.objects.filter(incident__in=incidents, workflow=workflow)
+        .annotate(impacts_count=Count("impacts", distinct=True))
+        .aggregate(max_impacts=Max("impacts_count"))
+        .get("max_impacts")
+        or 0
+    )
+    if max_impacts:
+        sectors = sorted(
+            Sector.objects.filter(impact__regulations=regulation)
+            .prefetch_related("translations")
+            .distinct(),
+            key=lambda sector: sector.get_safe_translation(),
+        )
+        for sector in sectors:
+            columns += [
+                f"{sector.get_safe_translation()} Impact {idx}"
+                for idx in range(1, max_impacts + 1)
+            ]
+
+    return columns
+
+
+def get_export_row(incident, last_report, lang):
+    """Return the values of the export of the last report of an incident."""
+    report_timeline = last_report.report_timeline
+    row = {
+        "Name of operator": (
+            incident.company.name if incident.company else incident.company_name
+        ),
+        "Reference": incident.incident_id,
+        "Incident notification creation date": format_date(
+            incident.incident_notification_date
+        ),
+        "Incident detection date": format_date(
+            report_timeline.incident_detection_date if report_timeline else None
+        ),
+        "Incident start date": format_date(
+            report_timeline.incident_starting_date if report_timeline else None
+        ),
+        "Incident resolution date": format_date(
+            report_timeline.incident_resolution_date if report_timeline else None
+        ),
+        "Legal basis": str(incident.sector_regulation.regulation),
+        "Significative impact": "yes" if incident.is_significative_impact else "no",
+        "Incident Status": incident.get_incident_status_display(),
+        "Incident notification manager": ", ".join(
+            [
+                f"{incident.contact_firstname} {incident.contact_lastname}",
+                incident.contact_email,
+                incident.contact_telephone,
+            ]
+        ),
+        "Incident technical contact": ", ".join(
+            [
+                f"{incident.technical_firstname} {incident.technical_lastname}",
+                incident.technical_email,
+                incident.technical_telephone,
+            ]
+        ),
+        "Report": str(last_report.workflow) if last_report.workflow else "",
+        "Report status": (
+            last_report.get_review_status_display() if last_report.review_status else ""
+        ),
+        "Report creation date": format_date(last_report.timestamp),
+    }
+
+    for idx, sector in enumerate(incident.affected_sectors.all(), start=1):
+        row[f"Impacted sectors {idx}"] = str(sector).replace(" → ", " -> ")
+
+    for answer in last_report.answer_set.all():
+        question = answer.question_options.question
+        str_answer = str(answer).replace(";", ",")
+        predefined_answers = list(answer.predefined_answers.all())
+        if predefined_answers:
+            for idx, pa in enumerate(predefined_answers, start=1):
+                pa_answer = str(pa).replace(";", ",")
+                if question.question_type == "SO":
+                    row[f"{question}"] = pa_answer
+                elif question.question_type == "ST":
+                    if str_answer != "":
+                        row[f"{question}"] = f"{pa_answer} Details: {str_answer}"
+                    else:
+                        row[f"{question}"] = pa_answer
+                else:
+                    row[f"{question} {idx}"] = pa_answer
+        elif question.question_type in LIST_QUESTION_TYPES:
+            for idx, item in enumerate(str_answer.split(","), start=1):
+                row[f"{question} {idx}"] = item.strip()
+        else:
+            row[f"{question}"] = str_answer
+
+    impacts = sorted(
+        last_report.impacts.all(),
+        key=lambda impact: (
+            impact.safe_translation_getter("label", language_code=lang)
+            or impact.safe_translation_getter(
+                "label", language_code=PARLER_DEFAULT_LANGUAGE_CODE
+            )
+            or ""
+        ).lower(),
+    )
+    for idx, impact in enumerate(impacts, start=1):
+        for sector in impact.sectors.all():
+            row[f"{sector.get_safe_translation()} Impact {idx}"] = impact.label
+
+    return row
+
+
+def get_export_incidents(incidents):
+    """Return the incidents with the relations of the export."""
+    return incidents.select_related(
+        "company", "sector_regulation__regulation"
+    ).prefetch_related(
+        "affected_sectors__translations",
+        "affected_sectors__parent__translations",
+        "sector_regulation__regulation__translations",
+    )
+
+
+def iter_export_rows(incidents, workflow, columns, lang):
+    """Yield the rows of the export, one incident at a time.
+
+    The incidents are read by chunks, and the latest reports of each chunk
+    are loaded together, so the number of queries does not depend on the
+    number of incidents in a chunk.
+    """
+    incidents = get_export_incidents(incidents).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    with translation.override(lang):
+        while True:
+            chunk = list(islice(incidents, EXPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            latest_reports = get_latest_incident_workflows(
+                [incident.pk for incident in chunk], workflow
+            )
+            for incident in chunk:
+                last_report = latest_reports.get(incident.pk)
+                if last_report is None:
+                    continue
+                row = get_export_row(incident, last_report, lang)
+                yield [row.get(column, "") for column in columns]
+
+
+class Echo:
+    """File-like object which returns the written value, for the csv writer."""
+
+    def write(self, value):
+        return value
+
+
+def write_csv(output, rows, columns):
+    """Write the export in a text file."""
+    writer = csv.writer(output, quoting=csv.QUOTE_ALL)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+
+
+def write_xlsx(output, rows, columns):
+    """Write the export in a binary file.
+
+    The write-only mode writes the rows in a temporary file instead of
+    keeping all the cells in memory.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Incidents")
+    # the widths are set before the rows in write-only mode
+    for idx, column in enumerate(columns, start=1):
+        ws.column_dimensions[get_column_letter(idx)].width = min(
+            max(len(column), 10) + 2, 60
+        )
+    ws.append(columns)
+    for row in rows:
+        ws.append(row)
+    wb.save(output)
+
+
+def get_csv_response(rows, columns, filename="export.csv"):
+    writer = csv.writer(Echo(), quoting=csv.QUOTE_ALL)
+
+    def content():
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(
+        content(), content_type=EXPORT_CONTENT_TYPES["csv"]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def get_xlsx_response(rows, columns, filename="export.xlsx"):
+    output = tempfile.TemporaryFile()
+    write_xlsx(output, rows, columns)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type=EXPORT_CONTENT_TYPES["xlsx"],
+    )
+
+
+def log_export(
+    user, incidents, count, regulation, sectorregulation, workflow, from_date, to_date
+):
+    """Log the export and notify the platform administrators."""
+    LogEntry.objects.log_actions(
+        user_id=user.id,
+        queryset=incidents,
+        action_flag=7,
+        change_message=_(
+            "A total of {count} incidents were exported from regulation "
+            "{regulation} [{sectorregulation} - ({workflow})] within date range ({from_date} - {to_date}.)"
+        ).format(
+            count=count,
+            regulation=regulation,
+            sectorregulation=sectorregulation,
+            workflow=workflow,
+            from_date=from_date,
+            to_date=to_date,
+        ),
+    )
+
+    try:
+        platformAdmin_group = Group.objects.get(name="PlatformAdmin")
+    except Group.DoesNotExist:
+        platformAdmin_group = None
+
+    if platformAdmin_group:
+        email_list = User.objects.filter(groups=platformAdmin_group).values_list(
+            "email", flat=True
+        )
+        html_message = render_to_string_multi_languages(
+            "emails/incident_mass_export.html",
+            {"regulation": str(regulation), "site_name": SITE_NAME},
+        )
+        with translation.override(settings.LANGUAGE_CODE):
+            subject = _("[{site}] New incident mass export").format(site=SITE_NAME)
+
+        send_html_email(
+            subject,
+            html_message,
+            email_list,
+        )
+
+
+def get_export_storage():
+    """Private storage of the export files, not served by the web server."""
+    return FileSystemStorage(location=PATH_FOR_INCIDENT_EXPORTS)
+
+
+def generate_export_file(export, lang):
+    """Write the file of an export job in the export storage.
+
+    The number of exported rows is saved after each chunk of incidents to
+    follow the progress of the job. The columns and the rows are built in
+    the language of the user, as the question and impact columns are named
+    with translated labels.
+    """
+    with translation.override(lang):
+        incidents = get_export_incidents_queryset(
+            export.user,
+            export.regulation,
+            export.sector_regulation,
+            export.workflow,
+            export.from_date,
+            export.to_date,
+        )
+        columns = get_export_columns(incidents, export.workflow, export.regulation)
+        rows = iter_export_rows(
+            incidents.order_by("-incident_notification_date"),
+            export.workflow,
+            columns,
+            lang,
+        )
+
+        def count_rows(rows):
+            for row in rows:
+                yield row
+                export.row_count += 1
+                if export.row_count % EXPORT_CHUNK_SIZE == 0:
+                    IncidentExport.objects.filter(pk=export.pk).update(
+                        row_count=export.row_count
+                    )
+
+        with tempfile.TemporaryFile() as output:
+            if export.file_format == "xlsx":
+                write_xlsx(output, count_rows(rows), columns)
+            else:
+                text_output = io.TextIOWrapper(output, encoding="utf-8", newline="")
+                write_csv(text_output, count_rows(rows), columns)
+                text_output.flush()
+                text_output.detach()
+            output.seek(0)
+            file_name = f"incidents_export_{export.pk}_{secrets.token_hex(8)}.{export.file_format}"
+            export.file_name = get_export_storage().save(file_name, File(output))
+
+    export.status = "DONE"
+    export.finished_at = timezone.now()
+    export.save(update_fields=["file_name", "row_count", "status", "finished_at"])
+
+    log_export(
+        export.user,
+        incidents,
+        export.row_count,
+        export.regulation,
+        export.sector_regulation,
+        export.workflow,
+        export.from_date,
+        export.to_date,
+    )
+
+
+def get_export_download_url(export):
+    """Return a download link of the file of the export, only valid for the
+    user of the export during INCIDENT_EXPORT_LINK_MAX_AGE seconds."""
+    token = signing.dumps(
+        {"export": export.pk, "user": export.user_id}, salt=EXPORT_DOWNLOAD_SALT
+    )
+    return reverse("download_incident_export", args=[token])
+
+
+def get_export_from_token(token, user):
+    """Return the export of a download link, or None if the link is not valid
+    for the user or has expired."""
+    try:
+        data = signing.loads(
+            token, salt=EXPORT_DOWNLOAD_SALT, max_age=INCIDENT_EXPORT_LINK_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    if data.get("user") != user.id:
+        return None
+    return IncidentExport.objects.filter(
+        pk=data.get("export"), user=user, status="DONE"
+    ).first()
+
+
+def get_export_status(export):
+    data = {
+        "id": export.pk,
+        "status": export.status,
+        "status_display": str(export.get_status_display()),
+        "progress": export.progress,
+        "row_count": export.row_count,
+        "total_count": export.total_count,
+        "file_format": export.file_format,
+        "created_at": export.created_at.isoformat(),
+        "download_url": None,
+    }
+    if export.status == "DONE" and export.file_name:
+        data["download_url"] = get_export_download_url(export)
+    return data
@@ -1,5 +1,4 @@
 import django_filters
-from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
 from governanceplatform.helpers import get_sectors_grouped
@@ -20,6 +19,9 @@ class IncidentFilter(django_filters.FilterSet):
         widget=DropdownCheckboxSelectMultiple(), label=_("Sectors")
     )
     sector_regulation = django_filters.ModelChoiceFilter(queryset=sector_regulation)
+    deadline_before = django_filters.DateTimeFilter(
+        field_name="next_deadline", lookup_expr="lte", label=_("Deadline before")
+    )
 
     search = django_filters.CharFilter(method="filter_search", label=_("Search"))
 
@@ -38,18 +40,6 @@ class IncidentFilter(django_filters.FilterSet):
             "sector_regulation",
         ]
 
+    # substring search on the indexed search document of the incident
     def filter_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(incident_id__icontains=value)
-            | Q(contact_firstname__icontains=value)
-            | Q(contact_lastname__icontains=value)
-            | Q(technical_firstname__icontains=value)
-            | Q(technical_lastname__icontains=value)
-            | Q(company_name__icontains=value)
-            | Q(company__identifier__icontains=value)
-            | Q(company__name__icontains=value)
-            | Q(regulator__translations__name__icontains=value)
-            | Q(regulator__translations__full_name__icontains=value)
-            | Q(sector_regulation__regulation__translations__label__icontains=value)
-            | Q(affected_sectors__translations__name__icontains=value)
-        ).distinct()
+        return queryset.filter(search_document__contains=value.lower())
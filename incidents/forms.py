@@ -18,7 +18,7 @@ from governanceplatform.helpers import (
 from governanceplatform.models import Regulation, Regulator, Sector, Service
 from governanceplatform.settings import TIME_ZONE
 
-from .globals import REGIONAL_AREA
+from .globals import INCIDENT_EXPORT_FILE_FORMATS, REGIONAL_AREA
 from .helpers import get_workflow_categories
 from .models import (
     Answer,
@@ -1123,7 +1123,7 @@ class ExportIncidentsForm(forms.Form):
     )
 
     file_format = forms.ChoiceField(
-        choices=[("xlsx", "Excel (.xlsx)"), ("csv", "CSV (.csv)")],
+        choices=INCIDENT_EXPORT_FILE_FORMATS,
         required=True,
         label=_("File format"),
         initial="xlsx",
@@ -56,6 +56,22 @@ WORKFLOW_REVIEW_STATUS = [
     ("LATE", _("Late submission")),
 ]
 
+# status of an incidents mass export job
+INCIDENT_EXPORT_STATUS = [
+    ("PENDING", _("Pending")),
+    ("RUNNING", _("Running")),
+    ("DONE", _("Done")),
+    ("FAILED", _("Failed")),
+]
+
+OUTGOING_EMAIL_STATUS = [
+    ("PENDING", _("Pending")),
+    ("SENT", _("Sent")),
+    ("DEAD", _("Failed")),
+]
+
+INCIDENT_EXPORT_FILE_FORMATS = [("xlsx", "Excel (.xlsx)"), ("csv", "CSV (.csv)")]
+
 # after this step the delay is running
 SECTOR_REGULATION_WORKFLOW_TRIGGER_EVENT = [
     ("NONE", "None"),
@@ -114,6 +130,10 @@ ALLOWED_SORT_FIELDS = {
         "field": "incident_notification_date",
         "type": "datetime",
     },
+    "deadline": {
+        "field": "next_deadline",
+        "type": "datetime",
+    },
     "company_identifier": {
         "field": "sort_company_or_regulator_acronym",
         "type": "string",
@@ -1,10 +1,24 @@
 import math
 from collections import OrderedDict
+from datetime import timedelta
 from itertools import chain
 
+from celery import shared_task
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.utils import timezone
 
-from .models import IncidentWorkflow, QuestionCategoryOptions, SectorRegulationWorkflow
+from .globals import WORKFLOW_REVIEW_STATUS
+from .models import (
+    Incident,
+    IncidentEmailReminder,
+    IncidentReportStatus,
+    IncidentWorkflow,
+    QuestionCategoryOptions,
+    SectorRegulationWorkflow,
+    SectorRegulationWorkflowEmail,
+)
+from .report_chain import get_report_chain, invalidate_report_chain
 
 
 def is_deadline_exceeded(report, incident):
@@ -143,3 +157,336 @@ def get_workflow_categories(
     else:
         categories = []
     return categories
+
+
+# calculate the deadline of a report (SectorRegulationWorkflow or ReportChainStep)
+# which is not submitted yet
+def get_report_deadline(
+    sr_workflow, incident, previous_sr_workflow=None, latest_incident_workflows=None
+):
+    if latest_incident_workflows is None:
+        latest_incident_workflows = {}
+    delay = timedelta(hours=sr_workflow.delay_in_hours_before_deadline)
+    trigger_event = sr_workflow.trigger_event_before_deadline
+
+    if trigger_event == "DETECT_DATE":
+        if incident.incident_detection_date is not None:
+            return incident.incident_detection_date + delay
+    elif trigger_event == "NOTIF_DATE":
+        return incident.incident_notification_date + delay
+    elif trigger_event == "PREV_WORK" and previous_sr_workflow is not None:
+        previous_incident_workflow = latest_incident_workflows.get(
+            previous_sr_workflow.workflow_id
+        )
+        if previous_incident_workflow is not None:
+            return previous_incident_workflow.timestamp + delay
+
+    return None
+
+
+def compute_incident_report_statuses(incident):
+    """Return the unsaved statuses of all the reports of an incident."""
+    if incident.sector_regulation_id is None:
+        return []
+
+    report_chain = get_report_chain(incident.sector_regulation_id)
+    latest_incident_workflows = {
+        incident_workflow.workflow_id: incident_workflow
+        for incident_workflow in incident.get_latest_incident_workflows()
+    }
+
+    report_statuses = []
+    previous_step = None
+    for step in report_chain:
+        latest = latest_incident_workflows.get(step.workflow_id)
+        report_statuses.append(
+            IncidentReportStatus(
+                incident=incident,
+                sector_regulation_workflow_id=step.id,
+                workflow_id=step.workflow_id,
+                position=step.position,
+                latest_incident_workflow=latest,
+                review_status=(
+                    latest.review_status if latest else WORKFLOW_REVIEW_STATUS[0][0]
+                ),
+                deadline=(
+                    None
+                    if latest
+                    else get_report_deadline(
+                        step,
+                        incident,
+                        previous_step,
+                        latest_incident_workflows,
+                    )
+                ),
+            )
+        )
+        previous_step = step
+    return report_statuses
+
+
+# fields of the stored report statuses updated when they change
+REPORT_STATUS_FIELDS = [
+    "workflow_id",
+    "position",
+    "latest_incident_workflow_id",
+    "review_status",
+    "deadline",
+    "overdue_email_sent_at",
+]
+
+
+def refresh_incident_report_status(incident):
+    """Recompute the stored status of all the reports of an incident.
+
+    The rows are updated in place, the overdue email already sent for a
+    deadline is kept while the deadline does not change.
+    """
+    report_statuses = compute_incident_report_statuses(incident)
+
+    with transaction.atomic():
+        stored_statuses = {
+            report_status.sector_regulation_workflow_id: report_status
+            for report_status in IncidentReportStatus.objects.select_for_update().filter(
+                incident=incident
+            )
+        }
+
+        to_create = []
+        to_update = []
+        for report_status in report_statuses:
+            stored = stored_statuses.pop(
+                report_status.sector_regulation_workflow_id, None
+            )
+            if stored is None:
+                to_create.append(report_status)
+                continue
+            if stored.deadline == report_status.deadline:
+                report_status.overdue_email_sent_at = stored.overdue_email_sent_at
+            report_status.pk = stored.pk
+            if any(
+                getattr(stored, field) != getattr(report_status, field)
+                for field in REPORT_STATUS_FIELDS
+            ):
+                to_update.append(report_status)
+
+        if stored_statuses:
+            IncidentReportStatus.objects.filter(
+                pk__in=[stored.pk for stored in stored_statuses.values()]
+            ).delete()
+        IncidentReportStatus.objects.bulk_create(to_create)
+        IncidentReportStatus.objects.bulk_update(to_update, REPORT_STATUS_FIELDS)
+
+        # the next report is the first one not submitted
+        next_report_status = next(
+            (rs for rs in report_statuses if rs.latest_incident_workflow is None),
+            None,
+        )
+        update_incident_next_deadline(
+            incident,
+            (
+                next_report_status.sector_regulation_workflow_id
+                if next_report_status
+                else None
+            ),
+            next_report_status.deadline if next_report_status else None,
+        )
+
+
+def update_incident_next_deadline(incident, sr_workflow_id, deadline):
+    # update() is used to not trigger the post_save signal of the incident
+    incident.next_sector_regulation_workflow_id = sr_workflow_id
+    incident.next_deadline = deadline
+    Incident.objects.filter(pk=incident.pk).update(
+        next_sector_regulation_workflow_id=sr_workflow_id,
+        next_deadline=deadline,
+    )
+
+
+def rebuild_incident_report_status(incidents):
+    """Recompute the stored report statuses of a queryset of incidents."""
+    count = 0
+    for incident in incidents.select_related("sector_regulation").iterator():
+        refresh_incident_report_status(incident)
+        count += 1
+    return count
+
+
+def get_incidents_report_statuses(incidents):
+    """Return the report statuses grouped by incident id.
+
+    The stored statuses are read without writing: the statuses of the incidents
+    which are missing or which do not follow the reports of their workflow
+    (until they are rebuilt by rebuild_sector_regulation_incidents) are
+    computed in memory.
+    """
+    incidents = list(incidents)
+    report_statuses = OrderedDict((incident.id, []) for incident in incidents)
+    queryset = (
+        IncidentReportStatus.objects.filter(incident_id__in=report_statuses.keys())
+        .select_related("workflow", "latest_incident_workflow")
+        .prefetch_related("workflow__translations")
+        .order_by("incident_id", "position", "sector_regulation_workflow_id")
+    )
+    for report_status in queryset:
+        report_statuses[report_status.incident_id].append(report_status)
+
+    computed_statuses = []
+    for incident in incidents:
+        if incident.sector_regulation_id is None:
+            continue
+        report_chain = get_report_chain(incident.sector_regulation_id)
+        if [
+            rs.sector_regulation_workflow_id for rs in report_statuses[incident.id]
+        ] != [step.id for step in report_chain]:
+            report_statuses[incident.id] = compute_incident_report_statuses(incident)
+            computed_statuses.extend(report_statuses[incident.id])
+    prefetch_related_objects(computed_statuses, "workflow__translations")
+
+    return report_statuses
+
+
+def get_latest_incident_workflows(incident_ids, workflow):
+    """Return the latest report of the workflow of each incident, by incident id.
+
+    The reports are fetched in one DISTINCT ON query, with their timeline,
+    answers and impacts loaded in a fixed number of queries.
+    """
+    incident_workflows = (
+        IncidentWorkflow.objects.filter(incident_id__in=incident_ids, workflow=workflow)
+        .order_by("incident_id", "-timestamp")
+        .distinct("incident_id")
+        .select_related("report_timeline", "workflow")
+        .prefetch_related(
+            "workflow__translations",
+            "answer_set__question_options__question__translations",
+            "answer_set__predefined_answers__translations",
+            "impacts__translations",
+            "impacts__sectors__translations",
+        )
+    )
+    return {
+        incident_workflow.incident_id: incident_workflow
+        for incident_workflow in incident_workflows
+    }
+
+
+def get_incident_email_reminders_due_dates(incident):
+    """Return the due date of the reminder emails of an incident, by
+    SectorRegulationWorkflowEmail id.
+
+    - DETEC_DATE: detection date + delay, while the report is not submitted
+    - PREV_WORK: first submission of the previous report + delay, while the
+      report is not submitted
+    - NOTIF_DATE: first submission of the report + delay
+    """
+    if incident.incident_status != "GOING" or incident.sector_regulation_id is None:
+        return {}
+
+    report_chain = get_report_chain(incident.sector_regulation_id)
+    first_incident_workflows = {
+        incident_workflow.workflow_id: incident_workflow
+        for incident_workflow in incident.get_latest_incident_workflows(
+            timestamp_order="timestamp"
+        )
+    }
+    emails = {}
+    for email in SectorRegulationWorkflowEmail.objects.filter(
+        sector_regulation_workflow__sector_regulation_id=incident.sector_regulation_id
+    ).only("id", "sector_regulation_workflow_id", "trigger_event", "delay_in_hours"):
+        emails.setdefault(
+            (email.sector_regulation_workflow_id, email.trigger_event), []
+        ).append(email)
+
+    due_dates = {}
+
+    def schedule(step, trigger_event, date):
+        for email in emails.get((step.id, trigger_event), []):
+            due_dates[email.id] = date + timedelta(hours=email.delay_in_hours)
+
+    for step in report_chain:
+        incident_workflow = first_incident_workflows.get(step.workflow_id)
+        if incident_workflow is None:
+            if incident.incident_detection_date is not None:
+                schedule(step, "DETEC_DATE", incident.incident_detection_date)
+            continue
+
+        schedule(step, "NOTIF_DATE", incident_workflow.timestamp)
+        next_step = report_chain.get_next_step(step.workflow_id)
+        if (
+            next_step is not None
+            and next_step.workflow_id not in first_incident_workflows
+        ):
+            schedule(next_step, "PREV_WORK", incident_workflow.timestamp)
+
+    return due_dates
+
+
+def refresh_incident_email_reminders(incident):
+    """Update the scheduled reminder emails of an incident.
+
+    A reminder which is sent stays sent while its due date does not change.
+    """
+    due_dates = get_incident_email_reminders_due_dates(incident)
+    reminders = {
+        reminder.sector_regulation_workflow_email_id: reminder
+        for reminder in IncidentEmailReminder.objects.filter(incident=incident)
+    }
+
+    with transaction.atomic():
+        # the reminders which do not apply anymore, the sent ones are kept
+        IncidentEmailReminder.objects.filter(
+            pk__in=[
+                reminder.pk
+                for email_id, reminder in reminders.items()
+                if email_id not in due_dates and reminder.sent_at is None
+            ]
+        ).delete()
+
+        to_update = []
+        to_create = []
+        for email_id, due_date in due_dates.items():
+            reminder = reminders.get(email_id)
+            if reminder is None:
+                to_create.append(
+                    IncidentEmailReminder(
+                        incident=incident,
+                        sector_regulation_workflow_email_id=email_id,
+                        due_date=due_date,
+                    )
+                )
+            elif reminder.due_date != due_date:
+                reminder.due_date = due_date
+                reminder.sent_at = None
+                reminder.is_skipped = False
+                to_update.append(reminder)
+
+        IncidentEmailReminder.objects.bulk_create(to_create)
+        IncidentEmailReminder.objects.bulk_update(
+            to_update, ["due_date", "sent_at", "is_skipped"]
+        )
+
+
+def rebuild_incident_email_reminders(incidents):
+    """Update the scheduled reminder emails of a queryset of incidents."""
+    count = 0
+    for incident in incidents.iterator():
+        refresh_incident_email_reminders(incident)
+        count += 1
+    return count
+
+
+# the reports or the reminder emails of a workflow are edited in the admin, the
+# incidents of the workflow are updated in a celery task
+@shared_task(name="rebuild_sector_regulation_incidents")
+def rebuild_sector_regulation_incidents(sector_regulation_id, report_status=True):
+    if report_status:
+        invalidate_report_chain(sector_regulation_id)
+        rebuild_incident_report_status(
+            Incident.objects.filter(sector_regulation_id=sector_regulation_id)
+        )
+    rebuild_incident_email_reminders(
+        Incident.objects.filter(
+            sector_regulation_id=sector_regulation_id, incident_status="GOING"
+        )
+    )
@@ -0,0 +1,105 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils import translation
+from markdown import markdown
+
+from governanceplatform.helpers import (
+    render_to_string_multi_languages,
+    sanitize_html,
+)
+from incidents.email import replace_email_variables
+from incidents.models import Email, Incident
+
+
+# rendering of render_to_string_multi_languages before the cache of the HTML
+def legacy_render(template_name, context, content, object):
+    parts = []
+    with translation.override(settings.LANGUAGE_CODE):
+        context["content"] = replace_email_variables(
+            content.safe_translation_getter(
+                "content", language_code=settings.LANGUAGE_CODE
+            ),
+            object,
+        )
+        baseline = render_to_string(template_name, context)
+
+    for lang_code, lang_name in settings.LANGUAGES:
+        with translation.override(lang_code):
+            context["content"] = replace_email_variables(
+                content.safe_translation_getter("content", language_code=lang_code),
+                object,
+            )
+            context["content"] = markdown(text=context["content"], output_format="html")
+            context["content"] = sanitize_html(context["content"])
+            rendered = render_to_string(template_name, context)
+            if rendered == baseline and lang_code not in settings.LANGUAGE_CODE:
+                continue
+            parts.append(f"<h3>{lang_name} ({lang_code})</h3>{rendered}")
+    return "<hr>".join(parts) or baseline
+
+
+def cached_render(template_name, context, content, object):
+    return render_to_string_multi_languages(
+        template_name,
+        context,
+        replace_email_variables,
+        content=content,
+        object=object,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the number of emails rendered per second before and after the "
+        "cache of the HTML of the email contents, on the existing incidents"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--number",
+            type=int,
+            default=200,
+            help="number of emails to render",
+        )
+        parser.add_argument(
+            "-e",
+            "--email",
+            type=int,
+            help="id of the email to render, the first email by default",
+        )
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        emails = Email.objects.all()
+        if options["email"]:
+            emails = emails.filter(pk=options["email"])
+        email = emails.first()
+        incidents = list(
+            Incident.objects.exclude(sector_regulation__isnull=True).order_by("-pk")[
+                :number
+            ]
+        )
+        if email is None or not incidents:
+            raise CommandError("An email and incidents are needed.")
+
+        for label, render in (("legacy", legacy_render), ("cached", cached_render)):
+            start = time.perf_counter()
+            for i in range(number):
+                incident = incidents[i % len(incidents)]
+                render(
+                    "incidents/email.html",
+                    {"content": None, "url_site": settings.PUBLIC_URL},
+                    email,
+                    incident,
+                )
+            duration = time.perf_counter() - start
+            self.stdout.write(
+                f"{label:8} {number / duration:9.1f} emails/s "
+                f"({duration * 1000 / number:.2f} ms per email)"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Benchmark done."))
@@ -0,0 +1,106 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from incidents.models import Incident
+from incidents.search import update_search_document
+
+
+# search of IncidentFilter before the search document
+def legacy_search(queryset, value):
+    return queryset.filter(
+        Q(incident_id__icontains=value)
+        | Q(contact_firstname__icontains=value)
+        | Q(contact_lastname__icontains=value)
+        | Q(technical_firstname__icontains=value)
+        | Q(technical_lastname__icontains=value)
+        | Q(company_name__icontains=value)
+        | Q(company__identifier__icontains=value)
+        | Q(company__name__icontains=value)
+        | Q(regulator__translations__name__icontains=value)
+        | Q(regulator__translations__full_name__icontains=value)
+        | Q(sector_regulation__regulation__translations__label__icontains=value)
+        | Q(affected_sectors__translations__name__icontains=value)
+    ).distinct()
+
+
+def search_document_search(queryset, value):
+    return queryset.filter(search_document__contains=value.lower())
+
+
+def random_word(length=8):
+    return "".join(random.choices(string.ascii_lowercase, k=length))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the duration of the legacy incident search and of the search "
+        "document on seeded incidents, the seeded incidents are rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--number",
+            type=int,
+            default=10000,
+            help="number of incidents to seed",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            default=5,
+            help="number of searches per term",
+        )
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        repeat = options["repeat"]
+
+        with transaction.atomic():
+            self.seed(number)
+            terms = ["0042", random_word(4), "zzzz"]
+            queryset = Incident.objects.all()
+
+            for term in terms:
+                results = {}
+                for label, search in (
+                    ("legacy", legacy_search),
+                    ("search document", search_document_search),
+                ):
+                    start = time.perf_counter()
+                    for _i in range(repeat):
+                        count = len(list(search(queryset, term).values_list("pk")))
+                    duration = (time.perf_counter() - start) / repeat
+                    results[label] = (duration, count)
+
+                for label, (duration, count) in results.items():
+                    self.stdout.write(
+                        f"{term!r:8} {label:16} {duration * 1000:9.2f} ms "
+                        f"({count} incidents)"
+                    )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Benchmark done, seeded data removed."))
+
+    def seed(self, number):
+        incidents = [
+            Incident(
+                incident_id=f"BENCH-SSS-SSS-{i:04d}-2005",
+                company_name=random_word(),
+                contact_firstname=random_word(),
+                contact_lastname=random_word(),
+                technical_firstname=random_word(),
+                technical_lastname=random_word(),
+            )
+            for i in range(number)
+        ]
+        Incident.objects.bulk_create(incidents, batch_size=1000)
+        update_search_document(Incident.objects.filter(incident_id__startswith="BENCH"))
+        self.stdout.write(f"{number} incidents seeded.")
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from incidents.helpers import rebuild_incident_email_reminders
+from incidents.models import Incident, IncidentEmailReminder
+
+
+class Command(BaseCommand):
+    help = "Schedule the reminder emails of the ongoing incidents"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-i",
+            "--incident",
+            type=int,
+            action="append",
+            help="id of the incident to schedule (can be repeated), all by default",
+        )
+        parser.add_argument(
+            "--skip-due",
+            action="store_true",
+            help="do not send the reminders which are already due, e.g. when the "
+            "schedule is built for the first time",
+        )
+
+    def handle(self, *args, **options):
+        incidents = Incident.objects.filter(incident_status="GOING")
+        if options.get("incident"):
+            incidents = incidents.filter(id__in=options["incident"])
+
+        count = rebuild_incident_email_reminders(incidents)
+
+        if options["skip_due"]:
+            actual_time = timezone.now()
+            skipped_count = IncidentEmailReminder.objects.filter(
+                incident__in=incidents,
+                sent_at__isnull=True,
+                due_date__lte=actual_time,
+            ).update(sent_at=actual_time, is_skipped=True)
+            self.stdout.write(f"{skipped_count} due reminder(s) skipped.")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Reminder emails scheduled for {count} incident(s).")
+        )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from incidents.helpers import rebuild_incident_report_status
+from incidents.models import Incident
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored status of the reports used by the incidents overview"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-i",
+            "--incident",
+            type=int,
+            action="append",
+            help="id of the incident to rebuild (can be repeated), all by default",
+        )
+
+    def handle(self, *args, **options):
+        incidents = Incident.objects.all()
+        if options.get("incident"):
+            incidents = incidents.filter(id__in=options["incident"])
+
+        count = rebuild_incident_report_status(incidents)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Report statuses rebuilt for {count} incident(s).")
+        )
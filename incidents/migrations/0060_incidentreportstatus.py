@@ -0,0 +1,108 @@
+# Generated by Django 6.0.4 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("incidents", "0059_alter_emailtranslation_unique_together_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IncidentReportStatus",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "position",
+                    models.IntegerField(
+                        blank=True, default=0, null=True, verbose_name="Position"
+                    ),
+                ),
+                (
+                    "review_status",
+                    models.CharField(
+                        choices=[
+                            ("UNDE", "Unsubmitted"),
+                            ("DELIV", "Under review"),
+                            ("PASS", "Passed"),
+                            ("FAIL", "Revision required"),
+                            ("OUT", "Submission overdue"),
+                            ("LATE", "Late submission"),
+                        ],
+                        default="UNDE",
+                        max_length=5,
+                        verbose_name="Report status",
+                    ),
+                ),
+                (
+                    "deadline",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Deadline"
+                    ),
+                ),
+                (
+                    "incident",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="report_statuses",
+                        to="incidents.incident",
+                        verbose_name="Incident",
+                    ),
+                ),
+                (
+                    "latest_incident_workflow",
+                    models.ForeignKey(
+                        blank=True,
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="incidents.incidentworkflow",
+                        verbose_name="Latest incident report",
+                    ),
+                ),
+                (
+                    "sector_regulation_workflow",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="incidents.sectorregulationworkflow",
+                        verbose_name="Report",
+                    ),
+                ),
+                (
+                    "workflow",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="incidents.workflow",
+                        verbose_name="Incident report",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Report status",
+                "verbose_name_plural": "Report statuses",
+                "indexes": [
+                    models.Index(
+                        fields=["incident", "position"],
+                        name="incidentreportstatus_pos_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("incident", "sector_regulation_workflow"),
+                        name="Unique_IncidentReportStatus",
+                    )
+                ],
+            },
+        ),
+    ]
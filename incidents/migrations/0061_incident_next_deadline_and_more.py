@@ -0,0 +1,34 @@
+# Generated by Django 6.0.4 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("incidents", "0060_incidentreportstatus"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="incident",
+            name="next_deadline",
+            field=models.DateTimeField(
+                blank=True, db_index=True, null=True, verbose_name="Next deadline"
+            ),
+        ),
+        migrations.AddField(
+            model_name="incident",
+            name="next_sector_regulation_workflow",
+            field=models.ForeignKey(
+                blank=True,
+                default=None,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="incidents.sectorregulationworkflow",
+                verbose_name="Next report",
+            ),
+        ),
+    ]
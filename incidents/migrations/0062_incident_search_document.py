@@ -0,0 +1,122 @@
+# Generated by Django 6.0.4 on 2026-10-18 11:20
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+from django.db.models import CharField, OuterRef, StringAgg, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Lower
+
+# the search document as defined by incidents.search when this migration was
+# written, later changes of incidents.search do not change this migration
+SEARCH_DOCUMENT_SEPARATOR = "\n"
+
+
+def join(*expressions):
+    values = []
+    for expression in expressions:
+        if values:
+            values.append(Value(SEARCH_DOCUMENT_SEPARATOR))
+        values.append(Coalesce(expression, Value(""), output_field=CharField()))
+    if len(values) == 1:
+        return values[0]
+    return Concat(*values, output_field=CharField())
+
+
+def aggregate(queryset, group_by, fields):
+    return Subquery(
+        queryset.values(group_by)
+        .annotate(
+            document=StringAgg(
+                join(*fields), Value(SEARCH_DOCUMENT_SEPARATOR), distinct=True
+            )
+        )
+        .values("document")[:1],
+        output_field=CharField(),
+    )
+
+
+def populate_search_document(apps, schema_editor):
+    Incident = apps.get_model("incidents", "Incident")
+    Company = apps.get_model("governanceplatform", "Company")
+    RegulatorTranslation = apps.get_model("governanceplatform", "RegulatorTranslation")
+    RegulationTranslation = apps.get_model(
+        "governanceplatform", "RegulationTranslation"
+    )
+    SectorTranslation = apps.get_model("governanceplatform", "SectorTranslation")
+
+    Incident.objects.update(
+        search_document=Lower(
+            join(
+                "incident_id",
+                "contact_firstname",
+                "contact_lastname",
+                "technical_firstname",
+                "technical_lastname",
+                "company_name",
+                aggregate(
+                    Company.objects.filter(pk=OuterRef("company_id")),
+                    "pk",
+                    ["identifier", "name"],
+                ),
+                aggregate(
+                    RegulatorTranslation.objects.filter(
+                        master_id=OuterRef("regulator_id")
+                    ),
+                    "master_id",
+                    ["name", "full_name"],
+                ),
+                aggregate(
+                    RegulationTranslation.objects.filter(
+                        master__sectorregulation=OuterRef("sector_regulation_id")
+                    ),
+                    "master_id",
+                    ["label"],
+                ),
+                aggregate(
+                    SectorTranslation.objects.filter(master__incident=OuterRef("pk")),
+                    "master__incident",
+                    ["name"],
+                ),
+            )
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "governanceplatform",
+            "0060_alter_entitycategorytranslation_unique_together_and_more",
+        ),
+        ("incidents", "0061_incident_next_deadline_and_more"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="incident",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(populate_search_document, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="incident",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_document"],
+                name="incident_search_document_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="incident",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("incident_id"),
+                    name="gin_trgm_ops",
+                ),
+                name="incident_incident_id_trgm",
+            ),
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 6.0.4 on 2026-10-18 14:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "governanceplatform",
+            "0060_alter_entitycategorytranslation_unique_together_and_more",
+        ),
+        ("incidents", "0062_incident_search_document"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IncidentExport",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("from_date", models.DateField(verbose_name="From date")),
+                ("to_date", models.DateField(verbose_name="To date")),
+                (
+                    "file_format",
+                    models.CharField(
+                        choices=[("xlsx", "Excel (.xlsx)"), ("csv", "CSV (.csv)")],
+                        default="xlsx",
+                        max_length=5,
+                        verbose_name="File format",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("RUNNING", "Running"),
+                            ("DONE", "Done"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="PENDING",
+                        max_length=10,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "file_name",
+                    models.CharField(
+                        blank=True, default="", max_length=255, verbose_name="File name"
+                    ),
+                ),
+                (
+                    "total_count",
+                    models.IntegerField(default=0, verbose_name="Number of incidents"),
+                ),
+                (
+                    "row_count",
+                    models.IntegerField(
+                        default=0, verbose_name="Number of exported rows"
+                    ),
+                ),
+                (
+                    "error",
+                    models.TextField(blank=True, default="", verbose_name="Error"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        db_index=True,
+                        default=django.utils.timezone.now,
+                        verbose_name="Creation date",
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="End date"
+                    ),
+                ),
+                (
+                    "regulation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="governanceplatform.regulation",
+                        verbose_name="Legal basis",
+                    ),
+                ),
+                (
+                    "sector_regulation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="incidents.sectorregulation",
+                        verbose_name="Workflow",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+                (
+                    "workflow",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="incidents.workflow",
+                        verbose_name="Incident report",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Incident export",
+                "verbose_name_plural": "Incident exports",
+            },
+        ),
+    ]
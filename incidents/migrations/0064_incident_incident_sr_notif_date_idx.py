@@ -0,0 +1,20 @@
+# Generated by Django 6.0.4 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("incidents", "0063_incidentexport"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="incident",
+            index=models.Index(
+                fields=["sector_regulation", "incident_notification_date"],
+                name="incident_sr_notif_date_idx",
+            ),
+        ),
+    ]
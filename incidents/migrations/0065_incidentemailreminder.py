@@ -0,0 +1,71 @@
+# Generated by Django 6.0.4 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("incidents", "0064_incident_incident_sr_notif_date_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IncidentEmailReminder",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("due_date", models.DateTimeField(verbose_name="Due date")),
+                (
+                    "sent_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Sent at"),
+                ),
+                (
+                    "is_skipped",
+                    models.BooleanField(default=False, verbose_name="Skipped"),
+                ),
+                (
+                    "incident",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="email_reminders",
+                        to="incidents.incident",
+                        verbose_name="Incident",
+                    ),
+                ),
+                (
+                    "sector_regulation_workflow_email",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="incidents.sectorregulationworkflowemail",
+                        verbose_name="Reminder email",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Scheduled reminder email",
+                "verbose_name_plural": "Scheduled reminder emails",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("sent_at__isnull", True)),
+                        fields=["due_date"],
+                        name="incidentemailreminder_due_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("incident", "sector_regulation_workflow_email"),
+                        name="Unique_IncidentEmailReminder",
+                    )
+                ],
+            },
+        ),
+    ]
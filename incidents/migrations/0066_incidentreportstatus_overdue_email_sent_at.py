@@ -0,0 +1,20 @@
+# Generated by Django 6.0.4 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("incidents", "0065_incidentemailreminder"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="incidentreportstatus",
+            name="overdue_email_sent_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Overdue email sent at"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.4 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("incidents", "0067_outgoingemail"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="incidentreportstatus",
+            index=models.Index(
+                condition=models.Q(
+                    ("latest_incident_workflow__isnull", True),
+                    ("overdue_email_sent_at__isnull", True),
+                ),
+                fields=["deadline"],
+                name="incidentreportstatus_due_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.4 on 2026-10-18 21:12
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+# the tickets created twice for the same incident and observer are removed,
+# the first one is kept
+def remove_duplicate_tickets(apps, schema_editor):
+    RTTicket = apps.get_model("incidents", "RTTicket")
+    first_ticket_ids = (
+        RTTicket.objects.values("incident_id", "observer_id")
+        .annotate(first_id=Min("id"))
+        .values("first_id")
+    )
+    RTTicket.objects.exclude(id__in=first_ticket_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("incidents", "0068_incidentreportstatus_incidentreportstatus_due_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="rtticket",
+            name="ticket_id",
+            field=models.CharField(blank=True, default="", max_length=50),
+        ),
+        migrations.RunPython(remove_duplicate_tickets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="rtticket",
+            constraint=models.UniqueConstraint(
+                fields=("incident", "observer"), name="Unique_RTTicket"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.4 on 2026-10-18 23:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("incidents", "0069_rtticket_unique"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="incident",
+            name="incident_incident_id_trgm",
+        ),
+    ]
@@ -1,7 +1,8 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import pytz
 from django.contrib import admin
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.db.models import Deferrable
 from django.utils import timezone
@@ -12,12 +13,16 @@ from governanceplatform.settings import TIME_ZONE
 
 from .globals import (
     INCIDENT_EMAIL_TRIGGER_EVENT,
+    INCIDENT_EXPORT_FILE_FORMATS,
+    INCIDENT_EXPORT_STATUS,
     INCIDENT_STATUS,
+    OUTGOING_EMAIL_STATUS,
     QUESTION_TYPES,
     REVIEW_STATUS,
     SECTOR_REGULATION_WORKFLOW_TRIGGER_EVENT,
     WORKFLOW_REVIEW_STATUS,
 )
+from .report_chain import get_report_chain
 
 
 # impacts of the incident, they are linked to sector
@@ -415,18 +420,12 @@ class SectorRegulationWorkflow(models.Model):
         )
 
     def get_previous_report(self):
-        previous = (
-            SectorRegulationWorkflow.objects.all()
-            .filter(
-                sector_regulation=self.sector_regulation,
-                position__lt=self.position,
-            )
-            .order_by("-position")
-            .first()
+        previous = get_report_chain(self.sector_regulation_id).get_previous_step(
+            self.workflow_id
         )
 
         if previous is not None:
-            return previous
+            return SectorRegulationWorkflow.objects.get(pk=previous.id)
         return False
 
     # calculates the time between an incident update and actual_time
@@ -452,12 +451,14 @@ class SectorRegulationWorkflow(models.Model):
 
         # previous incident_workflow
         elif trigger_event == "PREV_WORK":
-            prev_workflow = self.get_previous_report()
-            if prev_workflow:
+            prev_step = get_report_chain(self.sector_regulation_id).get_previous_step(
+                self.workflow_id
+            )
+            if prev_step:
                 previous_incident_workflow = (
                     IncidentWorkflow.objects.filter(
                         incident=incident,
-                        workflow=prev_workflow.workflow,
+                        workflow_id=prev_step.workflow_id,
                     )
                     .order_by("-timestamp")
                     .first()
@@ -635,6 +636,22 @@ class Incident(models.Model):
         blank=False,
         default=INCIDENT_STATUS[1][0],
     )
+    # next report to submit and its deadline, updated with the report statuses
+    # (see helpers.refresh_incident_report_status)
+    next_sector_regulation_workflow = models.ForeignKey(
+        SectorRegulationWorkflow,
+        verbose_name=_("Next report"),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        default=None,
+        related_name="+",
+    )
+    next_deadline = models.DateTimeField(
+        verbose_name=_("Next deadline"), blank=True, null=True, db_index=True
+    )
+    # values searched by IncidentFilter in lower case (see search.py)
+    search_document = models.TextField(blank=True, default="", editable=False)
 
     # update the incident_last_update of incident
     def save(self, *args, **kwargs):
@@ -745,49 +762,21 @@ class Incident(models.Model):
         return incident_workflow
 
     def get_previous_workflow(self, workflow):
-        current = (
-            SectorRegulationWorkflow.objects.all()
-            .filter(
-                sector_regulation=self.sector_regulation,
-                workflow=workflow,
-            )
-            .first()
-        )
-
-        previous = (
-            SectorRegulationWorkflow.objects.all()
-            .filter(
-                sector_regulation=self.sector_regulation,
-                position__lt=current.position,
-            )
-            .order_by("-position")
-            .first()
+        previous = get_report_chain(self.sector_regulation_id).get_previous_step(
+            workflow.id
         )
 
         if previous is not None:
-            return previous
+            return SectorRegulationWorkflow.objects.get(pk=previous.id)
         return False
 
     # check if the previous workflow is filled and no next workflow filled
     def is_fillable(self, workflow):
         if self.incident_status != "CLOSE":
-            current = (
-                SectorRegulationWorkflow.objects.all()
-                .filter(
-                    sector_regulation=self.sector_regulation,
-                    workflow=workflow,
-                )
-                .first()
-            )
-            previous = (
-                SectorRegulationWorkflow.objects.all()
-                .filter(
-                    sector_regulation=self.sector_regulation,
-                    position__lt=current.position,
-                )
-                .order_by("-position")
-                .first()
-            )
+            report_chain = get_report_chain(self.sector_regulation_id)
+            if report_chain.get_step(workflow.id) is None:
+                return False
+            previous = report_chain.get_previous_step(workflow.id)
             # i am first
             if previous is None:
                 # check if there are other record than me
@@ -797,9 +786,9 @@ class Incident(models.Model):
                         incident=self,
                     )
                     .exclude(workflow=workflow)
-                    .first()
+                    .exists()
                 )
-                if existing_workflow is None:
+                if not existing_workflow:
                     return True
             # i am not first
             else:
@@ -807,68 +796,33 @@ class Incident(models.Model):
                     IncidentWorkflow.objects.all()
                     .filter(
                         incident=self,
-                        workflow=previous.workflow,
+                        workflow_id=previous.workflow_id,
                     )
-                    .first()
+                    .exists()
                 )
-                if previous_incident_workflow is not None:
-                    next_workflows = (
-                        SectorRegulationWorkflow.objects.all()
-                        .filter(
-                            sector_regulation=self.sector_regulation,
-                            position__gt=current.position,
-                        )
-                        .order_by("-position")
-                        .values_list("workflow", flat=True)
-                    )
+                if previous_incident_workflow:
+                    next_workflows = [
+                        step.workflow_id
+                        for step in report_chain.get_next_steps(workflow.id)
+                    ]
                     next_incident_workflows = (
                         IncidentWorkflow.objects.all()
                         .filter(
                             incident=self,
-                            workflow__in=next_workflows,
+                            workflow_id__in=next_workflows,
                         )
-                        .first()
+                        .exists()
                     )
                     # There are previous and no next sor we are good
-                    if next_incident_workflows is None:
+                    if not next_incident_workflows:
                         return True
             return False
         return False
 
-    # calculate the deadline of the incident
+    # deadline of the next report, stored with the status of the reports (see
+    # incidents.helpers.refresh_incident_report_status)
     def get_deadline(self):
-        next_srw = self.get_next_sector_regulation_workflow()
-        if next_srw is None:
-            return None
-        else:
-            deadline = None
-            if (
-                next_srw.trigger_event_before_deadline is not None
-                and next_srw.delay_in_hours_before_deadline is not None
-            ):
-                if next_srw.trigger_event_before_deadline == "DETECT_DATE":
-                    if self.incident_detection_date is not None:
-                        deadline = self.incident_detection_date + timedelta(
-                            hours=next_srw.delay_in_hours_before_deadline
-                        )
-                elif next_srw.trigger_event_before_deadline == "NOTIF_DATE":
-                    deadline = self.incident_notification_date + timedelta(
-                        hours=next_srw.delay_in_hours_before_deadline
-                    )
-                elif next_srw.trigger_event_before_deadline == "PREV_WORK":
-                    previous_workflow = self.get_previous_workflow(next_srw.workflow)
-                    if previous_workflow:
-                        previous_incident_workflow = (
-                            IncidentWorkflow.objects.all()
-                            .filter(incident=self, workflow=previous_workflow.workflow)
-                            .order_by("-timestamp")
-                            .first()
-                        )
-                        if previous_incident_workflow is not None:
-                            deadline = previous_incident_workflow.timestamp + timedelta(
-                                hours=next_srw.delay_in_hours_before_deadline
-                            )
-            return deadline
+        return self.next_deadline
 
     @property
     def company_or_regulator_name(self):
@@ -886,6 +840,21 @@ class Incident(models.Model):
             return self.regulator
         return ""
 
+    class Meta:
+        indexes = [
+            # incidents of a workflow within a date range (exports)
+            models.Index(
+                fields=["sector_regulation", "incident_notification_date"],
+                name="incident_sr_notif_date_idx",
+            ),
+            # trigram index used by the substring searches (LIKE)
+            GinIndex(
+                fields=["search_document"],
+                name="incident_search_document_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
     class meta:
         verbose_name_plural = _("Incident")
         verbose_name = _("Incidents")
@@ -950,70 +919,45 @@ class IncidentWorkflow(models.Model):
         verbose_name = _("Incidents")
 
     def get_previous_workflow(self):
-        current = (
-            SectorRegulationWorkflow.objects.all()
-            .filter(
-                sector_regulation=self.incident.sector_regulation,
-                workflow=self.workflow,
-            )
-            .first()
-        )
-
-        if not current:
-            return False
-
-        previous = (
-            SectorRegulationWorkflow.objects.all()
-            .filter(
-                sector_regulation=self.incident.sector_regulation,
-                position__lt=current.position,
-            )
-            .order_by("-position")
-            .first()
-        )
+        previous = get_report_chain(
+            self.incident.sector_regulation_id
+        ).get_previous_step(self.workflow_id)
 
         if previous is not None:
-            return previous.workflow
+            return Workflow.objects.get(pk=previous.workflow_id)
         return False
 
     def get_next_workflow(self):
-        current = (
-            SectorRegulationWorkflow.objects.all()
-            .filter(
-                sector_regulation=self.incident.sector_regulation,
-                workflow=self.workflow,
-            )
-            .first()
-        )
-        if not current:
-            return False
-
-        next = (
-            SectorRegulationWorkflow.objects.all()
-            .filter(
-                sector_regulation=self.incident.sector_regulation,
-                position__gt=current.position,
-            )
-            .order_by("position")
-            .first()
+        next = get_report_chain(self.incident.sector_regulation_id).get_next_step(
+            self.workflow_id
         )
 
         if next is not None:
-            return next.workflow
+            return Workflow.objects.get(pk=next.workflow_id)
         return False
 
     # define is a submission is late or not
     def is_late(self):
-        report = SectorRegulationWorkflow.objects.filter(
-            workflow=self.workflow,
-            sector_regulation=self.incident.sector_regulation,
-        ).first()
+        report_chain = get_report_chain(self.incident.sector_regulation_id)
+        step = report_chain.get_step(self.workflow_id)
+        if step is None:
+            return False
+        # built from the cached chain to avoid a query
+        report = SectorRegulationWorkflow(
+            id=step.id,
+            sector_regulation_id=report_chain.sector_regulation_id,
+            workflow_id=step.workflow_id,
+            position=step.position,
+            trigger_event_before_deadline=step.trigger_event_before_deadline,
+            delay_in_hours_before_deadline=step.delay_in_hours_before_deadline,
+        )
         delay_in_hours = report.delay_in_hours_before_deadline
 
         dt = report.how_late_is_the_report(self.incident)
 
         if dt and dt.total_seconds() / 60 / 60 >= delay_in_hours:
             return True
+        return False
 
     def save(self, *args, **kwargs):
         if self.is_late() and self.review_status == WORKFLOW_REVIEW_STATUS[0][0]:
@@ -1023,6 +967,123 @@ class IncidentWorkflow(models.Model):
         super().save(*args, **kwargs)
 
 
+# status of each report of an incident, kept up to date when the incident,
+# its reports or the reports of the workflow change (see signals.py)
+# used to render the incidents overview without computing the status per report
+class IncidentReportStatus(models.Model):
+    incident = models.ForeignKey(
+        Incident,
+        on_delete=models.CASCADE,
+        verbose_name=_("Incident"),
+        related_name="report_statuses",
+    )
+    sector_regulation_workflow = models.ForeignKey(
+        SectorRegulationWorkflow,
+        on_delete=models.CASCADE,
+        verbose_name=_("Report"),
+    )
+    workflow = models.ForeignKey(
+        Workflow,
+        on_delete=models.CASCADE,
+        verbose_name=_("Incident report"),
+    )
+    position = models.IntegerField(
+        verbose_name=_("Position"), blank=True, default=0, null=True
+    )
+    latest_incident_workflow = models.ForeignKey(
+        IncidentWorkflow,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        default=None,
+        verbose_name=_("Latest incident report"),
+    )
+    review_status = models.CharField(
+        verbose_name=_("Report status"),
+        max_length=5,
+        choices=WORKFLOW_REVIEW_STATUS,
+        blank=False,
+        default=WORKFLOW_REVIEW_STATUS[0][0],
+    )
+    # deadline of the report when it has not been submitted yet
+    deadline = models.DateTimeField(verbose_name=_("Deadline"), blank=True, null=True)
+    # the overdue email of the report is sent once by workflow_update_status
+    overdue_email_sent_at = models.DateTimeField(
+        verbose_name=_("Overdue email sent at"), blank=True, null=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["incident", "sector_regulation_workflow"],
+                name="Unique_IncidentReportStatus",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["incident", "position"], name="incidentreportstatus_pos_idx"
+            ),
+            # reports not submitted whose overdue email is not sent
+            models.Index(
+                fields=["deadline"],
+                name="incidentreportstatus_due_idx",
+                condition=models.Q(
+                    latest_incident_workflow__isnull=True,
+                    overdue_email_sent_at__isnull=True,
+                ),
+            ),
+        ]
+        verbose_name_plural = _("Report statuses")
+        verbose_name = _("Report status")
+
+    # the overdue status depends on the current time, so it is not stored
+    def get_status(self, actual_time=None):
+        if self.latest_incident_workflow_id is not None:
+            return self.review_status
+        if actual_time is None:
+            actual_time = timezone.now()
+        if self.deadline is not None and actual_time >= self.deadline:
+            return "OUT"
+        return WORKFLOW_REVIEW_STATUS[0][0]
+
+
+# reminder email of an incident, scheduled when the incident and its reports
+# change and sent by the email_reminder script once it is due
+class IncidentEmailReminder(models.Model):
+    incident = models.ForeignKey(
+        Incident,
+        on_delete=models.CASCADE,
+        verbose_name=_("Incident"),
+        related_name="email_reminders",
+    )
+    sector_regulation_workflow_email = models.ForeignKey(
+        SectorRegulationWorkflowEmail,
+        on_delete=models.CASCADE,
+        verbose_name=_("Reminder email"),
+    )
+    due_date = models.DateTimeField(verbose_name=_("Due date"))
+    sent_at = models.DateTimeField(verbose_name=_("Sent at"), blank=True, null=True)
+    # not sent because it was due before the catch-up period
+    is_skipped = models.BooleanField(verbose_name=_("Skipped"), default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["incident", "sector_regulation_workflow_email"],
+                name="Unique_IncidentEmailReminder",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["due_date"],
+                name="incidentemailreminder_due_idx",
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+        verbose_name_plural = _("Scheduled reminder emails")
+        verbose_name = _("Scheduled reminder email")
+
+
 # record who has read the reports
 class LogReportRead(models.Model):
     user = models.ForeignKey(
@@ -1063,6 +1124,111 @@ class LogReportRead(models.Model):
             self.incident.save(update_fields=["incident_last_update"])
 
 
+# mass export of incidents, generated by a celery job
+class IncidentExport(models.Model):
+    user = models.ForeignKey(
+        "governanceplatform.User",
+        on_delete=models.CASCADE,
+        verbose_name=_("User"),
+    )
+    regulation = models.ForeignKey(
+        "governanceplatform.Regulation",
+        on_delete=models.CASCADE,
+        verbose_name=_("Legal basis"),
+    )
+    sector_regulation = models.ForeignKey(
+        SectorRegulation,
+        on_delete=models.CASCADE,
+        verbose_name=_("Workflow"),
+    )
+    workflow = models.ForeignKey(
+        Workflow,
+        on_delete=models.CASCADE,
+        verbose_name=_("Incident report"),
+    )
+    from_date = models.DateField(verbose_name=_("From date"))
+    to_date = models.DateField(verbose_name=_("To date"))
+    file_format = models.CharField(
+        verbose_name=_("File format"),
+        max_length=5,
+        choices=INCIDENT_EXPORT_FILE_FORMATS,
+        default=INCIDENT_EXPORT_FILE_FORMATS[0][0],
+    )
+    status = models.CharField(
+        verbose_name=_("Status"),
+        max_length=10,
+        choices=INCIDENT_EXPORT_STATUS,
+        default=INCIDENT_EXPORT_STATUS[0][0],
+    )
+    # name of the file in the private storage of the exports
+    file_name = models.CharField(
+        verbose_name=_("File name"), max_length=255, blank=True, default=""
+    )
+    total_count = models.IntegerField(verbose_name=_("Number of incidents"), default=0)
+    row_count = models.IntegerField(
+        verbose_name=_("Number of exported rows"), default=0
+    )
+    error = models.TextField(verbose_name=_("Error"), blank=True, default="")
+    created_at = models.DateTimeField(
+        verbose_name=_("Creation date"), default=timezone.now, db_index=True
+    )
+    finished_at = models.DateTimeField(
+        verbose_name=_("End date"), blank=True, null=True
+    )
+
+    class Meta:
+        verbose_name_plural = _("Incident exports")
+        verbose_name = _("Incident export")
+
+    def __str__(self):
+        return f"{self.sector_regulation} - {self.workflow} ({self.created_at})"
+
+    @property
+    def progress(self):
+        if self.status == "DONE":
+            return 100
+        if not self.total_count:
+            return 0
+        return min(99, int(self.row_count * 100 / self.total_count))
+
+
+# emails written in the transaction of the change which triggers them and
+# sent by a celery job (see incidents.scripts.email_outbox)
+class OutgoingEmail(models.Model):
+    subject = models.TextField(verbose_name=_("Subject"))
+    content = models.TextField(verbose_name=_("Content"))
+    recipients = models.JSONField(verbose_name=_("Recipients"), default=list)
+    status = models.CharField(
+        verbose_name=_("Status"),
+        max_length=10,
+        choices=OUTGOING_EMAIL_STATUS,
+        default=OUTGOING_EMAIL_STATUS[0][0],
+    )
+    attempts = models.IntegerField(verbose_name=_("Attempts"), default=0)
+    next_attempt_at = models.DateTimeField(
+        verbose_name=_("Next attempt"), default=timezone.now
+    )
+    last_error = models.TextField(verbose_name=_("Last error"), blank=True, default="")
+    created_at = models.DateTimeField(
+        verbose_name=_("Creation date"), default=timezone.now, db_index=True
+    )
+    sent_at = models.DateTimeField(verbose_name=_("Sent at"), blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="outgoingemail_pending_idx",
+                condition=models.Q(status="PENDING"),
+            ),
+        ]
+        verbose_name_plural = _("Outgoing emails")
+        verbose_name = _("Outgoing email")
+
+    def __str__(self):
+        return self.subject
+
+
 class QuestionCategoryOptions(models.Model):
     question_category = models.ForeignKey(QuestionCategory, on_delete=models.CASCADE)
     position = models.IntegerField(verbose_name=_("Position"))
@@ -1181,8 +1347,17 @@ class Answer(models.Model):
 
 class RTTicket(models.Model):
     incident = models.ForeignKey(Incident, on_delete=models.CASCADE)
-    ticket_id = models.CharField(max_length=50)
+    # empty until the ticket is created in RT (see incidents.rt)
+    ticket_id = models.CharField(max_length=50, blank=True, default="")
     observer = models.ForeignKey(
         "governanceplatform.Observer", on_delete=models.CASCADE
     )
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["incident", "observer"],
+                name="Unique_RTTicket",
+            ),
+        ]
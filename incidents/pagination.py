@@ -0,0 +1,188 @@
+import base64
+import json
+import math
+from datetime import datetime
+
+from django.db import DatabaseError
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+
+CURSOR_VALUE_KEY = "cursor_value"
+
+
+def encode_cursor(sort_key, value, pk, reverse=False, number=1):
+    if isinstance(value, datetime):
+        value = {"datetime": value.isoformat()}
+    data = json.dumps([sort_key, value, pk, reverse, number], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor, sort_key):
+    """Return (value, pk, reverse, number) or None if the cursor is not valid
+    for sort_key, number is the number of the page the cursor leads to."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        cursor_sort_key, value, pk, reverse, number = data
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["datetime"])
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    if cursor_sort_key != sort_key or not isinstance(pk, int):
+        return None
+    if not isinstance(number, int) or number < 1:
+        return None
+    return value, pk, bool(reverse), number
+
+
+class CursorPage:
+    """Page of a CursorPaginator, with the same interface as a Django Page
+    for the list of objects and the navigation."""
+
+    def __init__(self, object_list, number, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class CursorPaginator:
+    """Keyset pagination on a field and the id, without COUNT(*) and OFFSET.
+
+    The objects are ordered by the field (nulls last) then by the id, in the
+    same direction, the previous pages are read in the opposite order (nulls
+    first). A cursor is only valid for the sort_key it was made for.
+    """
+
+    def __init__(
+        self,
+        queryset,
+        field,
+        direction="desc",
+        per_page=10,
+        is_string=False,
+        sort_key=None,
+        approximate_count=False,
+    ):
+        self.per_page = int(per_page)
+        self.descending = direction == "desc"
+        self.sort_key = sort_key or f"{field}:{direction}"
+        self.approximate_count = approximate_count
+        expression = Lower(field) if is_string else F(field)
+        self.queryset = queryset.annotate(**{CURSOR_VALUE_KEY: expression})
+        self._count = None
+
+    def _ordering(self, descending, nulls_last=True):
+        value = F(CURSOR_VALUE_KEY)
+        nulls = {"nulls_last": True} if nulls_last else {"nulls_first": True}
+        if descending:
+            return value.desc(**nulls), F("pk").desc()
+        return value.asc(**nulls), F("pk").asc()
+
+    def _after(self, value, pk, descending):
+        # objects after (value, pk) in the order, the null values are last
+        lookup = "lt" if descending else "gt"
+        if value is None:
+            return Q(**{f"{CURSOR_VALUE_KEY}__isnull": True, f"pk__{lookup}": pk})
+        return (
+            Q(**{f"{CURSOR_VALUE_KEY}__{lookup}": value})
+            | Q(**{CURSOR_VALUE_KEY: value, f"pk__{lookup}": pk})
+            | Q(**{f"{CURSOR_VALUE_KEY}__isnull": True})
+        )
+
+    def _before(self, value, pk, descending):
+        # objects before (value, pk) in the order, the null values are last:
+        # before a null value come the null values with a previous id, then
+        # all the other values
+        lookup = "gt" if descending else "lt"
+        if value is None:
+            return Q(**{f"{CURSOR_VALUE_KEY}__isnull": True, f"pk__{lookup}": pk}) | Q(
+                **{f"{CURSOR_VALUE_KEY}__isnull": False}
+            )
+        return Q(**{f"{CURSOR_VALUE_KEY}__{lookup}": value}) | Q(
+            **{CURSOR_VALUE_KEY: value, f"pk__{lookup}": pk}
+        )
+
+    def _make_cursor(self, obj, number, reverse=False):
+        return encode_cursor(
+            self.sort_key, getattr(obj, CURSOR_VALUE_KEY), obj.pk, reverse, number
+        )
+
+    @property
+    def count(self):
+        if self._count is None:
+            self._count = (
+                self.get_approximate_count()
+                if self.approximate_count
+                else self.queryset.count()
+            )
+        return self._count
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def get_approximate_count(self):
+        """Number of rows estimated by the PostgreSQL planner."""
+        try:
+            plan = json.loads(self.queryset.explain(format="json"))
+            return int(plan[0]["Plan"]["Plan Rows"])
+        except (DatabaseError, ValueError, TypeError, KeyError, IndexError):
+            return self.queryset.count()
+
+    def get_page(self, cursor=None):
+        decoded = decode_cursor(cursor, self.sort_key) if cursor else None
+        queryset = self.queryset
+        reverse = False
+        number = 1
+
+        if decoded is not None:
+            value, pk, reverse, number = decoded
+            if reverse:
+                queryset = queryset.filter(self._before(value, pk, self.descending))
+            else:
+                queryset = queryset.filter(self._after(value, pk, self.descending))
+
+        # one more object to know if there is a page after this one, the
+        # previous pages are read backward from the cursor
+        ordering = self._ordering(self.descending != reverse, nulls_last=not reverse)
+        objects = list(queryset.order_by(*ordering)[: self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[: self.per_page]
+        if reverse:
+            objects.reverse()
+
+        next_cursor = previous_cursor = None
+        if objects:
+            if has_more or reverse:
+                next_cursor = self._make_cursor(objects[-1], number + 1)
+            if decoded is not None and (has_more or not reverse):
+                previous_cursor = self._make_cursor(
+                    objects[0], max(number - 1, 1), reverse=True
+                )
+
+        return CursorPage(objects, number, self, next_cursor, previous_cursor)
@@ -0,0 +1,109 @@
+from governanceplatform.settings import REPORT_CHAIN_CACHE_TIMEOUT
+from governanceplatform.shared_cache import delete_cached, get_cached
+
+REPORT_CHAIN_CACHE_KEY = "incidents_report_chain_{}"
+
+
+class ReportChainStep:
+    """A report of a workflow (SectorRegulationWorkflow) without its relations."""
+
+    __slots__ = (
+        "id",
+        "workflow_id",
+        "position",
+        "trigger_event_before_deadline",
+        "delay_in_hours_before_deadline",
+    )
+
+    def __init__(
+        self,
+        id,
+        workflow_id,
+        position,
+        trigger_event_before_deadline,
+        delay_in_hours_before_deadline,
+    ):
+        self.id = id
+        self.workflow_id = workflow_id
+        self.position = position
+        self.trigger_event_before_deadline = trigger_event_before_deadline
+        self.delay_in_hours_before_deadline = delay_in_hours_before_deadline
+
+
+class ReportChain:
+    """Reports of a workflow (SectorRegulation) ordered by position."""
+
+    def __init__(self, sector_regulation_id, steps):
+        self.sector_regulation_id = sector_regulation_id
+        self.steps = tuple(steps)
+        self._indexes = {}
+        for index, step in enumerate(self.steps):
+            self._indexes.setdefault(step.workflow_id, index)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    @property
+    def workflow_ids(self):
+        return [step.workflow_id for step in self.steps]
+
+    def get_step(self, workflow_id):
+        index = self._indexes.get(workflow_id)
+        return self.steps[index] if index is not None else None
+
+    def get_previous_step(self, workflow_id):
+        index = self._indexes.get(workflow_id)
+        if not index:
+            return None
+        return self.steps[index - 1]
+
+    def get_next_step(self, workflow_id):
+        index = self._indexes.get(workflow_id)
+        if index is None or index + 1 >= len(self.steps):
+            return None
+        return self.steps[index + 1]
+
+    def get_next_steps(self, workflow_id):
+        index = self._indexes.get(workflow_id)
+        if index is None:
+            return ()
+        next_index = index + 1
+        return self.steps[next_index:]
+
+
+def get_report_chain(sector_regulation_id):
+    """Return the cached ReportChain of a sector regulation."""
+    if sector_regulation_id is None:
+        return ReportChain(None, [])
+
+    def load_report_chain():
+        from .models import SectorRegulationWorkflow
+
+        steps = [
+            ReportChainStep(*values)
+            for values in SectorRegulationWorkflow.objects.filter(
+                sector_regulation_id=sector_regulation_id
+            )
+            .order_by("position", "id")
+            .values_list(
+                "id",
+                "workflow_id",
+                "position",
+                "trigger_event_before_deadline",
+                "delay_in_hours_before_deadline",
+            )
+        ]
+        return ReportChain(sector_regulation_id, steps)
+
+    return get_cached(
+        REPORT_CHAIN_CACHE_KEY.format(sector_regulation_id),
+        load_report_chain,
+        REPORT_CHAIN_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_report_chain(sector_regulation_id):
+    delete_cached(REPORT_CHAIN_CACHE_KEY.format(sector_regulation_id))
@@ -0,0 +1,168 @@
+import logging
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from governanceplatform.settings import RT_CACHE_TIMEOUT, RT_REQUEST_TIMEOUT
+from governanceplatform.validators import validate_rt_url
+
+from .models import RTTicket
+
+logger = logging.getLogger(__name__)
+
+
+class RTDeliveryError(Exception):
+    """The RT server can't be reached or is not available, try again later."""
+
+
+class TTLCache:
+    """Values kept in the memory of the process for RT_CACHE_TIMEOUT seconds.
+
+    The decrypted tokens must not be written in the shared cache.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or RT_CACHE_TIMEOUT
+        self.values = {}
+
+    def get(self, key, default=None):
+        expires_at, value = self.values.get(key, (0, default))
+        if expires_at < time.monotonic():
+            self.values.pop(key, None)
+            return default
+        return value
+
+    def set(self, key, value):
+        self.values[key] = (time.monotonic() + self.timeout, value)
+
+    def clear(self):
+        self.values.clear()
+
+
+# one session per RT host, the connections are kept open between the tickets
+sessions = {}
+tokens = TTLCache()
+queue_checks = TTLCache()
+
+
+def get_session(base_url):
+    parts = urlsplit(base_url)
+    host = f"{parts.scheme}://{parts.netloc}"
+    session = sessions.get(host)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(
+            {"Content-Type": "application/json", "Accept": "application/json"}
+        )
+        sessions[host] = session
+    return session
+
+
+# the cache keys contain the encrypted token, they change with the configuration
+def get_rt_token(observer):
+    key = (observer.pk, observer._rt_token)
+    token = tokens.get(key)
+    if token is None:
+        token = observer.rt_token
+        tokens.set(key, token)
+    return token
+
+
+def has_rt_config(observer):
+    """Check the RT configuration of the observer without requesting RT."""
+    return bool(observer.rt_url and observer.rt_queue and observer._rt_token)
+
+
+def check_rt_config(observer):
+    if not has_rt_config(observer) or not get_rt_token(observer):
+        return False
+
+    base_url = observer.rt_url.rstrip("/")
+    key = (observer.pk, base_url, observer.rt_queue, observer._rt_token)
+    is_valid = queue_checks.get(key)
+    if is_valid is not None:
+        return is_valid
+
+    url = f"{base_url}/REST/2.0/queue/{observer.rt_queue}"
+    headers = {"Authorization": f"token {get_rt_token(observer)}"}
+    try:
+        response = get_session(base_url).get(
+            url, headers=headers, timeout=RT_REQUEST_TIMEOUT
+        )
+    except requests.RequestException as e:
+        raise RTDeliveryError(f"Error connecting to RT API: {e}") from e
+
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RTDeliveryError(
+            f"Unexpected RT response ({response.status_code}): {response.text}"
+        )
+
+    is_valid = response.status_code == 200
+    if response.status_code == 401:
+        logger.warning("RT token unauthorized (401) for %s", str(observer))
+    elif response.status_code == 404:
+        logger.warning("RT queue '%s' not found at %s", observer.rt_queue, url)
+    elif not is_valid:
+        logger.warning(
+            "Unexpected RT response (%s): %s", response.status_code, response.text
+        )
+    queue_checks.set(key, is_valid)
+    return is_valid
+
+
+def create_or_update_rt_ticket(recipient, subject, content, incident):
+    base_url = recipient.rt_url.rstrip("/")
+    try:
+        validate_rt_url(base_url)
+    except ValidationError:
+        logger.error("Blocked unsafe RT URL: %s", base_url)
+        return None
+
+    headers = {"Authorization": f"token {get_rt_token(recipient)}"}
+
+    # the ticket of the incident is claimed before requesting RT, its row lock
+    # keeps two tasks of the same incident and observer from creating two
+    # tickets in RT
+    RTTicket.objects.get_or_create(incident=incident, observer=recipient)
+    with transaction.atomic():
+        ticket = RTTicket.objects.select_for_update().get(
+            incident=incident, observer=recipient
+        )
+        is_new_ticket = not ticket.ticket_id
+        if is_new_ticket:
+            url = f"{base_url}/REST/2.0/ticket"
+            payload = {
+                "Requestor": settings.EMAIL_SENDER,
+                "Queue": recipient.rt_queue,
+                "Subject": subject,
+                "Content": content,
+                "ContentType": "text/html",
+            }
+        else:
+            url = f"{base_url}/REST/2.0/ticket/{ticket.ticket_id}/correspond"
+            payload = {
+                "Content": content,
+                "ContentType": "text/html",
+            }
+
+        try:
+            response = get_session(base_url).post(
+                url, json=payload, headers=headers, timeout=RT_REQUEST_TIMEOUT
+            )
+        except requests.RequestException as e:
+            raise RTDeliveryError(f"Error connecting to RT API: {e}") from e
+
+        if response.ok:
+            if is_new_ticket and response.status_code == 201:
+                ticket.ticket_id = response.json().get("id")
+                ticket.save(update_fields=["ticket_id"])
+        elif response.status_code == 429 or response.status_code >= 500:
+            raise RTDeliveryError(
+                f"RT API Error {response.status_code}: {response.text}"
+            )
+        else:
+            logger.error("RT API Error %s: %s", response.status_code, response.text)
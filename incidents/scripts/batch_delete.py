@@ -0,0 +1,63 @@
+import logging
+import time
+
+from django.db import transaction
+
+from governanceplatform.metrics import record_message
+from governanceplatform.settings import (
+    RETENTION_CLEANING_BATCH_SIZE,
+    RETENTION_CLEANING_TIME_BUDGET_IN_SECOND,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def delete_in_batches(queryset, batch_size=None, time_budget=None, dry_run=False):
+    """Delete the objects of the queryset by batches of ids, ordered by id, in
+    one short transaction per batch, until the time budget is spent.
+
+    Return the number of deleted objects and whether all of them are deleted,
+    the objects left are deleted by the next run. Nothing is deleted in dry run.
+    """
+    batch_size = batch_size or RETENTION_CLEANING_BATCH_SIZE
+    time_budget = time_budget or RETENTION_CLEANING_TIME_BUDGET_IN_SECOND
+    start = time.monotonic()
+    queryset = queryset.order_by("pk")
+    deleted_count = 0
+    last_pk = None
+
+    while True:
+        batch_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(batch_qs.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return deleted_count, True
+
+        if not dry_run:
+            with transaction.atomic():
+                queryset.filter(pk__in=pks).delete()
+        deleted_count += len(pks)
+        last_pk = pks[-1]
+
+        if time.monotonic() - start >= time_budget:
+            is_finished = not queryset.filter(pk__gt=last_pk).exists()
+            if not is_finished:
+                logger.warning(
+                    "Time budget of %s s spent after %s deletion(s)",
+                    time_budget,
+                    deleted_count,
+                )
+            return deleted_count, is_finished
+
+
+def log_deletion(script_name, object_name, deleted_count, is_finished, dry_run):
+    """Record the progress of a deletion script in the ScriptLogEntry of its
+    run."""
+    object_repr = f"System:{script_name} {deleted_count} {object_name}(s) deleted"
+    if dry_run:
+        object_repr = (
+            f"System:{script_name} (dry run) {deleted_count} {object_name}(s) "
+            "to delete"
+        )
+    if not is_finished:
+        object_repr += ", the next run continues"
+    record_message(object_repr, action_flag=3)
@@ -0,0 +1,129 @@
+import logging
+import time
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DatabaseError
+from django.utils import timezone
+
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_message, record_metrics
+from governanceplatform.settings import (
+    EMAIL_OUTBOX_BATCH_SIZE,
+    EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND,
+    EMAIL_OUTBOX_MAX_ATTEMPTS,
+    EMAIL_OUTBOX_RETRY_DELAY_IN_SECOND,
+)
+from incidents.models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+# Script to run every minute and after each commit which writes emails
+# send the pending emails of the outbox, batch by batch over one SMTP connection
+@shared_task(name="email_outbox")
+@single_run(
+    "email_outbox",
+    timeout=EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND,
+    log_skipped=False,
+    log_empty_runs=False,
+)
+def run(logger=logger):
+    logger.info("running email_outbox.py")
+    start = time.monotonic()
+    sent_count = 0
+    dead_count = 0
+    connection = get_connection()
+    try:
+        # opened once for all the batches, an email which can't be sent when
+        # the server is unreachable is retried later
+        connection.open()
+    except Exception as e:
+        logger.error("Failed to connect to the email server: %s", e)
+
+    try:
+        # no batch is started after half of the lease, so the emails are not
+        # fetched again by the next run before they are sent
+        while time.monotonic() - start < EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND / 2:
+            try:
+                outgoing_emails = list(
+                    OutgoingEmail.objects.filter(
+                        status="PENDING", next_attempt_at__lte=timezone.now()
+                    ).order_by("next_attempt_at", "pk")[:EMAIL_OUTBOX_BATCH_SIZE]
+                )
+            except DatabaseError as e:
+                logger.error("Failed to fetch outgoing emails: %s", e, exc_info=True)
+                raise
+
+            if not outgoing_emails:
+                break
+
+            record_metrics(scanned=len(outgoing_emails))
+            for outgoing_email in outgoing_emails:
+                if send_outgoing_email(connection, outgoing_email, logger):
+                    sent_count += 1
+                elif outgoing_email.status == "DEAD":
+                    dead_count += 1
+    finally:
+        connection.close()
+
+    record_metrics(
+        affected=sent_count + dead_count, emails=sent_count, errors=dead_count
+    )
+    if dead_count:
+        record_message(
+            f"System:Email outbox script {dead_count} email(s) not sent "
+            f"after {EMAIL_OUTBOX_MAX_ATTEMPTS} attempts"
+        )
+
+    return sent_count
+
+
+def send_outgoing_email(connection, outgoing_email, logger=logger):
+    message = EmailMessage(
+        outgoing_email.subject,
+        outgoing_email.content,
+        settings.EMAIL_SENDER,
+        bcc=outgoing_email.recipients,
+        connection=connection,
+    )
+    message.content_subtype = "html"
+    now = timezone.now()
+    outgoing_email.attempts += 1
+
+    try:
+        sent_count = connection.send_messages([message])
+        error = "" if sent_count else "Email send returned 0 (no email sent)"
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+        # the next email is sent over a new connection
+        connection.close()
+
+    if not error:
+        outgoing_email.status = "SENT"
+        outgoing_email.sent_at = now
+        outgoing_email.last_error = ""
+    elif outgoing_email.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+        outgoing_email.status = "DEAD"
+        outgoing_email.last_error = error
+        logger.error(
+            "Email %s not sent after %s attempts: %s",
+            outgoing_email.pk,
+            outgoing_email.attempts,
+            error,
+        )
+    else:
+        # exponential backoff
+        delay = EMAIL_OUTBOX_RETRY_DELAY_IN_SECOND * 2 ** (outgoing_email.attempts - 1)
+        outgoing_email.next_attempt_at = now + timedelta(seconds=delay)
+        outgoing_email.last_error = error
+        logger.warning(
+            "Email %s not sent, retried in %s s: %s", outgoing_email.pk, delay, error
+        )
+
+    outgoing_email.save(
+        update_fields=["status", "attempts", "next_attempt_at", "last_error", "sent_at"]
+    )
+    return not error
@@ -1,110 +1,110 @@
 import logging
-import math
+from datetime import timedelta
 
 from celery import shared_task
 from django.db import DatabaseError
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_metrics
+from governanceplatform.settings import EMAIL_REMINDER_CATCH_UP_IN_HOUR
 from incidents.email import send_email
+from incidents.helpers import rebuild_incident_email_reminders
 from incidents.models import (
     Incident,
-    IncidentWorkflow,
-    SectorRegulationWorkflow,
+    IncidentEmailReminder,
     SectorRegulationWorkflowEmail,
 )
+from incidents.scripts.fan_out import fan_out, new_result
 
 logger = logging.getLogger(__name__)
 
 
 # Script to run every hour
+# send the scheduled reminder emails which are due, the reminders are scheduled
+# when the incidents and their reports change (see incidents.signals) and for
+# the ongoing incidents which have none yet
 @shared_task(name="email_reminder")
+@single_run("email_reminder")
 def run(logger=logger):
     logger.info("running email_reminder.py")
-    # for all unclosed incident
     actual_time = timezone.now()
+    # the reminders missed during a downtime are sent if they are not too old
+    catch_up_time = actual_time - timedelta(hours=EMAIL_REMINDER_CATCH_UP_IN_HOUR)
     try:
-        ongoing_incidents = Incident.objects.filter(incident_status="GOING")
+        # the incidents created before the scheduled reminders, whose workflow
+        # has reminder emails
+        rebuild_incident_email_reminders(
+            Incident.objects.filter(
+                Exists(
+                    SectorRegulationWorkflowEmail.objects.filter(
+                        sector_regulation_workflow__sector_regulation=OuterRef(
+                            "sector_regulation"
+                        )
+                    )
+                ),
+                incident_status="GOING",
+            ).exclude(
+                Exists(IncidentEmailReminder.objects.filter(incident=OuterRef("pk")))
+            )
+        )
+
+        due_reminders = IncidentEmailReminder.objects.filter(
+            sent_at__isnull=True,
+            due_date__lte=actual_time,
+            incident__incident_status="GOING",
+        )
+        skipped_count = due_reminders.filter(due_date__lt=catch_up_time).update(
+            sent_at=actual_time, is_skipped=True
+        )
+        reminder_ids = list(
+            due_reminders.order_by("due_date").values_list("pk", flat=True)
+        )
     except DatabaseError as e:
-        logger.error("Failed to fetch ongoing incidents: %s", e, exc_info=True)
+        logger.error("Failed to fetch due reminders: %s", e, exc_info=True)
         raise
 
-    for incident in ongoing_incidents:
-        try:
-            # detection date, the email is sent xx hours if the report is not filled see #451
-            for report in incident.get_all_workflows():
-                if (
-                    not IncidentWorkflow.objects.filter(
-                        incident=incident,
-                        workflow=report,
-                    ).exists()
-                    and incident.incident_detection_date is not None
-                ):
-                    emails = SectorRegulationWorkflowEmail.objects.filter(
-                            sector_regulation_workflow__sector_regulation=incident.sector_regulation,
-                            sector_regulation_workflow__workflow=report,
-                            trigger_event="DETEC_DATE",
-                        )
-                    for email in emails:
-                        dt = actual_time - incident.incident_detection_date
-                        if (
-                            math.floor(dt.total_seconds() / 60 / 60)
-                            == email.delay_in_hours
-                        ):
-                            send_email(email.email, incident)
-            # Workflow with deadline from prev workflow
-            for incident_workflow in incident.get_latest_incident_workflows(timestamp_order="timestamp"):
-                # chek if there is a next workflow
-                next_workflow = incident_workflow.get_next_workflow()
-                if next_workflow is not False:
-                    next_incident_workflow = (
-                        IncidentWorkflow.objects.all()
-                        .filter(
-                            incident=incident,
-                            workflow=next_workflow,
-                        )
-                        .order_by("-timestamp")
-                        .first()
-                    )
-                    # there is one next workflow but not filled
-                    if next_incident_workflow is None:
-                        next_sector_regulation_workflow = (
-                            SectorRegulationWorkflow.objects.all()
-                            .filter(
-                                sector_regulation=incident.sector_regulation,
-                                workflow=next_workflow,
-                            )
-                            .first()
-                        )
-                        emails = SectorRegulationWorkflowEmail.objects.all().filter(
-                            sector_regulation_workflow=next_sector_regulation_workflow,
-                            trigger_event="PREV_WORK",
-                        )
-                        for email in emails:
-                            dt = actual_time - incident_workflow.timestamp
-                            if (
-                                math.floor(dt.total_seconds() / 60 / 60)
-                                == email.delay_in_hours
-                            ):
-                                send_email(email.email, incident)
-                # From notification date
-                sector_regulation_workflow = (
-                    SectorRegulationWorkflow.objects.all()
-                    .filter(
-                        sector_regulation=incident.sector_regulation,
-                        workflow=incident_workflow.workflow,
-                    )
-                    .first()
-                )
+    if skipped_count:
+        logger.warning(
+            "%s reminder(s) due before the catch-up period not sent", skipped_count
+        )
+
+    record_metrics(scanned=len(reminder_ids) + skipped_count)
+    fan_out(send_reminders, reminder_ids, "Email reminder script")
+
 
-                emails = SectorRegulationWorkflowEmail.objects.all().filter(
-                    sector_regulation_workflow=sector_regulation_workflow,
-                    trigger_event="NOTIF_DATE",
-                )
-                for email in emails:
-                    dt = actual_time - incident_workflow.timestamp
-                    if math.floor(dt.total_seconds() / 60 / 60) == email.delay_in_hours:
-                        send_email(email.email, incident)
+# send the reminders of a chunk, a reminder is only sent once when a chunk is
+# retried or when two runs overlap
+@shared_task(name="email_reminder_chunk")
+def send_reminders(reminder_ids, logger=logger):
+    result = new_result()
+    reminders = IncidentEmailReminder.objects.filter(
+        pk__in=reminder_ids, sent_at__isnull=True
+    ).select_related("incident", "sector_regulation_workflow_email__email")
+
+    for reminder in reminders:
+        result["processed"] += 1
+        # the reminder is marked as sent before sending it
+        claimed = IncidentEmailReminder.objects.filter(
+            pk=reminder.pk, sent_at__isnull=True
+        ).update(sent_at=timezone.now())
+        if not claimed:
+            continue
+        try:
+            send_email(
+                reminder.sector_regulation_workflow_email.email, reminder.incident
+            )
+            result["emailed"] += 1
         except Exception as e:
+            # sent again at the next run
+            IncidentEmailReminder.objects.filter(pk=reminder.pk).update(sent_at=None)
+            result["errors"] += 1
             logger.error(
-                "Error processing incident ID %s: %s", incident.id, e, exc_info=True
+                "Error processing incident ID %s: %s",
+                reminder.incident_id,
+                e,
+                exc_info=True,
             )
+
+    return result
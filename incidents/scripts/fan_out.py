@@ -0,0 +1,99 @@
+import logging
+import math
+from itertools import batched
+
+from celery import chord, group, shared_task
+
+from governanceplatform.leases import hand_over_lease, release_lease
+from governanceplatform.metrics import current_metrics, new_metrics, save_run_metrics
+from governanceplatform.settings import (
+    MAINTENANCE_TASK_CHUNK_SIZE,
+    MAINTENANCE_TASK_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+# counters returned by the tasks of a chunk
+RESULT_KEYS = ("processed", "emailed", "errors")
+
+
+def get_chunks(ids, chunk_size=None, concurrency=None):
+    """Split the ids in chunks of chunk_size ids, the chunks are larger when
+    there would be more than concurrency chunks."""
+    chunk_size = chunk_size or MAINTENANCE_TASK_CHUNK_SIZE
+    concurrency = concurrency or MAINTENANCE_TASK_CONCURRENCY
+    ids = list(ids)
+    if not ids:
+        return []
+    chunk_size = max(chunk_size, math.ceil(len(ids) / concurrency))
+    return [list(chunk) for chunk in batched(ids, chunk_size)]
+
+
+def fan_out(chunk_task, ids, script_name):
+    """Run chunk_task on each chunk of ids in parallel, then log the sum of
+    their results in one ScriptLogEntry.
+
+    The lease of the running script is released and the metrics of the run
+    are recorded when all the chunks are done, or when one of them fails.
+    """
+    chunks = get_chunks(ids)
+    lease = hand_over_lease()
+    metrics = current_metrics.get()
+    if not chunks:
+        return summarize([], script_name, lease, metrics)
+    summary = summarize.s(script_name, lease, metrics)
+    summary.link_error(summarize_failure.s(script_name, lease, metrics))
+    return chord(group(chunk_task.s(chunk) for chunk in chunks), summary).apply_async()
+
+
+def new_result():
+    return dict.fromkeys(RESULT_KEYS, 0)
+
+
+@shared_task(name="fan_out_summary")
+def summarize(results, script_name, lease=None, metrics=None):
+    duration = release_lease(*lease) if lease is not None else None
+
+    total = new_result()
+    for result in results:
+        for key in RESULT_KEYS:
+            total[key] += result.get(key, 0)
+
+    metrics = metrics or new_metrics()
+    metrics["affected"] += total["processed"]
+    metrics["emails"] += total["emailed"]
+    metrics["errors"] += total["errors"]
+
+    try:
+        save_run_metrics(
+            lease[0] if lease is not None else "",
+            duration,
+            metrics,
+            object_repr=f"System:{script_name} "
+            f"{total['processed']} processed, "
+            f"{total['emailed']} email(s) sent, "
+            f"{total['errors']} error(s)",
+            additional_info=f"{len(results)} chunk(s)",
+        )
+    except Exception as e:
+        logger.error("Failed to write application log: %s", e, exc_info=True)
+        raise
+    return total
+
+
+# errback of the chord when a chunk or the summary fails, the summary is not
+# run so the lease is released here
+@shared_task(name="fan_out_failure")
+def summarize_failure(request, exc, traceback, script_name, lease=None, metrics=None):
+    duration = release_lease(*lease) if lease is not None else None
+    logger.error("%s failed: %s", script_name, exc)
+
+    metrics = metrics or new_metrics()
+    metrics["errors"] += 1
+    save_run_metrics(
+        lease[0] if lease is not None else "",
+        duration,
+        metrics,
+        object_repr=f"System:{script_name} failed",
+        additional_info=str(exc),
+    )
@@ -5,37 +5,46 @@ from celery import shared_task
 from django.db import DatabaseError
 from django.db.models.functions import Now
 
-from governanceplatform.models import ScriptLogEntry
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_metrics
 from governanceplatform.settings import INCIDENT_RETENTION_TIME_IN_DAY
 from incidents.models import Incident
+from incidents.scripts.batch_delete import delete_in_batches, log_deletion
 
 logger = logging.getLogger(__name__)
 
 
 # Script to run once day
-# remove incidents after a period configured in config.py
+# remove incidents after a period configured in config.py, by batches within a
+# time budget, the incidents left are removed by the next run
+# dry_run=True only logs the number of incidents to remove
 @shared_task(name="incident_cleaning")
-def run(logger=logger):
+@single_run("incident_cleaning")
+def run(dry_run=False, logger=logger):
     logger.info("running incident_cleaning.py")
-    # for all closed incident
+    incident_to_delete_qs = Incident.objects.filter(
+        incident_notification_date__lte=Now()
+        - timedelta(days=INCIDENT_RETENTION_TIME_IN_DAY)
+    )
+
     try:
-        incident_to_delete_qs = Incident.objects.filter(
-            incident_notification_date__lte=Now()
-            - timedelta(days=INCIDENT_RETENTION_TIME_IN_DAY)
+        deleted_count, is_finished = delete_in_batches(
+            incident_to_delete_qs, dry_run=dry_run
         )
     except DatabaseError as e:
-        logger.error("Failed to fetch incident to delete: %s", e, exc_info=True)
+        logger.error("Failed to delete incidents: %s", e, exc_info=True)
         raise
 
+    record_metrics(scanned=deleted_count, affected=0 if dry_run else deleted_count)
+
     try:
-        ScriptLogEntry.objects.create(
-            object_id=None,
-            object_repr="System:Incident script deletion "
-            + str(incident_to_delete_qs.count())
-            + " incident(s) deleted",
-            action_flag=3,
+        log_deletion(
+            "Incident script deletion",
+            "incident",
+            deleted_count,
+            is_finished,
+            dry_run,
         )
     except Exception as e:
         logger.error("Failed to write application log: %s", e, exc_info=True)
         raise
-    incident_to_delete_qs.delete()
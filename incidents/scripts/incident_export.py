@@ -0,0 +1,41 @@
+import logging
+
+from celery import shared_task
+from django.db import DatabaseError
+from django.utils import timezone
+
+from incidents.export import generate_export_file
+from incidents.models import IncidentExport
+
+logger = logging.getLogger(__name__)
+
+
+# Script run for each mass export of incidents
+# write the export file in PATH_FOR_INCIDENT_EXPORTS
+@shared_task(name="incident_export")
+def run(export_id, lang="en", logger=logger):
+    logger.info("running incident_export.py")
+    # only one worker claims the export, e.g. when the task is delivered twice
+    try:
+        claimed = IncidentExport.objects.filter(pk=export_id, status="PENDING").update(
+            status="RUNNING"
+        )
+    except DatabaseError as e:
+        logger.error("Failed to claim the export: %s", e, exc_info=True)
+        raise
+
+    if not claimed:
+        logger.warning("Export %s not found or already processed", export_id)
+        return
+
+    export = IncidentExport.objects.select_related(
+        "user", "regulation", "sector_regulation", "workflow"
+    ).get(pk=export_id)
+
+    try:
+        generate_export_file(export, lang)
+    except Exception as e:
+        logger.error("Failed to generate the export: %s", e, exc_info=True)
+        IncidentExport.objects.filter(pk=export.pk).update(
+            status="FAILED", error=str(e), finished_at=timezone.now()
+        )
@@ -0,0 +1,74 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.db import DatabaseError
+from django.db.models.functions import Now
+
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_message, record_metrics
+from governanceplatform.settings import (
+    INCIDENT_EXPORT_RETENTION_TIME_IN_HOUR,
+    INCIDENT_EXPORT_TIMEOUT_IN_HOUR,
+)
+from incidents.export import get_export_storage
+from incidents.models import IncidentExport
+
+logger = logging.getLogger(__name__)
+
+
+# Script to run every hour
+# remove the incidents exports and their files after a period configured in config.py
+# the exports still pending or running after INCIDENT_EXPORT_TIMEOUT_IN_HOUR are
+# marked as failed
+@shared_task(name="incident_export_cleaning")
+@single_run("incident_export_cleaning")
+def run(logger=logger):
+    logger.info("running incident_export_cleaning.py")
+    try:
+        failed_count = IncidentExport.objects.filter(
+            status__in=["PENDING", "RUNNING"],
+            created_at__lte=Now() - timedelta(hours=INCIDENT_EXPORT_TIMEOUT_IN_HOUR),
+        ).update(
+            status="FAILED", error="The export was not finished", finished_at=Now()
+        )
+    except DatabaseError as e:
+        logger.error("Failed to update unfinished exports: %s", e, exc_info=True)
+        raise
+    if failed_count:
+        logger.warning("%s unfinished export(s) marked as failed", failed_count)
+        record_metrics(errors=failed_count)
+
+    try:
+        export_to_delete_qs = IncidentExport.objects.filter(
+            created_at__lte=Now()
+            - timedelta(hours=INCIDENT_EXPORT_RETENTION_TIME_IN_HOUR)
+        )
+        file_names = list(
+            export_to_delete_qs.exclude(file_name="").values_list(
+                "file_name", flat=True
+            )
+        )
+    except DatabaseError as e:
+        logger.error("Failed to fetch export to delete: %s", e, exc_info=True)
+        raise
+
+    storage = get_export_storage()
+    for file_name in file_names:
+        try:
+            storage.delete(file_name)
+        except OSError as e:
+            logger.error("Failed to delete export file %s: %s", file_name, e)
+
+    try:
+        record_message(
+            "System:Incident export script deletion "
+            + str(len(file_names))
+            + " export file(s) deleted",
+            action_flag=3,
+        )
+    except Exception as e:
+        logger.error("Failed to write application log: %s", e, exc_info=True)
+        raise
+    deleted_count, _deleted = export_to_delete_qs.delete()
+    record_metrics(scanned=deleted_count, affected=deleted_count)
@@ -6,33 +6,62 @@ from django.contrib.admin.models import LogEntry
 from django.db import DatabaseError
 from django.db.models.functions import Now
 
-from governanceplatform.models import ScriptLogEntry
-from governanceplatform.settings import LOG_RETENTION_TIME_IN_DAY
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_metrics
+from governanceplatform.settings import (
+    EMAIL_OUTBOX_RETENTION_TIME_IN_DAY,
+    LOG_RETENTION_TIME_IN_DAY,
+)
+from incidents.models import OutgoingEmail
+from incidents.scripts.batch_delete import delete_in_batches, log_deletion
 
 logger = logging.getLogger(__name__)
 
 
 # Script to run once day
-# remove log after a period configured in config.py
+# remove log after a period configured in config.py, by batches within a time
+# budget, the logs left are removed by the next run
+# the sent and the given up emails of the outbox are removed the same way
+# dry_run=True only logs the number of logs to remove
 @shared_task(name="log_cleaning")
-def run(logger=logger):
+@single_run("log_cleaning")
+def run(dry_run=False, logger=logger):
     logger.info("running log_cleaning.py")
+    log_to_delete = LogEntry.objects.filter(
+        action_time__lte=Now() - timedelta(days=LOG_RETENTION_TIME_IN_DAY)
+    )
+
     try:
-        log_to_delete = LogEntry.objects.filter(
-            action_time__lte=Now() - timedelta(days=LOG_RETENTION_TIME_IN_DAY)
-        )
+        deleted_count, is_finished = delete_in_batches(log_to_delete, dry_run=dry_run)
     except DatabaseError as e:
-        logger.error("Failed to fetch log to delete: %s", e, exc_info=True)
+        logger.error("Failed to delete logs: %s", e, exc_info=True)
+        raise
+
+    record_metrics(scanned=deleted_count, affected=0 if dry_run else deleted_count)
+
+    try:
+        log_deletion("Log script deletion", "log", deleted_count, is_finished, dry_run)
+    except Exception as e:
+        logger.error("Failed to write application log: %s", e, exc_info=True)
         raise
+
+    email_to_delete = OutgoingEmail.objects.filter(
+        status__in=["SENT", "DEAD"],
+        created_at__lte=Now() - timedelta(days=EMAIL_OUTBOX_RETENTION_TIME_IN_DAY),
+    )
+
+    try:
+        deleted_count, is_finished = delete_in_batches(email_to_delete, dry_run=dry_run)
+    except DatabaseError as e:
+        logger.error("Failed to delete outgoing emails: %s", e, exc_info=True)
+        raise
+
+    record_metrics(scanned=deleted_count, affected=0 if dry_run else deleted_count)
+
     try:
-        ScriptLogEntry.objects.create(
-            object_id=None,
-            object_repr="System:Log script deletion "
-            + str(log_to_delete.count())
-            + " log(s) deleted",
-            action_flag=3,
+        log_deletion(
+            "Log script deletion", "email", deleted_count, is_finished, dry_run
         )
     except Exception as e:
         logger.error("Failed to write application log: %s", e, exc_info=True)
         raise
-    log_to_delete.delete()
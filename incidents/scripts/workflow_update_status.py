@@ -1,72 +1,99 @@
 import logging
-import math
+from datetime import timedelta
 
 from celery import shared_task
 from django.db import DatabaseError
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
+from governanceplatform.leases import single_run
+from governanceplatform.metrics import record_metrics
+from governanceplatform.settings import OVERDUE_EMAIL_CATCH_UP_IN_HOUR
 from incidents.email import send_email
-from incidents.models import Incident, IncidentWorkflow, SectorRegulationWorkflow
+from incidents.helpers import rebuild_incident_report_status
+from incidents.models import Incident, IncidentReportStatus
+from incidents.scripts.fan_out import fan_out, new_result
 
 logger = logging.getLogger(__name__)
 
 
 # Script to run every hour
-# Send an email when the delay is overdue
+# Send an email when the deadline of a report is crossed, the reports are found
+# with their stored deadline (see incidents.helpers.refresh_incident_report_status)
 # The status change is managed in frontend
 @shared_task(name="workflow_update_status")
+@single_run("workflow_update_status")
 def run(logger=logger):
     logger.info("running workflow_update_status.py")
-    # for all unclosed incident
     actual_time = timezone.now()
     try:
-        ongoing_incidents = Incident.objects.filter(incident_status="GOING")
+        # the incidents created before the stored report statuses
+        rebuild_incident_report_status(
+            Incident.objects.filter(
+                incident_status="GOING", sector_regulation__isnull=False
+            ).exclude(
+                Exists(IncidentReportStatus.objects.filter(incident=OuterRef("pk")))
+            )
+        )
+
+        # the reports not submitted whose deadline was crossed and whose email
+        # was not sent yet, within the catch-up window for the skipped runs
+        report_status_ids = list(
+            IncidentReportStatus.objects.filter(
+                latest_incident_workflow__isnull=True,
+                overdue_email_sent_at__isnull=True,
+                deadline__lte=actual_time,
+                deadline__gt=actual_time
+                - timedelta(hours=OVERDUE_EMAIL_CATCH_UP_IN_HOUR),
+                incident__incident_status="GOING",
+                incident__sector_regulation__report_status_changed_email__isnull=False,
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
     except DatabaseError as e:
-        logger.error("Failed to fetch ongoing incidents: %s", e, exc_info=True)
+        logger.error("Failed to fetch overdue reports: %s", e, exc_info=True)
         raise
 
-    for incident in ongoing_incidents:
-        try:
-            filled_workflow_ids = IncidentWorkflow.objects.filter(
-                incident=incident
-            ).values_list("workflow", flat=True)
-
-            if not incident.sector_regulation:
-                continue
+    record_metrics(scanned=len(report_status_ids))
+    fan_out(update_status, report_status_ids, "Workflow update status script")
 
-            unfilled_report_ids = incident.sector_regulation.workflows.exclude(
-                id__in=filled_workflow_ids
-            ).values_list("id", flat=True)
 
-            srw = SectorRegulationWorkflow.objects.filter(
-                workflow__in=unfilled_report_ids,
-                sector_regulation=incident.sector_regulation,
-            )
-
-            for report in srw:
-                try:
-                    delay_in_hours = report.delay_in_hours_before_deadline
-                    dt = report.how_late_is_the_report(incident, actual_time)
-
-                    if (
-                        dt
-                        and math.floor(dt.total_seconds() / 60 / 60) == delay_in_hours
-                    ):
-                        if incident.sector_regulation.report_status_changed_email:
-                            send_email(
-                                incident.sector_regulation.report_status_changed_email,
-                                incident,
-                            )
-                except Exception as e:
-                    logger.error(
-                        "Error processing report ID %s for incident ID %s: %s",
-                        report.id,
-                        incident.id,
-                        e,
-                        exc_info=True,
-                    )
+# send the overdue emails of the reports of a chunk, an email is only sent
+# once for a report when a chunk is retried or when two runs overlap
+@shared_task(name="workflow_update_status_chunk")
+def update_status(report_status_ids, logger=logger):
+    result = new_result()
+    report_statuses = IncidentReportStatus.objects.filter(
+        pk__in=report_status_ids,
+        overdue_email_sent_at__isnull=True,
+        incident__incident_status="GOING",
+    ).select_related("incident__sector_regulation__report_status_changed_email")
 
+    for report_status in report_statuses:
+        result["processed"] += 1
+        incident = report_status.incident
+        # the report is marked before sending the email
+        claimed = IncidentReportStatus.objects.filter(
+            pk=report_status.pk, overdue_email_sent_at__isnull=True
+        ).update(overdue_email_sent_at=timezone.now())
+        if not claimed:
+            continue
+        try:
+            send_email(incident.sector_regulation.report_status_changed_email, incident)
+            result["emailed"] += 1
         except Exception as e:
+            # sent again at the next run if the report is still overdue
+            IncidentReportStatus.objects.filter(pk=report_status.pk).update(
+                overdue_email_sent_at=None
+            )
+            result["errors"] += 1
             logger.error(
-                "Error processing incident ID %s: %s", incident.id, e, exc_info=True
+                "Error processing report ID %s for incident ID %s: %s",
+                report_status.sector_regulation_workflow_id,
+                incident.id,
+                e,
+                exc_info=True,
             )
+
+    return result
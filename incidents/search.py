@@ -0,0 +1,99 @@
+from django.db.models import CharField, OuterRef, StringAgg, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Lower
+
+# separator between the values of the search document, a search term
+# does not match across two values
+SEARCH_DOCUMENT_SEPARATOR = "\n"
+
+# fields of the incident included in the search document
+SEARCH_DOCUMENT_INCIDENT_FIELDS = [
+    "incident_id",
+    "contact_firstname",
+    "contact_lastname",
+    "technical_firstname",
+    "technical_lastname",
+    "company_name",
+]
+
+
+def _join(*expressions):
+    values = []
+    for expression in expressions:
+        if values:
+            values.append(Value(SEARCH_DOCUMENT_SEPARATOR))
+        values.append(Coalesce(expression, Value(""), output_field=CharField()))
+    if len(values) == 1:
+        return values[0]
+    return Concat(*values, output_field=CharField())
+
+
+def _aggregate(queryset, group_by, fields):
+    # all the values of the related objects in one value
+    return Subquery(
+        queryset.values(group_by)
+        .annotate(
+            document=StringAgg(
+                _join(*fields), Value(SEARCH_DOCUMENT_SEPARATOR), distinct=True
+            )
+        )
+        .values("document")[:1],
+        output_field=CharField(),
+    )
+
+
+def get_search_document_expression(apps):
+    """Expression of Incident.search_document: the values searched by
+    IncidentFilter, in all the languages and in lower case.
+
+    apps is the registry of the models, to be usable in the migrations.
+    """
+    company_model = apps.get_model("governanceplatform", "Company")
+    regulator_translation_model = apps.get_model(
+        "governanceplatform", "RegulatorTranslation"
+    )
+    regulation_translation_model = apps.get_model(
+        "governanceplatform", "RegulationTranslation"
+    )
+    sector_translation_model = apps.get_model("governanceplatform", "SectorTranslation")
+
+    # the update queries can not join the related tables, subqueries are used
+    return Lower(
+        _join(
+            *SEARCH_DOCUMENT_INCIDENT_FIELDS,
+            _aggregate(
+                company_model.objects.filter(pk=OuterRef("company_id")),
+                "pk",
+                ["identifier", "name"],
+            ),
+            _aggregate(
+                regulator_translation_model.objects.filter(
+                    master_id=OuterRef("regulator_id")
+                ),
+                "master_id",
+                ["name", "full_name"],
+            ),
+            _aggregate(
+                regulation_translation_model.objects.filter(
+                    master__sectorregulation=OuterRef("sector_regulation_id")
+                ),
+                "master_id",
+                ["label"],
+            ),
+            _aggregate(
+                sector_translation_model.objects.filter(
+                    master__incident=OuterRef("pk")
+                ),
+                "master__incident",
+                ["name"],
+            ),
+        )
+    )
+
+
+def update_search_document(incidents):
+    """Update the search document of a queryset of incidents in one query."""
+    from django.apps import apps
+
+    return incidents.model.objects.filter(pk__in=incidents.values("pk")).update(
+        search_document=get_search_document_expression(apps)
+    )
@@ -0,0 +1,178 @@
+import functools
+import logging
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from governanceplatform.models import Company, Regulation, Regulator, Sector
+
+from .helpers import (
+    rebuild_sector_regulation_incidents,
+    refresh_incident_email_reminders,
+    refresh_incident_report_status,
+)
+from .models import (
+    Incident,
+    IncidentWorkflow,
+    SectorRegulationWorkflow,
+    SectorRegulationWorkflowEmail,
+)
+from .report_chain import invalidate_report_chain
+from .search import update_search_document
+
+logger = logging.getLogger(__name__)
+
+# fields of the incident used to calculate the status of its reports
+REPORT_STATUS_INCIDENT_FIELDS = {
+    "sector_regulation",
+    "incident_detection_date",
+    "incident_notification_date",
+}
+
+# fields of the incident used to schedule the reminder emails
+EMAIL_REMINDER_INCIDENT_FIELDS = {
+    "sector_regulation",
+    "incident_detection_date",
+    "incident_status",
+}
+
+# fields of the incident which are not in the search document
+SEARCH_DOCUMENT_IGNORED_FIELDS = {
+    "incident_last_update",
+    "incident_status",
+    "review_status",
+    "next_deadline",
+    "next_sector_regulation_workflow",
+}
+
+
+@receiver(post_save, sender=Incident)
+def update_report_status_from_incident(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not REPORT_STATUS_INCIDENT_FIELDS.intersection(
+        update_fields
+    ):
+        return
+    refresh_incident_report_status(instance)
+
+
+@receiver(post_save, sender=IncidentWorkflow)
+def update_report_status_from_incident_workflow(sender, instance, **kwargs):
+    refresh_incident_report_status(instance.incident)
+
+
+# the reports of a workflow are edited in the admin, the cached report chain is
+# cleared and all the incidents of the workflow are updated in a celery task once
+# the transaction is committed
+@receiver(post_save, sender=SectorRegulationWorkflow)
+@receiver(post_delete, sender=SectorRegulationWorkflow)
+def update_report_status_from_sector_regulation_workflow(sender, instance, **kwargs):
+    invalidate_report_chain(instance.sector_regulation_id)
+    rebuild_sector_regulation_on_commit(instance.sector_regulation_id)
+
+
+def rebuild_sector_regulation_on_commit(sector_regulation_id, report_status=True):
+    """Start the update of the incidents of a workflow once the transaction is
+    committed. The update is idempotent, it is started for each saved row."""
+    transaction.on_commit(
+        functools.partial(
+            start_sector_regulation_rebuild, sector_regulation_id, report_status
+        )
+    )
+
+
+def start_sector_regulation_rebuild(sector_regulation_id, report_status):
+    try:
+        rebuild_sector_regulation_incidents.delay(sector_regulation_id, report_status)
+    except Exception:
+        # the incidents are updated with the rebuild_report_status and
+        # rebuild_email_reminders commands
+        logger.exception("Failed to start the workflow rebuild job")
+
+
+@receiver(post_save, sender=Incident)
+def update_email_reminders_from_incident(
+    sender, instance, update_fields=None, **kwargs
+):
+    if update_fields is not None and not EMAIL_REMINDER_INCIDENT_FIELDS.intersection(
+        update_fields
+    ):
+        return
+    refresh_incident_email_reminders(instance)
+
+
+@receiver(post_save, sender=IncidentWorkflow)
+def update_email_reminders_from_incident_workflow(sender, instance, created, **kwargs):
+    # the reminders depend on the first submission of each report
+    if created:
+        refresh_incident_email_reminders(instance.incident)
+
+
+# the reminder emails of a workflow are edited in the admin, the reminders of
+# the ongoing incidents are scheduled again in a celery task once the
+# transaction is committed
+@receiver(post_save, sender=SectorRegulationWorkflowEmail)
+@receiver(post_delete, sender=SectorRegulationWorkflowEmail)
+def update_email_reminders_from_sector_regulation_workflow_email(
+    sender, instance, **kwargs
+):
+    sector_regulation_id = (
+        SectorRegulationWorkflow.objects.filter(
+            pk=instance.sector_regulation_workflow_id
+        )
+        .values_list("sector_regulation_id", flat=True)
+        .first()
+    )
+    if sector_regulation_id is None:
+        return
+
+    rebuild_sector_regulation_on_commit(sector_regulation_id, report_status=False)
+
+
+@receiver(post_save, sender=Incident)
+def update_search_document_from_incident(
+    sender, instance, update_fields=None, **kwargs
+):
+    if update_fields is not None and set(update_fields).issubset(
+        SEARCH_DOCUMENT_IGNORED_FIELDS
+    ):
+        return
+    update_search_document(Incident.objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Incident.affected_sectors.through)
+def update_search_document_from_affected_sectors(
+    sender, instance, action, reverse, **kwargs
+):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        update_search_document(Incident.objects.filter(affected_sectors=instance))
+    else:
+        update_search_document(Incident.objects.filter(pk=instance.pk))
+
+
+# the names of the operators, regulators, regulations and sectors are copied
+# in the search document of their incidents
+@receiver(post_save, sender=Company)
+def update_search_document_from_company(sender, instance, **kwargs):
+    update_search_document(Incident.objects.filter(company=instance))
+
+
+@receiver(post_save, sender=Regulator._parler_meta.root_model)
+def update_search_document_from_regulator(sender, instance, **kwargs):
+    update_search_document(Incident.objects.filter(regulator_id=instance.master_id))
+
+
+@receiver(post_save, sender=Regulation._parler_meta.root_model)
+def update_search_document_from_regulation(sender, instance, **kwargs):
+    update_search_document(
+        Incident.objects.filter(sector_regulation__regulation_id=instance.master_id)
+    )
+
+
+@receiver(post_save, sender=Sector._parler_meta.root_model)
+def update_search_document_from_sector(sender, instance, **kwargs):
+    update_search_document(
+        Incident.objects.filter(affected_sectors__id=instance.master_id)
+    )
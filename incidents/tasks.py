@@ -9,8 +9,11 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "governanceplatform.settings")
 django.setup()
 
 from incidents.scripts import (  # noqa: E402 F401
+    email_outbox,
     email_reminder,
     incident_cleaning,
+    incident_export,
+    incident_export_cleaning,
     log_cleaning,
     workflow_update_status,
 )
@@ -1,4 +1,5 @@
 import pytest
+from celery import current_app
 from django.utils import timezone
 from django.utils.translation import activate
 
@@ -127,12 +128,12 @@ def create_incident():
         impacts=None,
         is_significative_impact=False,
         incident_id="",
-        incident_detection_date=timezone.now,
+        incident_detection_date=None,
     ):
         incident = Incident.objects.create(
             incident_id=incident_id,
             incident_timezone=TIME_ZONE,
-            incident_detection_date=incident_detection_date,
+            incident_detection_date=incident_detection_date or timezone.now(),
             company=user.companies.first() if is_user_operator(user) else None,
             regulator=user.regulators.first() if is_user_regulator(user) else None,
             contact_user=user,
@@ -163,7 +164,7 @@ def create_incident_report():
     ):
         incident_report = IncidentWorkflow.objects.create(
             incident=incident,
-            report=report,
+            workflow=report,
             comment=comment,
         )
         if impacts:
@@ -172,3 +173,15 @@ def create_incident_report():
         return incident_report
 
     return _create_incident_report
+
+
+@pytest.fixture
+def celery_eager():
+    """
+    Run the celery tasks and their subtasks in the test process
+    """
+    app = current_app._get_current_object()
+    task_always_eager = app.conf.task_always_eager
+    app.conf.task_always_eager = True
+    yield app
+    app.conf.task_always_eager = task_always_eager
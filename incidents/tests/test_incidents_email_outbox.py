@@ -0,0 +1,138 @@
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
+
+import pytest
+from django.core import mail
+from django.utils import timezone
+
+from governanceplatform.models import ScriptLease
+from governanceplatform.settings import (
+    EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND,
+    EMAIL_OUTBOX_RETENTION_TIME_IN_DAY,
+)
+from incidents.email import send_html_email
+from incidents.models import OutgoingEmail
+from incidents.scripts import email_outbox, log_cleaning
+
+
+class FailingConnection:
+    def open(self):
+        return True
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        raise SMTPServerDisconnected("Connection unexpectedly closed")
+
+
+@pytest.mark.django_db
+def test_email_written_in_outbox(django_capture_on_commit_callbacks):
+    """
+    Test that an email is sent by the outbox job after the commit
+    """
+    with django_capture_on_commit_callbacks() as callbacks:
+        assert send_html_email("Subject", "<p>Content</p>", ["a@a.lu", "invalid"])
+
+    assert len(callbacks) == 1
+    assert mail.outbox == []
+    outgoing_email = OutgoingEmail.objects.get()
+    assert outgoing_email.recipients == ["a@a.lu"]
+
+    assert email_outbox.run() == 1
+
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].bcc == ["a@a.lu"]
+    outgoing_email.refresh_from_db()
+    assert outgoing_email.status == "SENT"
+    assert outgoing_email.sent_at is not None
+
+    # not sent twice
+    assert email_outbox.run() == 0
+    assert len(mail.outbox) == 1
+
+
+@pytest.mark.django_db
+def test_email_outbox_retry(monkeypatch):
+    """
+    Test that an email which can't be sent is retried later, then given up
+    """
+    monkeypatch.setattr(email_outbox, "get_connection", FailingConnection)
+    monkeypatch.setattr(email_outbox, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+    send_html_email("Subject", "<p>Content</p>", ["a@a.lu"])
+
+    assert email_outbox.run() == 0
+
+    outgoing_email = OutgoingEmail.objects.get()
+    assert outgoing_email.status == "PENDING"
+    assert outgoing_email.attempts == 1
+    assert outgoing_email.next_attempt_at > timezone.now()
+    assert "Connection unexpectedly closed" in outgoing_email.last_error
+
+    # not retried before the end of the delay
+    email_outbox.run()
+    outgoing_email.refresh_from_db()
+    assert outgoing_email.attempts == 1
+
+    OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+    email_outbox.run()
+
+    outgoing_email.refresh_from_db()
+    assert outgoing_email.status == "DEAD"
+    assert outgoing_email.attempts == 2
+
+
+@pytest.mark.django_db
+def test_email_outbox_lease_timeout(monkeypatch):
+    """
+    Test that the outbox holds its lease for a few minutes only
+    """
+    lease_expiry_dates = []
+
+    def send_outgoing_email(connection, outgoing_email, logger):
+        lease_expiry_dates.append(
+            ScriptLease.objects.get(name="email_outbox").expires_at
+        )
+        outgoing_email.status = "SENT"
+        outgoing_email.save(update_fields=["status"])
+        return True
+
+    monkeypatch.setattr(email_outbox, "send_outgoing_email", send_outgoing_email)
+    send_html_email("Subject", "<p>Content</p>", ["a@a.lu"])
+
+    assert email_outbox.run() == 1
+    assert lease_expiry_dates[0] <= timezone.now() + timedelta(
+        seconds=EMAIL_OUTBOX_LEASE_TIMEOUT_IN_SECOND
+    )
+    assert ScriptLease.objects.get(name="email_outbox").holder == ""
+
+
+@pytest.mark.django_db
+def test_email_outbox_purged():
+    """
+    Test that the sent and the given up emails are removed after their
+    retention time
+    """
+    expired_date = timezone.now() - timedelta(
+        days=EMAIL_OUTBOX_RETENTION_TIME_IN_DAY + 1
+    )
+    outgoing_emails = {
+        status: OutgoingEmail.objects.create(
+            subject="Subject",
+            content="<p>Content</p>",
+            recipients=["a@a.lu"],
+            status=status,
+            created_at=expired_date,
+        )
+        for status in ("PENDING", "SENT", "DEAD")
+    }
+    recent_email = OutgoingEmail.objects.create(
+        subject="Subject", content="<p>Content</p>", status="SENT"
+    )
+
+    log_cleaning.run()
+
+    assert set(OutgoingEmail.objects.values_list("pk", flat=True)) == {
+        outgoing_emails["PENDING"].pk,
+        recent_email.pk,
+    }
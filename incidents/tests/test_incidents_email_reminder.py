@@ -0,0 +1,320 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from celery import signature
+from django.db import DatabaseError
+from django.utils import timezone
+
+from governanceplatform.leases import acquire_lease
+from governanceplatform.models import ScriptLease, ScriptLogEntry
+from governanceplatform.settings import OVERDUE_EMAIL_CATCH_UP_IN_HOUR
+from incidents.models import (
+    Email,
+    IncidentEmailReminder,
+    IncidentReportStatus,
+    SectorRegulation,
+    SectorRegulationWorkflow,
+    SectorRegulationWorkflowEmail,
+)
+from incidents.scripts import email_reminder, fan_out, workflow_update_status
+from incidents.scripts.fan_out import get_chunks
+
+
+@pytest.fixture
+def reminder_db(populate_incident_db, create_incident):
+    """
+    Reminder emails of the first two reports of a workflow
+    """
+    workflow = SectorRegulation.objects.get(id=2)
+    first_step, second_step = SectorRegulationWorkflow.objects.filter(
+        sector_regulation=workflow
+    ).order_by("position")[:2]
+    email = Email.objects.first()
+    detection_reminder = SectorRegulationWorkflowEmail.objects.create(
+        sector_regulation_workflow=first_step,
+        email=email,
+        trigger_event="DETEC_DATE",
+        delay_in_hours=1,
+    )
+    previous_report_reminder = SectorRegulationWorkflowEmail.objects.create(
+        sector_regulation_workflow=second_step,
+        email=email,
+        trigger_event="PREV_WORK",
+        delay_in_hours=2,
+    )
+    user = next(
+        u for u in populate_incident_db["users"] if u.email == "opadmin@com1.lu"
+    )
+    incident = create_incident(
+        user=user,
+        workflow=workflow,
+        incident_detection_date=timezone.now() - timedelta(hours=3),
+    )
+    return {
+        "incident": incident,
+        "first_report": first_step.workflow,
+        "detection_reminder": detection_reminder,
+        "previous_report_reminder": previous_report_reminder,
+    }
+
+
+@pytest.fixture
+def sent_emails(monkeypatch, celery_eager):
+    sent = []
+
+    def send_email(email, incident):
+        sent.append((email, incident.pk))
+
+    monkeypatch.setattr(email_reminder, "send_email", send_email)
+    monkeypatch.setattr(workflow_update_status, "send_email", send_email)
+    return sent
+
+
+@pytest.mark.django_db
+def test_email_reminders_scheduled(reminder_db, create_incident_report):
+    """
+    Test that the reminders follow the reports of the incident
+    """
+    incident = reminder_db["incident"]
+    reminder = IncidentEmailReminder.objects.get(incident=incident)
+    assert (
+        reminder.sector_regulation_workflow_email == reminder_db["detection_reminder"]
+    )
+    assert reminder.due_date == incident.incident_detection_date + timedelta(hours=1)
+
+    incident_report = create_incident_report(incident, reminder_db["first_report"])
+
+    # the first report is submitted, the reminder of the second one is scheduled
+    reminder = IncidentEmailReminder.objects.get(incident=incident)
+    assert (
+        reminder.sector_regulation_workflow_email
+        == reminder_db["previous_report_reminder"]
+    )
+    assert reminder.due_date == incident_report.timestamp + timedelta(hours=2)
+
+
+@pytest.mark.django_db
+def test_email_reminder_sent_once(reminder_db, sent_emails):
+    """
+    Test that a missed reminder is sent at the next run, and only once
+    """
+    incident = reminder_db["incident"]
+
+    email_reminder.run()
+    email_reminder.run()
+
+    assert sent_emails == [(reminder_db["detection_reminder"].email, incident.pk)]
+    reminder = IncidentEmailReminder.objects.get(incident=incident)
+    assert reminder.sent_at is not None
+    assert not reminder.is_skipped
+
+
+@pytest.mark.django_db
+def test_email_reminders_scheduled_at_first_run(reminder_db, sent_emails):
+    """
+    Test that the reminders of the incidents created before the schedule are
+    scheduled by the next run
+    """
+    incident = reminder_db["incident"]
+    IncidentEmailReminder.objects.filter(incident=incident).delete()
+
+    email_reminder.run()
+
+    assert sent_emails == [(reminder_db["detection_reminder"].email, incident.pk)]
+    reminder = IncidentEmailReminder.objects.get(incident=incident)
+    assert (
+        reminder.sector_regulation_workflow_email == reminder_db["detection_reminder"]
+    )
+    assert reminder.sent_at is not None
+
+
+@pytest.mark.django_db
+def test_email_reminder_catch_up(reminder_db, sent_emails):
+    """
+    Test that the reminders due before the catch-up period are skipped
+    """
+    incident = reminder_db["incident"]
+    IncidentEmailReminder.objects.filter(incident=incident).update(
+        due_date=timezone.now() - timedelta(days=30)
+    )
+
+    email_reminder.run()
+
+    assert sent_emails == []
+    assert IncidentEmailReminder.objects.get(incident=incident).is_skipped
+
+
+@pytest.mark.django_db
+def test_email_reminder_closed_incident(reminder_db, sent_emails):
+    """
+    Test that the reminders of a closed incident are not sent
+    """
+    incident = reminder_db["incident"]
+    incident.incident_status = "CLOSE"
+    incident.save()
+
+    email_reminder.run()
+
+    assert sent_emails == []
+    assert not IncidentEmailReminder.objects.filter(incident=incident).exists()
+
+
+def test_get_chunks():
+    """
+    Test the chunk size and the maximum number of chunks
+    """
+    assert get_chunks([], 2, 10) == []
+    assert get_chunks(range(5), 2, 10) == [[0, 1], [2, 3], [4]]
+    # at most 2 chunks
+    assert get_chunks(range(5), 1, 2) == [[0, 1, 2], [3, 4]]
+
+
+@pytest.mark.django_db
+def test_email_reminder_chunks_logged(reminder_db, sent_emails):
+    """
+    Test that the results of the chunks are logged once
+    """
+    email_reminder.run()
+
+    log_entry = ScriptLogEntry.objects.filter(
+        object_repr__startswith="System:Email reminder script"
+    ).get()
+    assert "1 processed, 1 email(s) sent, 0 error(s)" in log_entry.object_repr
+    # the metrics of the run
+    assert log_entry.script_name == "email_reminder"
+    assert log_entry.duration is not None
+    assert (
+        log_entry.scanned,
+        log_entry.affected,
+        log_entry.emails,
+        log_entry.errors,
+    ) == (1, 1, 1, 0)
+
+    # a retried chunk does not send the reminder again
+    email_reminder.send_reminders(
+        list(IncidentEmailReminder.objects.values_list("pk", flat=True))
+    )
+    assert len(sent_emails) == 1
+
+
+@pytest.mark.django_db
+def test_email_reminder_chunk_failure(reminder_db, monkeypatch):
+    """
+    Test that the lease is released and the failure is logged when a chunk
+    fails
+    """
+    summaries = []
+
+    def record_chord(header, body):
+        summaries.append(body)
+        return SimpleNamespace(apply_async=lambda: None)
+
+    monkeypatch.setattr(fan_out, "chord", record_chord)
+
+    email_reminder.run()
+    # the lease is held by the chunks
+    assert ScriptLease.objects.get(name="email_reminder").holder != ""
+
+    # the result backend calls the errbacks of the summary when a chunk fails
+    for errback in summaries[0].options["link_error"]:
+        signature(errback)(None, DatabaseError("connection lost"), None)
+
+    assert ScriptLease.objects.get(name="email_reminder").holder == ""
+    log_entry = ScriptLogEntry.objects.get(
+        object_repr="System:Email reminder script failed"
+    )
+    assert log_entry.script_name == "email_reminder"
+    assert log_entry.errors == 1
+    assert log_entry.additional_info == "connection lost"
+
+
+@pytest.mark.django_db
+def test_workflow_update_status_sent_once(reminder_db, sent_emails):
+    """
+    Test that the overdue email of a report is sent once when a chunk is retried
+    """
+    incident = reminder_db["incident"]
+    report_status = IncidentReportStatus.objects.filter(incident=incident).earliest(
+        "position"
+    )
+    sr_workflow = report_status.sector_regulation_workflow
+    # the report is overdue since less than one hour
+    incident.incident_detection_date = timezone.now() - timedelta(
+        hours=sr_workflow.delay_in_hours_before_deadline, minutes=10
+    )
+    incident.save()
+    sector_regulation = incident.sector_regulation
+    sector_regulation.report_status_changed_email = Email.objects.first()
+    sector_regulation.save()
+
+    workflow_update_status.run()
+    workflow_update_status.update_status([report_status.pk])
+
+    assert sent_emails == [(sector_regulation.report_status_changed_email, incident.pk)]
+    assert IncidentReportStatus.objects.get(pk=report_status.pk).overdue_email_sent_at
+
+
+@pytest.mark.django_db
+def test_workflow_update_status_deadline_window(reminder_db, sent_emails):
+    """
+    Test that the reports whose deadline was crossed during the catch-up
+    window are found once
+    """
+    incident = reminder_db["incident"]
+    sector_regulation = incident.sector_regulation
+    sector_regulation.report_status_changed_email = Email.objects.first()
+    sector_regulation.save()
+    report_statuses = IncidentReportStatus.objects.filter(incident=incident)
+
+    report_statuses.update(deadline=timezone.now() + timedelta(minutes=10))
+    workflow_update_status.run()
+    report_statuses.update(
+        deadline=timezone.now()
+        - timedelta(hours=OVERDUE_EMAIL_CATCH_UP_IN_HOUR, minutes=10)
+    )
+    workflow_update_status.run()
+    assert sent_emails == []
+
+    # the run following the deadline was skipped
+    report_statuses.update(deadline=timezone.now() - timedelta(hours=2))
+    workflow_update_status.run()
+    assert len(sent_emails) == report_statuses.count()
+    workflow_update_status.run()
+    assert len(sent_emails) == report_statuses.count()
+
+
+@pytest.mark.django_db
+def test_email_reminder_skipped_when_running(reminder_db, sent_emails):
+    """
+    Test that a run is skipped while the previous one holds the lease
+    """
+    token = acquire_lease("email_reminder")
+
+    email_reminder.run()
+
+    assert sent_emails == []
+    assert ScriptLogEntry.objects.filter(
+        object_repr__startswith="System:email_reminder skipped"
+    ).exists()
+    assert ScriptLease.objects.get(name="email_reminder").holder == token
+
+
+@pytest.mark.django_db
+def test_email_reminder_expired_lease(reminder_db, sent_emails):
+    """
+    Test that an expired lease is taken and released with the run duration
+    """
+    acquire_lease("email_reminder")
+    ScriptLease.objects.filter(name="email_reminder").update(
+        expires_at=timezone.now() - timedelta(seconds=1)
+    )
+
+    email_reminder.run()
+
+    assert len(sent_emails) == 1
+    lease = ScriptLease.objects.get(name="email_reminder")
+    assert lease.holder == ""
+    assert lease.finished_at is not None
+    assert lease.last_duration is not None
+    assert acquire_lease("email_reminder") is not None
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+
+from governanceplatform import helpers
+from governanceplatform.helpers import markdown_to_safe_html, sanitize_html
+
+
+def test_markdown_to_safe_html_variables():
+    """
+    Test that the variables are kept in the HTML of the content
+    """
+    cache.clear()
+    html = markdown_to_safe_html(
+        "#INCIDENT_ID#\n\nDeadline: **#DEADLINE#** <script>alert(1)</script>"
+    )
+
+    assert "<p>#INCIDENT_ID#</p>" in html
+    assert "<strong>#DEADLINE#</strong>" in html
+    assert "<script>" not in html
+
+
+def test_markdown_to_safe_html_cached(monkeypatch):
+    """
+    Test that a content is converted once
+    """
+    cache.clear()
+    converted = []
+
+    def markdown(text, output_format):
+        converted.append(text)
+        return f"<p>{text}</p>"
+
+    monkeypatch.setattr(helpers, "markdown", markdown)
+
+    assert markdown_to_safe_html("Content") == "<p>Content</p>"
+    assert markdown_to_safe_html("Content") == "<p>Content</p>"
+    assert markdown_to_safe_html("Other content") == "<p>Other content</p>"
+    assert converted == ["Content", "Other content"]
+
+
+def test_sanitize_html_cleaners():
+    """
+    Test that the default Cleaner is reused and that the given rules are used
+    """
+    assert helpers.get_html_cleaner() is helpers.get_html_cleaner()
+    assert sanitize_html('<b style="color: red">B</b>') == "B"
+    assert sanitize_html("<b>B</b>", tags=["b"]) == "<b>B</b>"
@@ -0,0 +1,430 @@
+import csv
+import io
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from governanceplatform.models import (
+    ObserverRegulation,
+    ObserverUser,
+    RegulatorUser,
+    Sector,
+)
+from governanceplatform.settings import INCIDENT_EXPORT_TIMEOUT_IN_HOUR
+from incidents.export import EXPORT_FIXED_COLUMNS, get_export_columns, iter_export_rows
+from incidents.helpers import get_latest_incident_workflows
+from incidents.models import (
+    Answer,
+    Incident,
+    IncidentExport,
+    QuestionOptions,
+    SectorRegulationWorkflow,
+)
+from incidents.scripts import incident_export, incident_export_cleaning
+
+
+@pytest.fixture
+def export_db(populate_incident_db, create_incident, create_incident_report):
+    users = {u.email: u for u in populate_incident_db["users"]}
+    workflow = next(
+        (w for w in populate_incident_db["incidents_workflows"] if w.id == 1), None
+    )
+    sector = Sector.objects.filter(acronym="ELEC").first()
+    report = (
+        SectorRegulationWorkflow.objects.filter(sector_regulation=workflow)
+        .order_by("position")
+        .first()
+        .workflow
+    )
+    question_options = list(QuestionOptions.objects.filter(report=report))
+    RegulatorUser.objects.filter(user=users["regadmin@reg1.lu"]).update(
+        is_regulator_administrator=True, can_export_incidents=True
+    )
+    ObserverUser.objects.filter(user=users["obsadm@cert1.lu"]).update(
+        can_export_incidents=True
+    )
+    ObserverRegulation.objects.get_or_create(
+        observer=users["obsadm@cert1.lu"].observers.first(),
+        regulation=workflow.regulation,
+    )
+
+    for i in range(3):
+        incident = create_incident(
+            user=users["opadmin@com1.lu"],
+            workflow=workflow,
+            sectors=[sector],
+            incident_id=f"EXPORT-{i}",
+        )
+        incident_report = create_incident_report(incident, report)
+        Answer.objects.bulk_create(
+            [
+                Answer(
+                    incident_workflow=incident_report,
+                    question_options=question_option,
+                    answer=f"answer {i}",
+                )
+                for question_option in question_options
+            ]
+        )
+
+    populate_incident_db["export_workflow"] = workflow
+    populate_incident_db["export_report"] = report
+    return populate_incident_db
+
+
+@pytest.fixture
+def export_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr("incidents.export.PATH_FOR_INCIDENT_EXPORTS", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def export_async(monkeypatch):
+    monkeypatch.setattr("incidents.views.INCIDENT_EXPORT_ASYNC", True)
+
+
+def get_export_client(otp_client, export_db, email="regadmin@reg1.lu"):
+    user = next(u for u in export_db["users"] if u.email == email)
+    return user, otp_client(user)
+
+
+def post_export(client, export_db, file_format):
+    workflow = export_db["export_workflow"]
+    today = timezone.localdate()
+    return client.post(
+        reverse("export_incidents"),
+        {
+            "regulation": workflow.regulation_id,
+            "sectorregulation": workflow.id,
+            "workflow": export_db["export_report"].id,
+            "file_format": file_format,
+            "from_date": today.replace(day=1).isoformat(),
+            "to_date": today.isoformat(),
+        },
+    )
+
+
+def read_export(content, file_format):
+    if file_format == "csv":
+        return list(csv.reader(io.StringIO(content.decode())))
+    ws = load_workbook(io.BytesIO(content)).active
+    return [
+        ["" if value is None else value for value in row]
+        for row in ws.iter_rows(values_only=True)
+    ]
+
+
+def check_export_rows(rows):
+    header, data = rows[0], rows[1:]
+    assert header[: len(EXPORT_FIXED_COLUMNS)] == EXPORT_FIXED_COLUMNS
+    assert len(data) == 3
+    assert {row[header.index("Reference")] for row in data} == {
+        "EXPORT-0",
+        "EXPORT-1",
+        "EXPORT-2",
+    }
+
+
+@pytest.mark.django_db
+def test_export_columns_and_rows(export_db):
+    """
+    Test that the columns are derived before the rows and that each row fits them
+    """
+    workflow = export_db["export_workflow"]
+    report = export_db["export_report"]
+    incidents = Incident.objects.filter(incident_id__startswith="EXPORT-")
+
+    columns = get_export_columns(incidents, report, workflow.regulation)
+    assert columns[: len(EXPORT_FIXED_COLUMNS)] == EXPORT_FIXED_COLUMNS
+    assert "Impacted sectors 1" in columns
+
+    rows = list(iter_export_rows(incidents, report, columns, "en"))
+    assert len(rows) == 3
+    assert all(len(row) == len(columns) for row in rows)
+    references = {row[columns.index("Reference")] for row in rows}
+    assert references == {"EXPORT-0", "EXPORT-1", "EXPORT-2"}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("file_format", ["csv", "xlsx"])
+def test_export_incidents_file(monkeypatch, otp_client, export_db, file_format):
+    """
+    Test the streamed CSV and the write-only XLSX export in the request
+    """
+    monkeypatch.setattr("incidents.views.INCIDENT_EXPORT_ASYNC", False)
+    _user, client = get_export_client(otp_client, export_db)
+
+    response = post_export(client, export_db, file_format)
+    assert response.status_code == 200
+    assert response.streaming
+    check_export_rows(read_export(b"".join(response.streaming_content), file_format))
+
+
+@pytest.mark.django_db
+def test_observer_export_queries(
+    monkeypatch, otp_client, export_db, create_incident, create_incident_report
+):
+    """
+    Test that the incidents outside of the date range are not loaded
+    """
+    monkeypatch.setattr("incidents.views.INCIDENT_EXPORT_ASYNC", False)
+    _user, client = get_export_client(otp_client, export_db, "obsadm@cert1.lu")
+
+    def export_queries():
+        with CaptureQueriesContext(connection) as context:
+            response = post_export(client, export_db, "csv")
+            assert response.status_code == 200
+            rows = read_export(b"".join(response.streaming_content), "csv")
+        assert len(rows) == 4
+        return len(context.captured_queries)
+
+    queries = export_queries()
+
+    operator = next(u for u in export_db["users"] if u.email == "opadmin@com1.lu")
+    for i in range(10):
+        incident = create_incident(
+            user=operator,
+            workflow=export_db["export_workflow"],
+            incident_id=f"OLD-{i}",
+        )
+        create_incident_report(incident, export_db["export_report"])
+    Incident.objects.filter(incident_id__startswith="OLD-").update(
+        incident_notification_date=timezone.now() - timedelta(days=400)
+    )
+
+    assert export_queries() == queries
+
+
+@pytest.mark.django_db
+def test_latest_incident_workflows(export_db, create_incident_report):
+    """
+    Test that the bulk loader returns the latest report of each incident
+    """
+    report = export_db["export_report"]
+    incidents = list(Incident.objects.filter(incident_id__startswith="EXPORT-"))
+    newer_report = create_incident_report(incidents[0], report, comment="newer")
+
+    latest_reports = get_latest_incident_workflows(
+        [incident.pk for incident in incidents], report
+    )
+
+    assert set(latest_reports) == {incident.pk for incident in incidents}
+    assert latest_reports[incidents[0].pk] == newer_report
+
+
+@pytest.mark.django_db
+def test_export_rows_queries(export_db, create_incident, create_incident_report):
+    """
+    Test that the number of queries of the rows does not depend on the number
+    of incidents
+    """
+    workflow = export_db["export_workflow"]
+    report = export_db["export_report"]
+    incidents = Incident.objects.filter(incident_id__startswith="EXPORT-")
+    columns = get_export_columns(incidents, report, workflow.regulation)
+
+    def rows_queries():
+        with CaptureQueriesContext(connection) as context:
+            rows = list(iter_export_rows(incidents, report, columns, "en"))
+        return len(rows), len(context.captured_queries)
+
+    row_count, queries = rows_queries()
+
+    operator = next(u for u in export_db["users"] if u.email == "opadmin@com1.lu")
+    for i in range(3, 10):
+        incident = create_incident(
+            user=operator, workflow=workflow, incident_id=f"EXPORT-{i}"
+        )
+        create_incident_report(incident, report)
+
+    assert rows_queries() == (row_count + 7, queries)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("file_format", ["csv", "xlsx"])
+def test_export_incidents_job(
+    otp_client, export_db, export_storage, file_format, export_async
+):
+    """
+    Test the export job, its status and the download of its file
+    """
+    user, client = get_export_client(otp_client, export_db)
+
+    response = post_export(client, export_db, file_format)
+    assert response.status_code == 202
+    export = IncidentExport.objects.get(user=user)
+    assert export.status == "PENDING"
+    assert export.total_count == 3
+
+    # run by the celery worker once the request is committed
+    incident_export.run(export.pk)
+
+    response = client.get(reverse("incident_export_status", args=[export.pk]))
+    status = response.json()
+    assert status["status"] == "DONE"
+    assert status["progress"] == 100
+    assert status["row_count"] == 3
+
+    response = client.get(status["download_url"])
+    assert response.status_code == 200
+    check_export_rows(read_export(b"".join(response.streaming_content), file_format))
+
+    # the download link is only valid for the user of the export
+    other_user = next(u for u in export_db["users"] if u.email == "obsadm@cert1.lu")
+    response = otp_client(other_user).get(status["download_url"])
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_export_incidents_job_language(export_db, export_storage, settings):
+    """
+    Test that the question columns of the job match the rows in the user language
+    """
+    user = next(u for u in export_db["users"] if u.email == "regadmin@reg1.lu")
+    workflow = export_db["export_workflow"]
+    report = export_db["export_report"]
+    lang = "fr"
+    assert lang != settings.LANGUAGE_CODE
+    question_options = QuestionOptions.objects.filter(report=report).select_related(
+        "question"
+    )
+    for question_option in question_options:
+        question = question_option.question
+        question.set_current_language(lang)
+        question.label = f"FR {question.reference}"
+        question.save()
+
+    today = timezone.localdate()
+    export = IncidentExport.objects.create(
+        user=user,
+        regulation=workflow.regulation,
+        sector_regulation=workflow,
+        workflow=report,
+        from_date=today.replace(day=1),
+        to_date=today,
+        file_format="csv",
+        total_count=3,
+    )
+    incident_export.run(export.pk, lang)
+
+    export.refresh_from_db()
+    assert export.status == "DONE"
+    rows = read_export((export_storage / export.file_name).read_bytes(), "csv")
+    check_export_rows(rows)
+    header, data = rows[0], rows[1:]
+    fr_columns = [idx for idx, column in enumerate(header) if column.startswith("FR ")]
+    assert fr_columns
+    assert any(row[idx] for row in data for idx in fr_columns)
+
+
+@pytest.mark.django_db
+def test_export_incidents_job_claimed_once(
+    otp_client, export_db, export_storage, export_async
+):
+    """
+    Test that an export is generated by one worker only
+    """
+    user, client = get_export_client(otp_client, export_db)
+    post_export(client, export_db, "csv")
+    export = IncidentExport.objects.get(user=user)
+
+    # claimed by another worker
+    IncidentExport.objects.filter(pk=export.pk).update(status="RUNNING")
+    incident_export.run(export.pk)
+
+    export.refresh_from_db()
+    assert export.status == "RUNNING"
+    assert export.file_name == ""
+
+
+@pytest.mark.django_db
+def test_export_incidents_job_interrupted(
+    otp_client, export_db, export_storage, export_async
+):
+    """
+    Test that an export which never finishes is marked as failed
+    """
+    user, client = get_export_client(otp_client, export_db)
+    post_export(client, export_db, "csv")
+    export = IncidentExport.objects.get(user=user)
+    IncidentExport.objects.filter(pk=export.pk).update(status="RUNNING")
+
+    incident_export_cleaning.run()
+    export.refresh_from_db()
+    assert export.status == "RUNNING"
+
+    IncidentExport.objects.filter(pk=export.pk).update(
+        created_at=timezone.now() - timedelta(hours=INCIDENT_EXPORT_TIMEOUT_IN_HOUR)
+    )
+    incident_export_cleaning.run()
+    export.refresh_from_db()
+    assert export.status == "FAILED"
+    assert export.finished_at is not None
+
+    response = client.get(reverse("incident_export_status", args=[export.pk]))
+    assert response.json()["status"] == "FAILED"
+
+
+@pytest.mark.django_db
+def test_export_incidents_job_not_started(
+    monkeypatch,
+    django_capture_on_commit_callbacks,
+    otp_client,
+    export_db,
+    export_storage,
+    export_async,
+):
+    """
+    Test that an export which cannot be queued or is never run is marked as failed
+    """
+
+    def delay(*args, **kwargs):
+        raise ConnectionError("broker unavailable")
+
+    user, client = get_export_client(otp_client, export_db)
+    with monkeypatch.context() as m:
+        m.setattr(incident_export.run, "delay", delay)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = post_export(client, export_db, "csv")
+    assert response.status_code == 202
+    export = IncidentExport.objects.get(user=user)
+    assert export.status == "FAILED"
+    assert export.error == "broker unavailable"
+
+    # lost by the broker
+    IncidentExport.objects.filter(pk=export.pk).update(
+        status="PENDING",
+        created_at=timezone.now() - timedelta(hours=INCIDENT_EXPORT_TIMEOUT_IN_HOUR),
+    )
+    incident_export_cleaning.run()
+    export.refresh_from_db()
+    assert export.status == "FAILED"
+    assert export.finished_at is not None
+
+
+@pytest.mark.django_db
+def test_export_incidents_job_cleaning(
+    otp_client, export_db, export_storage, export_async
+):
+    """
+    Test that the old exports and their files are removed
+    """
+    user, client = get_export_client(otp_client, export_db)
+    post_export(client, export_db, "csv")
+    export = IncidentExport.objects.get(user=user)
+    incident_export.run(export.pk)
+    export.refresh_from_db()
+    assert (export_storage / export.file_name).exists()
+
+    IncidentExport.objects.filter(pk=export.pk).update(
+        created_at=timezone.now() - timedelta(days=2)
+    )
+    incident_export_cleaning.run()
+
+    assert not IncidentExport.objects.filter(pk=export.pk).exists()
+    assert not (export_storage / export.file_name).exists()
@@ -0,0 +1,116 @@
+import pytest
+from django.core.cache import cache
+
+from governanceplatform.helpers import can_access_incident
+from governanceplatform.models import EntityCategory, ObserverRegulation, User
+from governanceplatform.observer_rules import (
+    get_incident_observer_ids,
+    invalidate_observers_rules,
+)
+from governanceplatform.shared_cache import cache_scope
+from incidents.models import SectorRegulation
+
+INCIDENT_RULES = [
+    ({}, True),
+    ({"conditions": [{"include": ["ESS"]}]}, True),
+    ({"conditions": [{"include": ["IMP"]}]}, False),
+    ({"conditions": [{"exclude": ["ESS"]}]}, False),
+    ({"conditions": [{"include": ["ESS"], "exclude": ["IMP"]}]}, True),
+    ({"conditions": [{"include": ["ESS", "IMP"]}]}, False),
+    ({"conditions": [{"include": ["IMP"]}, {"include": ["ESS"]}]}, True),
+]
+
+
+@pytest.fixture
+def observer_incident(populate_incident_db, create_incident):
+    invalidate_observers_rules()
+    operator = User.objects.get(email="opadmin@com1.lu")
+    essential = EntityCategory.objects.create(label="Essential", code="ESS")
+    EntityCategory.objects.create(label="Important", code="IMP")
+    operator.companies.first().entity_categories.set([essential])
+    observer = User.objects.get(email="obsadm@cert1.lu").observers.first()
+    observer.is_receiving_all_incident = False
+    observer.save()
+    incident = create_incident(
+        user=operator, workflow=SectorRegulation.objects.get(id=2)
+    )
+    return observer, incident
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("incident_rule, expected", INCIDENT_RULES)
+def test_observer_incident_rules(observer_incident, incident_rule, expected):
+    """
+    Test that the cached rules give the incidents of the observer queryset
+    """
+    observer, incident = observer_incident
+    ObserverRegulation.objects.create(
+        observer=observer,
+        regulation=incident.sector_regulation.regulation,
+        incident_rule=incident_rule,
+    )
+
+    assert observer.can_access_incident(incident) is expected
+    assert (incident in observer.get_incidents()) is expected
+    assert (observer.pk in get_incident_observer_ids(incident)) is expected
+    assert (
+        can_access_incident(User.objects.get(email="obsadm@cert1.lu"), incident)
+        is expected
+    )
+
+
+@pytest.mark.django_db
+def test_observer_incident_rules_invalidated(observer_incident):
+    """
+    Test that the cached rules follow the changes of the observer
+    """
+    observer, incident = observer_incident
+    assert not observer.can_access_incident(incident)
+
+    observer_regulation = ObserverRegulation.objects.create(
+        observer=observer,
+        regulation=incident.sector_regulation.regulation,
+        incident_rule={"conditions": [{"include": ["IMP"]}]},
+    )
+    assert not observer.can_access_incident(incident)
+
+    observer_regulation.incident_rule = {"conditions": [{"include": ["ESS"]}]}
+    observer_regulation.save()
+    assert observer.can_access_incident(incident)
+
+    observer_regulation.delete()
+    assert not observer.can_access_incident(incident)
+
+    observer.is_receiving_all_incident = True
+    observer.save()
+    assert observer.can_access_incident(incident)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("shared_cache_alias", [None, "default"])
+def test_observer_revoked_by_another_process(
+    observer_incident, settings, shared_cache_alias
+):
+    """
+    Test that an observer revoked by another process does not access the
+    incident in the next requests, with or without shared cache
+    """
+    settings.SHARED_CACHE_ALIAS = shared_cache_alias
+    cache.clear()
+    observer, incident = observer_incident
+    observer_regulation = ObserverRegulation.objects.create(
+        observer=observer, regulation=incident.sector_regulation.regulation
+    )
+
+    with cache_scope():
+        assert observer.can_access_incident(incident)
+        assert observer.pk in get_incident_observer_ids(incident)
+    # the signals of the other process clear the shared cache
+    if shared_cache_alias:
+        observer_regulation.delete()
+    else:
+        ObserverRegulation.objects.filter(pk=observer_regulation.pk).delete()
+
+    with cache_scope():
+        assert not observer.can_access_incident(incident)
+        assert observer.pk not in get_incident_observer_ids(incident)
@@ -0,0 +1,143 @@
+from datetime import timedelta
+from urllib.parse import urlencode
+
+import pytest
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from incidents.models import Incident
+from incidents.pagination import CursorPaginator, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def many_incidents(populate_incident_db, create_incident):
+    users = populate_incident_db["users"]
+    user = next((u for u in users if u.email == "opadmin@com1.lu"), None)
+    workflow = next(
+        (w for w in populate_incident_db["incidents_workflows"] if w.id == 1), None
+    )
+    now = timezone.now()
+    for i in range(7):
+        incident = create_incident(
+            user=user,
+            workflow=workflow,
+            incident_id=f"XXXX-SSS-SSS-{i + 10:04d}-2005",
+            incident_detection_date=now,
+        )
+        # same dates for some incidents to check the ordering on the id
+        Incident.objects.filter(pk=incident.pk).update(
+            incident_last_update=now - timedelta(hours=i // 2)
+        )
+    return populate_incident_db
+
+
+def collect_pages(paginator):
+    pages = []
+    page = paginator.get_page()
+    pages.append(page)
+    while page.has_next():
+        page = paginator.get_page(page.next_cursor)
+        pages.append(page)
+    return pages
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("direction", ["desc", "asc"])
+def test_cursor_pagination_follows_ordering(many_incidents, direction):
+    """
+    Test that the cursor pages give all the incidents once in the right order
+    """
+    queryset = Incident.objects.all()
+    prefix = "-" if direction == "desc" else ""
+    expected = list(
+        queryset.order_by(f"{prefix}incident_last_update", f"{prefix}pk").values_list(
+            "pk", flat=True
+        )
+    )
+    paginator = CursorPaginator(queryset, "incident_last_update", direction, 3)
+
+    pages = collect_pages(paginator)
+    assert [incident.pk for page in pages for incident in page] == expected
+    assert not pages[0].has_previous()
+
+    # go back from the last page
+    previous_page = paginator.get_page(pages[-1].previous_cursor)
+    assert [i.pk for i in previous_page] == [i.pk for i in pages[-2]]
+    assert previous_page.has_next()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("direction", ["desc", "asc"])
+def test_cursor_pagination_with_null_values(many_incidents, direction):
+    """
+    Test that the cursor pages go forward and backward through the incidents
+    whose sort value is null, which are last in both directions
+    """
+    queryset = Incident.objects.all()
+    null_pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:5])
+    queryset.filter(pk__in=null_pks).update(incident_last_update=None)
+    value = F("incident_last_update")
+    if direction == "desc":
+        ordering = value.desc(nulls_last=True), F("pk").desc()
+    else:
+        ordering = value.asc(nulls_last=True), F("pk").asc()
+    expected = list(queryset.order_by(*ordering).values_list("pk", flat=True))
+    paginator = CursorPaginator(queryset, "incident_last_update", direction, 2)
+
+    pages = collect_pages(paginator)
+    assert [incident.pk for page in pages for incident in page] == expected
+    assert [page.number for page in pages] == list(range(1, len(pages) + 1))
+    assert paginator.num_pages == len(pages)
+    # the last pages only have null values
+    assert all(incident.pk in null_pks for incident in pages[-1])
+
+    # go back page by page from the last page
+    page = pages[-1]
+    for expected_page in reversed(pages[:-1]):
+        page = paginator.get_page(page.previous_cursor)
+        assert [i.pk for i in page] == [i.pk for i in expected_page]
+        assert page.number == expected_page.number
+    assert not page.has_previous()
+
+
+@pytest.mark.django_db
+def test_cursor_is_bound_to_sort_key():
+    """
+    Test that a cursor made for another sort is ignored
+    """
+    cursor = encode_cursor("last_update:desc", timezone.now(), 1)
+    assert decode_cursor(cursor, "last_update:desc") is not None
+    assert decode_cursor(cursor, "reference:asc") is None
+    assert decode_cursor("not a cursor", "last_update:desc") is None
+
+
+@pytest.mark.django_db
+def test_incidents_view_cursor_mode(otp_client, many_incidents):
+    """
+    Test the incidents list in cursor mode
+    """
+    users = many_incidents["users"]
+    user = next((u for u in users if u.email == "opadmin@com1.lu"), None)
+    client = otp_client(user)
+
+    response = client.get(reverse("incidents"), {"cursor": "", "per_page": 5})
+    assert response.status_code == 200
+    page = response.context["incidents"]
+    assert len(page) == 5
+    assert page.has_next()
+
+    assert response.context["is_cursor_pagination"]
+    # the pages are navigated with the cursors
+    html = render_to_string(
+        "incidents/cursor_pagination.html",
+        {"page": page},
+        request=response.wsgi_request,
+    )
+    assert urlencode({"cursor": page.next_cursor}) in html
+
+    response = client.get(reverse("incidents"), {"cursor": page.next_cursor})
+    assert response.status_code == 200
+    assert response.context["incidents"].has_previous()
+    assert response.context["incidents"].number == 2
@@ -0,0 +1,335 @@
+"""
+Query count and duration of the incident views for each role.
+
+- NISINP_PERF_INCIDENTS: number of incidents seeded per reporting user (10)
+- NISINP_RECORD_QUERY_BUDGETS=1: record the query counts as the new budgets in
+  query_budgets.json instead of checking them, the counts of the pages include
+  the queries of the theme templates so they are recorded with the theme. A
+  measure without budget fails.
+- NISINP_PERF_REPORT=<path>: write the query counts and durations in a JSON file
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from governanceplatform.helpers import can_access_incident
+from governanceplatform.models import (
+    ObserverRegulation,
+    ObserverUser,
+    RegulatorUser,
+    Sector,
+)
+from incidents.models import (
+    Answer,
+    IncidentWorkflow,
+    QuestionOptions,
+    ReportTimeline,
+    SectorRegulationWorkflow,
+)
+
+PERF_INCIDENTS = int(os.environ.get("NISINP_PERF_INCIDENTS", 10))
+RECORD_QUERY_BUDGETS = os.environ.get("NISINP_RECORD_QUERY_BUDGETS") == "1"
+PERF_REPORT = os.environ.get("NISINP_PERF_REPORT")
+QUERY_BUDGETS_FILE = Path(__file__).parent / "query_budgets.json"
+
+ROLE_USERS = {
+    "RegulatorAdmin": "regadmin@reg1.lu",
+    "RegulatorUser": "reguser@reg1.lu",
+    "OperatorAdmin": "opadmin@com1.lu",
+    "OperatorUser": "opuser@com1.lu",
+    "IncidentUser": "iu1@iu.lu",
+    "Observer": "obsadm@cert1.lu",
+}
+# users who declare the seeded incidents
+REPORTING_USERS = ["opadmin@com1.lu", "iu1@iu.lu", "regadmin@reg1.lu"]
+
+measures = {}
+
+
+@pytest.fixture(scope="module")
+def query_budgets():
+    budgets = {}
+    if QUERY_BUDGETS_FILE.exists():
+        budgets = json.loads(QUERY_BUDGETS_FILE.read_text())
+
+    yield budgets
+
+    if RECORD_QUERY_BUDGETS:
+        QUERY_BUDGETS_FILE.write_text(
+            json.dumps(dict(sorted(budgets.items())), indent=2) + "\n"
+        )
+    if PERF_REPORT:
+        Path(PERF_REPORT).write_text(
+            json.dumps(dict(sorted(measures.items())), indent=2) + "\n"
+        )
+
+
+def measure(name, query_budgets, request):
+    """Run request(), record its query count and duration and check the budget."""
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        response = request()
+        duration = time.perf_counter() - start
+    query_count = len(context.captured_queries)
+    measures[name] = {"queries": query_count, "seconds": round(duration, 4)}
+
+    if RECORD_QUERY_BUDGETS:
+        query_budgets[name] = query_count
+    elif name in query_budgets:
+        assert (
+            query_count <= query_budgets[name]
+        ), f"{name}: {query_count} queries, budget is {query_budgets[name]}"
+    else:
+        pytest.fail(
+            f"{name}: {query_count} queries, no budget in {QUERY_BUDGETS_FILE.name}, "
+            "record it with NISINP_RECORD_QUERY_BUDGETS=1"
+        )
+    return response, query_count
+
+
+def read_response(response):
+    """Read a streamed response, its content is generated while it is sent."""
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response
+
+
+@pytest.fixture
+def perf_db(populate_incident_db, create_incident):
+    """
+    Seed incidents with a submitted report and its answers for several users
+    """
+    users = {u.email: u for u in populate_incident_db["users"]}
+    # asectorial workflow of REG1
+    workflow = next(
+        (w for w in populate_incident_db["incidents_workflows"] if w.id == 1), None
+    )
+    sector = Sector.objects.filter(acronym="ELEC").first()
+    first_report = (
+        SectorRegulationWorkflow.objects.filter(sector_regulation=workflow)
+        .order_by("position")
+        .first()
+        .workflow
+    )
+    question_options = list(QuestionOptions.objects.filter(report=first_report))
+
+    RegulatorUser.objects.filter(user=users["regadmin@reg1.lu"]).update(
+        is_regulator_administrator=True, can_export_incidents=True
+    )
+    for regulator_user in RegulatorUser.objects.filter(user=users["reguser@reg1.lu"]):
+        regulator_user.sectors.add(sector)
+    ObserverUser.objects.filter(user=users["obsadm@cert1.lu"]).update(
+        can_export_incidents=True
+    )
+    observer = users["obsadm@cert1.lu"].observers.first()
+    ObserverRegulation.objects.get_or_create(
+        observer=observer, regulation=workflow.regulation
+    )
+
+    incident_workflows = []
+    for email in REPORTING_USERS:
+        for i in range(PERF_INCIDENTS):
+            incident = create_incident(
+                user=users[email],
+                workflow=workflow,
+                sectors=[sector],
+                incident_id=f"PERF-{email[:6]}-{i:04d}",
+                incident_detection_date=timezone.now(),
+            )
+            report_timeline = ReportTimeline.objects.create(
+                incident_detection_date=incident.incident_detection_date
+            )
+            incident_workflow = IncidentWorkflow.objects.create(
+                incident=incident,
+                workflow=first_report,
+                report_timeline=report_timeline,
+            )
+            Answer.objects.bulk_create(
+                [
+                    Answer(
+                        incident_workflow=incident_workflow,
+                        question_options=question_option,
+                        answer=f"answer {i}",
+                    )
+                    for question_option in question_options
+                ]
+            )
+            incident_workflows.append(incident_workflow)
+
+    populate_incident_db["perf_workflow"] = workflow
+    populate_incident_db["perf_report"] = first_report
+    populate_incident_db["perf_incident_workflows"] = incident_workflows
+    return populate_incident_db
+
+
+def get_role_client(otp_client, perf_db, role):
+    user = next(u for u in perf_db["users"] if u.email == ROLE_USERS[role])
+    client = otp_client(user)
+    # first request to initialize the session (company in use, etc.)
+    client.get(reverse("incidents"))
+    return user, client
+
+
+def get_accessible_incident_workflow(user, client, perf_db):
+    company_id = client.session.get("company_in_use")
+    return next(
+        (
+            iw
+            for iw in perf_db["perf_incident_workflows"]
+            if can_access_incident(user, iw.incident, company_id)
+        ),
+        None,
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("role", ROLE_USERS.keys())
+def test_get_incidents_queries(otp_client, perf_db, query_budgets, role):
+    """
+    The query count of the incidents list does not depend on the page size
+    """
+    user, client = get_role_client(otp_client, perf_db, role)
+    url = reverse("incidents")
+
+    response, small_page_queries = measure(
+        f"get_incidents:{role}:per_page_5",
+        query_budgets,
+        lambda: client.get(url, {"per_page": 5, "page": 1}),
+    )
+    assert response.status_code == 200
+    response, large_page_queries = measure(
+        f"get_incidents:{role}:per_page_50",
+        query_budgets,
+        lambda: client.get(url, {"per_page": 50, "page": 1}),
+    )
+    assert response.status_code == 200
+    assert large_page_queries == small_page_queries
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("role", ROLE_USERS.keys())
+def test_get_incidents_group_queries(otp_client, perf_db, role):
+    """
+    The groups of the user are loaded at most once per request
+    """
+    _user, client = get_role_client(otp_client, perf_db, role)
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(reverse("incidents"))
+    assert response.status_code == 200
+    group_queries = [
+        query["sql"]
+        for query in context.captured_queries
+        if 'FROM "auth_group"' in query["sql"]
+    ]
+    assert len(group_queries) <= 1, group_queries
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("role", ROLE_USERS.keys())
+def test_incident_access_log_and_pdf_queries(otp_client, perf_db, query_budgets, role):
+    """
+    Query budget of the access log and of the PDF of an incident
+    """
+    user, client = get_role_client(otp_client, perf_db, role)
+    incident_workflow = get_accessible_incident_workflow(user, client, perf_db)
+    if incident_workflow is None:
+        pytest.skip(f"no seeded incident accessible for {role}")
+    incident_id = incident_workflow.incident_id
+
+    response, _queries = measure(
+        f"access_log:{role}",
+        query_budgets,
+        lambda: client.get(reverse("access_log", args=[incident_id])),
+    )
+    assert response.status_code == 200
+    response, _queries = measure(
+        f"download_incident_pdf:{role}",
+        query_budgets,
+        lambda: client.get(reverse("download_incident_pdf", args=[incident_id])),
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("role", ROLE_USERS.keys())
+@pytest.mark.parametrize("file_format", ["csv", "xlsx"])
+def test_export_incidents_queries(
+    monkeypatch, otp_client, perf_db, query_budgets, role, file_format
+):
+    """
+    Query budget of the incidents export
+    """
+    # the budgets are recorded for the export generated in the request
+    monkeypatch.setattr("incidents.views.INCIDENT_EXPORT_ASYNC", False)
+    user, client = get_role_client(otp_client, perf_db, role)
+    workflow = perf_db["perf_workflow"]
+    today = timezone.localdate()
+
+    response, _queries = measure(
+        f"export_incidents:{role}:{file_format}",
+        query_budgets,
+        lambda: read_response(
+            client.post(
+                reverse("export_incidents"),
+                {
+                    "regulation": workflow.regulation_id,
+                    "sectorregulation": workflow.id,
+                    "workflow": perf_db["perf_report"].id,
+                    "file_format": file_format,
+                    "from_date": today.replace(day=1).isoformat(),
+                    "to_date": today.isoformat(),
+                },
+            )
+        ),
+    )
+    if role in ("RegulatorAdmin", "Observer"):
+        assert response.status_code == 200
+    else:
+        # forbidden by the view or by the routes of the role
+        assert response.status_code in (302, 403, 404)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("role", ROLE_USERS.keys())
+def test_workflow_wizard_steps_queries(otp_client, perf_db, query_budgets, role):
+    """
+    Query budget of each step of the review of a report
+    """
+    user, client = get_role_client(otp_client, perf_db, role)
+    incident_workflow = get_accessible_incident_workflow(user, client, perf_db)
+    if incident_workflow is None:
+        pytest.skip(f"no seeded incident accessible for {role}")
+    url = f"{reverse('review_workflow')}?incident_workflow_id={incident_workflow.id}"
+
+    response, _queries = measure(
+        f"workflow_wizard:{role}:step_0",
+        query_budgets,
+        lambda: client.get(url),
+    )
+    assert response.status_code == 200
+
+    wizard = response.context["wizard"]
+    steps = list(wizard["steps"].all)
+    prefix = wizard["management_form"].prefix
+    for current_step, next_step in zip(steps, steps[1:], strict=False):
+        response, _queries = measure(
+            f"workflow_wizard:{role}:step_{next_step}",
+            query_budgets,
+            lambda current_step=current_step, next_step=next_step: client.post(
+                url,
+                {
+                    f"{prefix}-current_step": current_step,
+                    "wizard_goto_step": next_step,
+                },
+            ),
+        )
+        assert response.status_code == 200
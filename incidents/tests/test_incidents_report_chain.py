@@ -0,0 +1,84 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from governanceplatform.shared_cache import cache_scope
+from incidents.models import SectorRegulation, SectorRegulationWorkflow
+from incidents.report_chain import get_report_chain
+
+
+@pytest.mark.django_db
+def test_report_chain_order_and_lookups(populate_incident_db):
+    """
+    Test the previous and next reports of the cached report chain
+    """
+    sector_regulation = SectorRegulation.objects.get(id=2)
+    sr_workflows = list(
+        SectorRegulationWorkflow.objects.filter(
+            sector_regulation=sector_regulation
+        ).order_by("position")
+    )
+    with cache_scope():
+        report_chain = get_report_chain(sector_regulation.id)
+
+        # the chain is served from the cache until the end of the request
+        with CaptureQueriesContext(connection) as context:
+            get_report_chain(sector_regulation.id)
+        assert len(context.captured_queries) == 0
+
+    assert report_chain.workflow_ids == [srw.workflow_id for srw in sr_workflows]
+    first, last = sr_workflows[0], sr_workflows[-1]
+    assert report_chain.get_previous_step(first.workflow_id) is None
+    assert report_chain.get_next_step(first.workflow_id).id == sr_workflows[1].id
+    assert report_chain.get_previous_step(last.workflow_id).id == sr_workflows[-2].id
+    assert report_chain.get_next_step(last.workflow_id) is None
+    assert last.get_previous_report() == sr_workflows[-2]
+
+
+@pytest.mark.django_db
+def test_report_chain_invalidated_on_change(populate_incident_db):
+    """
+    Test that the report chain is cleared when the reports of the workflow change
+    """
+    sector_regulation = SectorRegulation.objects.get(id=1)
+    report_chain = get_report_chain(sector_regulation.id)
+    last = SectorRegulationWorkflow.objects.filter(
+        sector_regulation=sector_regulation
+    ).order_by("-position")[0]
+
+    last.delete()
+
+    new_report_chain = get_report_chain(sector_regulation.id)
+    assert len(new_report_chain) == len(report_chain) - 1
+    assert last.workflow_id not in new_report_chain.workflow_ids
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("shared_cache_alias", [None, "default"])
+def test_report_chain_changed_by_another_process(
+    populate_incident_db, settings, shared_cache_alias
+):
+    """
+    Test that a report chain changed by another process is read by the next
+    requests, with or without shared cache
+    """
+    settings.SHARED_CACHE_ALIAS = shared_cache_alias
+    cache.clear()
+    sector_regulation = SectorRegulation.objects.get(id=1)
+    last = SectorRegulationWorkflow.objects.filter(
+        sector_regulation=sector_regulation
+    ).order_by("-position")[0]
+
+    with cache_scope():
+        report_chain = get_report_chain(sector_regulation.id)
+    # the signals of the other process clear the shared cache
+    if shared_cache_alias:
+        assert cache.get(f"incidents_report_chain_{sector_regulation.id}")
+        last.delete()
+    else:
+        SectorRegulationWorkflow.objects.filter(pk=last.pk).delete()
+
+    with cache_scope():
+        new_report_chain = get_report_chain(sector_regulation.id)
+    assert len(new_report_chain) == len(report_chain) - 1
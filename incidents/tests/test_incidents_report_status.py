@@ -0,0 +1,250 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from incidents.helpers import compute_incident_report_statuses
+from incidents.models import (
+    Incident,
+    IncidentReportStatus,
+    SectorRegulationWorkflow,
+)
+
+# tables read to compute the status of the reports of the overview
+REPORT_STATUS_TABLES = (
+    "incidents_incidentreportstatus",
+    "incidents_incidentworkflow",
+    "incidents_sectorregulationworkflow",
+)
+
+
+def count_report_status_queries(captured_queries):
+    return len(
+        [
+            query
+            for query in captured_queries
+            if any(table in query["sql"] for table in REPORT_STATUS_TABLES)
+        ]
+    )
+
+
+@pytest.mark.django_db
+def test_report_status_updated_on_incident_report_save(
+    populate_incident_db, create_incident_report
+):
+    """
+    Test that the report statuses follow the reports of the incident
+    """
+    incident = next(
+        (
+            i
+            for i in populate_incident_db["incidents"]
+            if i.incident_id == "XXXX-SSS-SSS-0001-2005"
+        ),
+        None,
+    )
+    report_statuses = list(incident.report_statuses.order_by("position"))
+    sr_workflow_ids = list(
+        SectorRegulationWorkflow.objects.filter(
+            sector_regulation=incident.sector_regulation
+        )
+        .order_by("position")
+        .values_list("workflow_id", flat=True)
+    )
+    assert [rs.workflow_id for rs in report_statuses] == sr_workflow_ids
+    assert all(rs.latest_incident_workflow is None for rs in report_statuses)
+    assert all(rs.get_status() == "UNDE" for rs in report_statuses)
+
+    report = report_statuses[0].workflow
+    incident_report = create_incident_report(incident, report)
+
+    report_status = incident.report_statuses.get(workflow=report)
+    assert report_status.latest_incident_workflow == incident_report
+    assert report_status.get_status() == incident_report.review_status
+
+
+@pytest.mark.django_db
+def test_incidents_overview_report_status_queries(
+    otp_client, populate_incident_db, create_incident
+):
+    """
+    Test that the number of queries used for the status of the reports
+    does not depend on the number of incidents displayed
+    """
+    users = populate_incident_db["users"]
+    user = next((u for u in users if u.email == "opadmin@com1.lu"), None)
+    workflow = next(
+        (w for w in populate_incident_db["incidents_workflows"] if w.id == 1), None
+    )
+    client = otp_client(user)
+    url = reverse("incidents")
+    # first call to initialize the session
+    client.get(url)
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    queries_with_one_incident = count_report_status_queries(context.captured_queries)
+
+    for i in range(5):
+        create_incident(
+            user=user,
+            workflow=workflow,
+            incident_id=f"XXXX-SSS-SSS-000{i + 2}-2005",
+            incident_detection_date=timezone.now(),
+        )
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.context["incidents"]) == 6
+    assert (
+        count_report_status_queries(context.captured_queries)
+        == queries_with_one_incident
+    )
+
+
+@pytest.mark.django_db
+def test_incident_next_deadline(
+    populate_incident_db,
+    create_incident,
+    create_incident_report,
+    django_assert_num_queries,
+):
+    """
+    Test that the stored next deadline follows the reports of the incident
+    """
+    users = populate_incident_db["users"]
+    user = next((u for u in users if u.email == "opadmin@com1.lu"), None)
+    # workflow with deadlines on the detection date and on the previous report
+    workflow = next(
+        (w for w in populate_incident_db["incidents_workflows"] if w.id == 2), None
+    )
+    detection_date = timezone.now()
+    incident = create_incident(
+        user=user,
+        workflow=workflow,
+        incident_id="XXXX-SSS-SSS-0002-2005",
+        incident_detection_date=detection_date,
+    )
+    sr_workflows = list(
+        SectorRegulationWorkflow.objects.filter(sector_regulation=workflow).order_by(
+            "position"
+        )
+    )
+
+    incident.refresh_from_db()
+    assert incident.next_sector_regulation_workflow == sr_workflows[0]
+    assert incident.next_deadline == detection_date + timedelta(
+        hours=sr_workflows[0].delay_in_hours_before_deadline
+    )
+
+    incident_report = create_incident_report(incident, sr_workflows[0].workflow)
+
+    incident.refresh_from_db()
+    assert incident.next_sector_regulation_workflow == sr_workflows[1]
+    assert incident.next_deadline == incident_report.timestamp + timedelta(
+        hours=sr_workflows[1].delay_in_hours_before_deadline
+    )
+    assert incident.get_deadline() == incident.next_deadline
+
+    for sr_workflow in sr_workflows[1:]:
+        create_incident_report(incident, sr_workflow.workflow)
+
+    # all the reports are submitted, the deadline is read without query
+    incident = Incident.objects.get(pk=incident.pk)
+    assert incident.next_sector_regulation_workflow_id is None
+    with django_assert_num_queries(0):
+        assert incident.get_deadline() is None
+
+
+@pytest.mark.django_db
+def test_report_status_rebuilt_on_commit(
+    populate_incident_db, celery_eager, django_capture_on_commit_callbacks
+):
+    """
+    Test that the reports of a workflow edited in a transaction update the
+    report statuses of its incidents once it is committed
+    """
+    incident = next(
+        (
+            i
+            for i in populate_incident_db["incidents"]
+            if i.incident_id == "XXXX-SSS-SSS-0001-2005"
+        ),
+        None,
+    )
+    sr_workflows = list(
+        SectorRegulationWorkflow.objects.filter(
+            sector_regulation=incident.sector_regulation
+        ).order_by("position")
+    )
+    report_status_pk = incident.report_statuses.get(
+        sector_regulation_workflow=sr_workflows[0]
+    ).pk
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        for sr_workflow in sr_workflows:
+            sr_workflow.delay_in_hours_before_deadline += 1
+            sr_workflow.save()
+        sr_workflows[-1].delete()
+    assert callbacks
+
+    report_statuses = list(incident.report_statuses.order_by("position"))
+    assert [rs.sector_regulation_workflow_id for rs in report_statuses] == [
+        sr_workflow.id for sr_workflow in sr_workflows[:-1]
+    ]
+    assert [rs.deadline for rs in report_statuses] == [
+        rs.deadline for rs in compute_incident_report_statuses(incident)
+    ]
+    # the statuses are updated in place
+    assert report_statuses[0].pk == report_status_pk
+
+
+@pytest.mark.django_db
+def test_incidents_overview_does_not_write_report_status(
+    otp_client, populate_incident_db
+):
+    """
+    Test that the overview computes the missing report statuses without
+    storing them
+    """
+    users = populate_incident_db["users"]
+    user = next((u for u in users if u.email == "opadmin@com1.lu"), None)
+    incident = next(
+        (
+            i
+            for i in populate_incident_db["incidents"]
+            if i.incident_id == "XXXX-SSS-SSS-0001-2005"
+        ),
+        None,
+    )
+    client = otp_client(user)
+    url = reverse("incidents")
+    # first call to initialize the session
+    client.get(url)
+    IncidentReportStatus.objects.filter(incident=incident).delete()
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert not [
+        query
+        for query in context.captured_queries
+        if "incidents_incidentreportstatus" in query["sql"]
+        and not query["sql"].startswith("SELECT")
+    ]
+    assert not IncidentReportStatus.objects.filter(incident=incident).exists()
+
+    displayed_incident = next(
+        i for i in response.context["incidents"] if i.pk == incident.pk
+    )
+    assert (
+        len(displayed_incident.all_reports)
+        == SectorRegulationWorkflow.objects.filter(
+            sector_regulation=incident.sector_regulation
+        ).count()
+    )
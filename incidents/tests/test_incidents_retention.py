@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from governanceplatform.models import ScriptLogEntry, User
+from governanceplatform.settings import INCIDENT_RETENTION_TIME_IN_DAY
+from incidents.models import Incident, SectorRegulation
+from incidents.scripts import batch_delete, incident_cleaning
+
+
+@pytest.fixture
+def expired_incidents(populate_incident_db, create_incident):
+    user = User.objects.get(email="opadmin@com1.lu")
+    workflow = SectorRegulation.objects.get(id=2)
+    incidents = [create_incident(user=user, workflow=workflow) for _i in range(3)]
+    Incident.objects.filter(pk__in=[incidents[0].pk, incidents[1].pk]).update(
+        incident_notification_date=timezone.now()
+        - timedelta(days=INCIDENT_RETENTION_TIME_IN_DAY + 1)
+    )
+    return incidents
+
+
+def get_remaining_pks(incidents):
+    return list(
+        Incident.objects.filter(pk__in=[incident.pk for incident in incidents])
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def get_log_entries():
+    return list(
+        ScriptLogEntry.objects.filter(
+            object_repr__startswith="System:Incident script deletion"
+        )
+        .order_by("pk")
+        .values_list("object_repr", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_incident_cleaning_dry_run(expired_incidents):
+    """
+    Test that the dry run only logs the number of incidents to delete
+    """
+    incident_cleaning.run(dry_run=True)
+
+    assert len(get_remaining_pks(expired_incidents)) == 3
+    assert get_log_entries() == [
+        "System:Incident script deletion (dry run) 2 incident(s) to delete"
+    ]
+
+
+@pytest.mark.django_db
+def test_incident_cleaning_resumed(expired_incidents, monkeypatch):
+    """
+    Test that the deletion stops when the time budget is spent and that the
+    next run continues
+    """
+    monkeypatch.setattr(batch_delete, "RETENTION_CLEANING_BATCH_SIZE", 1)
+    monkeypatch.setattr(batch_delete, "RETENTION_CLEANING_TIME_BUDGET_IN_SECOND", 1e-9)
+
+    incident_cleaning.run()
+    # the oldest ids are deleted first
+    assert get_remaining_pks(expired_incidents) == [
+        expired_incidents[1].pk,
+        expired_incidents[2].pk,
+    ]
+
+    incident_cleaning.run()
+    assert get_remaining_pks(expired_incidents) == [expired_incidents[2].pk]
+
+    assert get_log_entries() == [
+        "System:Incident script deletion 1 incident(s) deleted, "
+        "the next run continues",
+        "System:Incident script deletion 1 incident(s) deleted",
+    ]
@@ -0,0 +1,143 @@
+import pytest
+import requests
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from governanceplatform.models import User
+from incidents import rt
+from incidents.email import send_rt_ticket
+from incidents.models import OutgoingEmail, RTTicket, SectorRegulation
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data or {}
+        self.text = ""
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, get_response, post_response=None):
+        self.get_response = get_response
+        self.post_response = post_response
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append(("GET", url))
+        if isinstance(self.get_response, Exception):
+            raise self.get_response
+        return self.get_response
+
+    def post(self, url, **kwargs):
+        self.requests.append(("POST", url))
+        return self.post_response
+
+
+@pytest.fixture
+def rt_observer(populate_incident_db, create_incident, monkeypatch):
+    rt.tokens.clear()
+    rt.queue_checks.clear()
+    monkeypatch.setattr(rt, "validate_rt_url", lambda url: None)
+    observer = User.objects.get(email="obsadm@cert1.lu").observers.first()
+    observer.rt_url = "https://rt.example.org"
+    observer.rt_queue = "incidents"
+    observer.rt_token = "secret"
+    observer.save()
+    incident = create_incident(
+        user=User.objects.get(email="opadmin@com1.lu"),
+        workflow=SectorRegulation.objects.get(id=2),
+    )
+    return observer, incident
+
+
+def use_session(monkeypatch, session):
+    monkeypatch.setattr(rt, "get_session", lambda base_url: session)
+    return session
+
+
+@pytest.mark.django_db
+def test_rt_queue_check_cached(rt_observer, monkeypatch):
+    """
+    Test that the RT queue is requested once for several tickets
+    """
+    observer, incident = rt_observer
+    session = use_session(
+        monkeypatch, FakeSession(FakeResponse(200), FakeResponse(201, {"id": "42"}))
+    )
+
+    send_rt_ticket(observer.pk, incident.pk, "Subject", "Content")
+    send_rt_ticket(observer.pk, incident.pk, "Subject", "Content")
+
+    assert [method for method, _url in session.requests] == ["GET", "POST", "POST"]
+    assert session.requests[2][1].endswith("/ticket/42/correspond")
+    assert RTTicket.objects.get(incident=incident, observer=observer).ticket_id == "42"
+    assert not OutgoingEmail.objects.exists()
+
+
+@pytest.mark.django_db
+def test_rt_queue_not_found(rt_observer, monkeypatch):
+    """
+    Test that the observer is notified by email when its RT queue is not valid
+    """
+    observer, incident = rt_observer
+    use_session(monkeypatch, FakeSession(FakeResponse(404)))
+
+    send_rt_ticket(observer.pk, incident.pk, "Subject", "Content")
+
+    assert "obsadm@cert1.lu" in OutgoingEmail.objects.get().recipients
+    assert not RTTicket.objects.exists()
+
+
+@pytest.mark.django_db
+def test_rt_not_available(rt_observer, monkeypatch):
+    """
+    Test that the observer is notified by email when RT is not available
+    after the retries
+    """
+    observer, incident = rt_observer
+    use_session(monkeypatch, FakeSession(requests.ConnectionError("refused")))
+
+    with pytest.raises(rt.RTDeliveryError):
+        rt.check_rt_config(observer)
+    # the error is not cached
+    assert rt.queue_checks.values == {}
+
+    monkeypatch.setattr(send_rt_ticket, "max_retries", 0)
+    send_rt_ticket(observer.pk, incident.pk, "Subject", "Content")
+
+    assert "obsadm@cert1.lu" in OutgoingEmail.objects.get().recipients
+
+
+@pytest.mark.django_db
+def test_rt_ticket_claimed(rt_observer, monkeypatch):
+    """
+    Test that the ticket of an incident is locked while it is created in RT
+    and that it is created once for an observer
+    """
+    observer, incident = rt_observer
+    session = use_session(
+        monkeypatch, FakeSession(FakeResponse(200), FakeResponse(201, {"id": "42"}))
+    )
+    # claimed by a task which could not reach RT
+    RTTicket.objects.create(incident=incident, observer=observer)
+
+    with CaptureQueriesContext(connection) as context:
+        send_rt_ticket(observer.pk, incident.pk, "Subject", "Content")
+
+    assert [method for method, _url in session.requests] == ["GET", "POST"]
+    assert session.requests[1][1].endswith("/REST/2.0/ticket")
+    assert RTTicket.objects.get(incident=incident, observer=observer).ticket_id == "42"
+    assert any(
+        "incidents_rtticket" in query["sql"] and "FOR UPDATE" in query["sql"]
+        for query in context.captured_queries
+    )
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        RTTicket.objects.create(incident=incident, observer=observer, ticket_id="43")
@@ -0,0 +1,45 @@
+import pytest
+
+from governanceplatform.models import Sector
+from incidents.filters import IncidentFilter
+from incidents.models import Incident
+
+
+def search(value):
+    return list(IncidentFilter({"search": value}, queryset=Incident.objects.all()).qs)
+
+
+@pytest.mark.django_db
+def test_search_document_substring(populate_incident_db):
+    """
+    Test the substring search on the incident reference and the related names
+    """
+    incident = next(
+        (
+            i
+            for i in populate_incident_db["incidents"]
+            if i.incident_id == "XXXX-SSS-SSS-0001-2005"
+        ),
+        None,
+    )
+    assert incident in search("sss-0001")
+    assert incident in search("XXXX-SSS")
+    assert incident in search(incident.company.name.upper()[2:8])
+    assert incident not in search("not an incident")
+
+
+@pytest.mark.django_db
+def test_search_document_updated_with_sectors(populate_incident_db):
+    """
+    Test that the search document follows the sectors of the incident
+    """
+    incident = populate_incident_db["incidents"][0]
+    sector = Sector.objects.filter(acronym="ELEC").first()
+    sector_name = sector.safe_translation_getter("name", any_language=True)
+    assert incident not in search(sector_name)
+
+    incident.affected_sectors.add(sector)
+    assert incident in search(sector_name)
+
+    incident.affected_sectors.remove(sector)
+    assert incident not in search(sector_name)
@@ -11,7 +11,8 @@ from governanceplatform.helpers import (
     can_edit_incident_report,
     user_in_group,
 )
-from governanceplatform.models import RegulatorUser
+from governanceplatform.identity import get_identity, set_identity
+from governanceplatform.models import RegulatorUser, User
 
 
 @pytest.mark.django_db
@@ -47,10 +48,14 @@ def test_incidents_admin_roles_addition_rights(otp_client, populate_incident_db)
         "predefinedanswer",
         "sectorregulationworkflowemail",
     ]
+    # the emails of the outbox are written by the platform, never added
+    added_by_nobody = ["outgoingemail"]
     authorized_users = [u for u in users if user_in_group(u, "RegulatorAdmin")]
     for u in list_admin_add_urls("incidents"):
-        if any(model in u for model in regulator_admin_rights):
-            url = "/" + u
+        url = "/" + u
+        if any(model in u for model in added_by_nobody):
+            test_get_with_otp(otp_client, users, [], [], url)
+        elif any(model in u for model in regulator_admin_rights):
             test_get_with_otp(otp_client, users, authorized_users, [], url)
 
 
@@ -251,6 +256,32 @@ def test_can_edit_incident_report_function(populate_incident_db):
                 assert can_edit_incident_report(u, incident_regulator, -1) is False
 
 
+@pytest.mark.django_db()
+def test_incident_helpers_outside_request(populate_incident_db):
+    """
+    Test the incident access helpers without identity context (scripts, tasks)
+    give the same results as in a request
+    """
+    helpers = [
+        can_access_incident,
+        can_create_incident_report,
+        can_edit_incident_report,
+    ]
+    for u in populate_incident_db["users"]:
+        company = u.companies.first()
+        company_id = company.id if company is not None else -1
+        user = User.objects.get(pk=u.pk)
+        request_user = User.objects.get(pk=u.pk)
+        set_identity(request_user)
+        assert get_identity(user) is None
+
+        for incident in populate_incident_db["incidents"]:
+            for helper in helpers:
+                assert helper(user, incident, company_id) == helper(
+                    request_user, incident, company_id
+                ), f"{helper.__name__} {user.email} {incident.incident_id}"
+
+
 @pytest.mark.django_db
 def test_access_to_incident_log(otp_client, populate_incident_db):
     """
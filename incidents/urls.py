@@ -21,13 +21,16 @@ from .views import (
     access_log,
     create_workflow,
     delete_incident,
+    download_incident_export,
     download_incident_pdf,
     download_incident_report_pdf,
     edit_incident,
     edit_workflow,
     export_incidents,
     get_form_list,
+    get_incident_exports,
     get_incidents,
+    incident_export_status,
     review_workflow,
 )
 
@@ -71,4 +74,15 @@ urlpatterns = [
         export_incidents,
         name="export_incidents",
     ),
+    path("exports", get_incident_exports, name="incident_exports"),
+    path(
+        "exports/<int:export_id>",
+        incident_export_status,
+        name="incident_export_status",
+    ),
+    path(
+        "exports/download/<str:token>",
+        download_incident_export,
+        name="download_incident_export",
+    ),
 ]
@@ -1,32 +1,31 @@
-import csv
 import logging
-import re
-from collections import OrderedDict
 from datetime import date
 from urllib.parse import urlencode, urlparse
 
 import pytz
 from django import forms
-from django.conf import settings
 from django.contrib import messages
-from django.contrib.admin.models import LogEntry
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import Group
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import CharField, F, OuterRef, Q, Subquery, Value
 from django.db.models.functions import Coalesce
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
-from django.utils import timezone, translation
+from django.utils import timezone
 from django.utils.translation import get_language
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_http_methods
 from django_countries import countries
 from django_otp.decorators import otp_required
 from formtools.wizard.views import SessionWizardView
-from openpyxl import Workbook
 
 from governanceplatform.helpers import (
     annotate_translated_field_from_related_models,
@@ -34,29 +33,44 @@ from governanceplatform.helpers import (
     can_create_incident_report,
     can_edit_incident_report,
     get_active_company_from_session,
+    get_sort_field_name,
+    get_user_observer,
+    get_user_regulator,
+    get_user_role,
     is_observer_user,
     is_user_operator,
     is_user_regulator,
-    render_to_string_multi_languages,
     sort_queryset_by_field,
-    translated_queryset,
     user_in_group,
 )
 from governanceplatform.models import (
     Regulation,
     Sector,
-    User,
 )
 from governanceplatform.settings import (
+    INCIDENT_EXPORT_ASYNC,
+    INCIDENTS_APPROXIMATE_COUNT,
+    INCIDENTS_PAGINATION_MODE,
     MAX_PRELIMINARY_NOTIFICATION_PER_DAY_PER_USER,
-    PARLER_DEFAULT_LANGUAGE_CODE,
     PUBLIC_URL,
     SITE_NAME,
     TIME_ZONE,
 )
 
 from .decorators import check_user_is_correct, regulator_role_required
-from .email import send_email, send_html_email
+from .email import send_email
+from .export import (
+    EXPORT_CONTENT_TYPES,
+    get_csv_response,
+    get_export_columns,
+    get_export_from_token,
+    get_export_incidents_queryset,
+    get_export_status,
+    get_export_storage,
+    get_xlsx_response,
+    iter_export_rows,
+    log_export,
+)
 from .filters import IncidentFilter
 from .forms import ContactForm, ExportIncidentsForm, IncidentStatusForm, get_forms_list
 from .globals import (
@@ -65,11 +79,12 @@ from .globals import (
     REPORT_STATUS_MAP,
     WORKFLOW_REVIEW_STATUS,
 )
-from .helpers import get_workflow_categories, is_deadline_exceeded
+from .helpers import get_incidents_report_statuses, get_workflow_categories
 from .models import (
     Answer,
     Impact,
     Incident,
+    IncidentExport,
     IncidentWorkflow,
     LogReportRead,
     PredefinedAnswer,
@@ -79,7 +94,9 @@ from .models import (
     SectorRegulationWorkflow,
     Workflow,
 )
+from .pagination import CursorPaginator
 from .pdf_generation import get_pdf_report
+from .scripts import incident_export
 
 logger = logging.getLogger(__name__)
 
@@ -126,7 +143,7 @@ def get_incidents(request):
         if request.path == reverse("regulator_incidents"):
             html_view = "operator/incidents.html"
             # Filter regulator incidents
-            incidents = incidents.filter(regulator=user.regulators.first())
+            incidents = incidents.filter(regulator=get_user_regulator(user))
             request.session["is_regulator_incidents"] = True
         elif user_in_group(user, "RegulatorUser"):
             # RegulatorUser has access to all incidents linked by sectors.
@@ -142,7 +159,7 @@ def get_incidents(request):
             )
     elif is_observer_user(user):
         html_view = "observer/incidents.html"
-        incidents = user.observers.first().get_incidents()
+        incidents = get_user_observer(user).get_incidents()
     elif is_user_operator(user):
         # OperatorAdmin/User can see all the reports of the selected company.
         incidents = incidents.filter(company__id=request.session.get("company_in_use"))
@@ -199,52 +216,61 @@ def get_incidents(request):
     )
 
     f = IncidentFilter(incidents_filter_params, queryset=incidents)
-    incident_list = f.qs.prefetch_related(
-        "sector_regulation__workflows__sectorregulationworkflow_set",
-        "incidentworkflow_set__workflow__sectorregulationworkflow_set",
+    # relations displayed for each incident of the page
+    incident_list = f.qs.select_related(
+        "company", "regulator", "sector_regulation__regulation"
+    ).prefetch_related(
+        "regulator__translations",
+        "sector_regulation__regulation__translations",
+        "affected_sectors__translations",
     )
 
     per_page = incidents_filter_params.get("per_page", 10)
-    page_number = incidents_filter_params.get("page")
-    paginator = Paginator(incident_list, per_page)
-    page_obj = paginator.get_page(page_number)
+    # the cursor pages are navigated with incidents/cursor_pagination.html
+    is_cursor_pagination = (
+        INCIDENTS_PAGINATION_MODE == "cursor" or "cursor" in incidents_filter_params
+    )
+    if is_cursor_pagination:
+        if sort_field in ALLOWED_SORT_FIELDS:
+            cursor_sort_field, cursor_sort_direction = sort_field, sort_direction
+        else:
+            cursor_sort_field, cursor_sort_direction = "last_update", "desc"
+        config_field = ALLOWED_SORT_FIELDS[cursor_sort_field]
+        paginator = CursorPaginator(
+            incident_list,
+            get_sort_field_name(config_field["field"]),
+            cursor_sort_direction,
+            per_page,
+            is_string=config_field["type"] == "string",
+            sort_key=f"{cursor_sort_field}:{cursor_sort_direction}",
+            approximate_count=INCIDENTS_APPROXIMATE_COUNT,
+        )
+        page_obj = paginator.get_page(incidents_filter_params.get("cursor"))
+    else:
+        page_number = incidents_filter_params.get("page")
+        paginator = Paginator(incident_list, per_page)
+        page_obj = paginator.get_page(page_number)
+
+    # the status of the reports is read from the summary table in one query
+    report_statuses = get_incidents_report_statuses(page_obj.object_list)
+    actual_time = timezone.now()
 
     for incident in page_obj.object_list:
         incident.all_reports = []
-        completed_workflows = incident.get_workflows_completed()
-        all_workflows = incident.get_all_workflows()
-        completed_workflow_ids = [wf.workflow.id for wf in completed_workflows]
-        all_workflow_ids = [wf.id for wf in all_workflows]
+        reports = report_statuses.get(incident.id, [])
+        completed_workflow_ids = [
+            report.workflow_id
+            for report in reports
+            if report.latest_incident_workflow_id is not None
+        ]
+        all_workflow_ids = [report.workflow_id for report in reports]
 
         incident.formsStatus = IncidentStatusForm(
             instance=incident,
         )
 
-        for idx, report in enumerate(all_workflows):
-            latest = incident.get_latest_incident_workflow_by_workflow(report)
-            latest_id = latest.id if latest else None
-            report_id = report.id
-            latest_incident_workflow = None
-
-            latest_incident_workflow = next(
-                (
-                    iw
-                    for iw in completed_workflows
-                    if iw.workflow.id == report.id
-                    and (latest_id is None or iw.id == latest_id)
-                ),
-                None,
-            )
-
-            status = (
-                latest_incident_workflow.review_status
-                if latest_incident_workflow
-                else is_deadline_exceeded(
-                    report,
-                    incident,
-                )
-            )
-
+        for idx, report in enumerate(reports):
+            status = report.get_status(actual_time)
             mapping = REPORT_STATUS_MAP.get(status, REPORT_STATUS_MAP["UNDE"])
 
             is_disabled = False
@@ -252,7 +278,7 @@ def get_incidents(request):
             if html_view == "operator/incidents.html":
                 if incident.incident_status == "CLOSE":
                     is_disabled = True
-                if not completed_workflows and idx != 0:
+                if not completed_workflow_ids and idx != 0:
                     is_disabled = True
                 elif (
                     idx < len(all_workflow_ids) - 1
@@ -274,9 +300,9 @@ def get_incidents(request):
 
             incident.all_reports.append(
                 {
-                    "id": report_id,
-                    "name": str(report),
-                    "latest_incident_workflow": latest_incident_workflow,
+                    "id": report.workflow_id,
+                    "name": str(report.workflow),
+                    "latest_incident_workflow": report.latest_incident_workflow,
                     "css_class": mapping["class"],
                     "tooltip": mapping["tooltip"],
                     "is_disabled": is_disabled,
@@ -286,7 +312,7 @@ def get_incidents(request):
     is_filtered = {
         k: v
         for k, v in incidents_filter_params.items()
-        if k not in ["page", "per_page", "sort_field", "sort_direction"]
+        if k not in ["page", "cursor", "per_page", "sort_field", "sort_direction"]
     }
 
     return render(
@@ -298,6 +324,7 @@ def get_incidents(request):
             "sort_field": sort_field,
             "sort_direction": sort_direction,
             "incidents": page_obj,
+            "is_cursor_pagination": is_cursor_pagination,
             "is_filtered": bool(is_filtered),
             "is_regulator_incidents": request.session.get(
                 "is_regulator_incidents", False
@@ -395,7 +422,7 @@ def review_workflow(request):
 
     is_regulator_incident = (
         True
-        if incident.regulator == user.regulators.first() and is_regulator_incidents
+        if incident.regulator == get_user_regulator(user) and is_regulator_incidents
         else False
     )
 
@@ -464,7 +491,7 @@ def edit_workflow(request):
     if incident_id and can_edit_incident_report(user, incident, company_id):
         is_regulator_incident = (
             True
-            if incident.regulator == user.regulators.first() and is_regulator_incidents
+            if incident.regulator == get_user_regulator(user) and is_regulator_incidents
             else False
         )
 
@@ -493,7 +520,7 @@ def edit_workflow(request):
     ):
         is_regulator_incident = (
             True
-            if incident_workflow.incident.regulator == user.regulators.first()
+            if incident_workflow.incident.regulator == get_user_regulator(user)
             and is_regulator_incidents
             else False
         )
@@ -579,7 +606,7 @@ def access_log(request, incident_id: int):
 
     is_regulator_incident = (
         True
-        if incident.regulator == user.regulators.first() and is_regulator_incidents
+        if incident.regulator == get_user_regulator(user) and is_regulator_incidents
         else False
     )
 
@@ -587,7 +614,7 @@ def access_log(request, incident_id: int):
     if is_user_operator(user) or user_in_group(user, "IncidentUser"):
         log = log.exclude(user__regulatoruser__isnull=False)
     if is_regulator_incident:
-        log = log.filter(user__regulatoruser__regulator=user.regulators.first())
+        log = log.filter(user__regulatoruser__regulator=get_user_regulator(user))
     context = {
         "log": log,
         "incident": incident,
@@ -743,7 +770,7 @@ def export_incidents(request):
     observer = None
 
     if user_in_group(user, "RegulatorAdmin"):
-        regulator = user.regulators.first()
+        regulator = get_user_regulator(user)
         if regulator:
             sectorregulations = regulator.sectorregulation_set.all()
             regulation_ids = sectorregulations.values_list(
@@ -757,7 +784,7 @@ def export_incidents(request):
             ).distinct()
 
     elif is_observer_user(user):
-        observer = user.observers.first()
+        observer = get_user_observer(user)
         if observer:
             observer_regulations = observer.observerregulation_set.values_list(
                 "regulation", flat=True
@@ -799,285 +826,80 @@ def export_incidents(request):
             workflow_qs=workflow_qs,
         )
         if form.is_valid():
-            incidents = Incident.objects.none()
             regulation = form.cleaned_data["regulation"]
             sectorregulation = form.cleaned_data["sectorregulation"]
             workflow = form.cleaned_data["workflow"]
             from_date = form.cleaned_data["from_date"]
             to_date = form.cleaned_data["to_date"]
             file_format = form.cleaned_data["file_format"]
-            are_incidents = False
-
-            if user_in_group(user, "RegulatorAdmin"):
-                incidents = (
-                    Incident.objects.filter(
-                        sector_regulation=sectorregulation,
-                        sector_regulation__regulation=regulation,
-                        sector_regulation__regulator__in=user.regulators.all(),
-                        incident_notification_date__date__gte=from_date,
-                        incident_notification_date__date__lte=to_date,
-                    )
-                    .prefetch_related(
-                        "affected_sectors",
-                        "incidentworkflow_set__answer_set__question_options__question",
-                        "incidentworkflow_set__answer_set__predefined_answers",
-                        "incidentworkflow_set__impacts__sectors",
-                    )
-                    .order_by("-incident_notification_date")
-                )
-
-                are_incidents = incidents.exists()
 
-            if is_observer_user(user):
-                all_incidents = (
-                    user.observers.first()
-                    .get_incidents()
-                    .order_by("-incident_notification_date")
-                )
-
-                incidents = [
-                    i
-                    for i in all_incidents
-                    if i.sector_regulation.regulation == regulation
-                    and i.sector_regulation == sectorregulation
-                    and from_date <= i.incident_notification_date.date() <= to_date
-                ]
-
-                are_incidents = bool(incidents)
+            incidents = get_export_incidents_queryset(
+                user, regulation, sectorregulation, workflow, from_date, to_date
+            )
+            count = incidents.count()
 
-            if not are_incidents:
+            if not count:
                 messages.error(request, _("No incidents available for export."))
                 rendered_messages = render_error_messages(request)
                 return JsonResponse({"messages": rendered_messages}, status=400)
 
-            data = []
+            lang = get_language() or "en"
 
-            for incident in incidents:
-                last_report = incident.get_latest_incident_workflow_by_workflow(
-                    workflow
+            if INCIDENT_EXPORT_ASYNC:
+                export = IncidentExport.objects.create(
+                    user=user,
+                    regulation=regulation,
+                    sector_regulation=sectorregulation,
+                    workflow=workflow,
+                    from_date=from_date,
+                    to_date=to_date,
+                    file_format=file_format,
+                    total_count=count,
                 )
-
-                if last_report is None:
-                    continue
-
-                incident_data = {
-                    "Name of operator": (
-                        incident.company.name
-                        if incident.company
-                        else incident.company_name
-                    ),
-                    "Reference": incident.incident_id,
-                    "Incident notification creation date": (
-                        incident.incident_notification_date.strftime(
-                            "%d-%m-%Y %H:%M:%S"
-                        )
-                        if incident.incident_notification_date
-                        else ""
-                    ),
-                    "Incident detection date": (
-                        last_report.report_timeline.incident_detection_date.strftime(
-                            "%d-%m-%Y %H:%M:%S"
-                        )
-                        if last_report.report_timeline
-                        and last_report.report_timeline.incident_detection_date
-                        else ""
-                    ),
-                    "Incident start date": (
-                        last_report.report_timeline.incident_starting_date.strftime(
-                            "%d-%m-%Y %H:%M:%S"
-                        )
-                        if last_report.report_timeline
-                        and last_report.report_timeline.incident_starting_date
-                        else ""
-                    ),
-                    "Incident resolution date": (
-                        last_report.report_timeline.incident_resolution_date.strftime(
-                            "%d-%m-%Y %H:%M:%S"
-                        )
-                        if last_report.report_timeline
-                        and last_report.report_timeline.incident_resolution_date
-                        else ""
-                    ),
-                    "Legal basis": str(incident.sector_regulation.regulation),
-                    "Significative impact": (
-                        "yes" if incident.is_significative_impact else "no"
-                    ),
-                    "Incident Status": incident.get_incident_status_display(),
-                    "Incident notification manager": ", ".join(
-                        [
-                            f"{incident.contact_firstname} {incident.contact_lastname}",
-                            incident.contact_email,
-                            incident.contact_telephone,
-                        ]
-                    ),
-                    "Incident technical contact": ", ".join(
-                        [
-                            f"{incident.technical_firstname} {incident.technical_lastname}",
-                            incident.technical_email,
-                            incident.technical_telephone,
-                        ]
-                    ),
-                    "Report": (
-                        str(last_report.workflow) if last_report.workflow else ""
-                    ),
-                    "Report status": (
-                        last_report.get_review_status_display()
-                        if last_report.review_status
-                        else ""
+                transaction.on_commit(lambda: start_incident_export(export.pk, lang))
+                messages.success(
+                    request,
+                    _(
+                        "The export has been queued, the file will be available "
+                        "for download when it is ready."
                     ),
-                    "Report creation date": (
-                        last_report.timestamp.strftime("%d-%m-%Y %H:%M:%S")
-                        if last_report.timestamp
-                        else ""
-                    ),
-                }
-
-                length_fixed_values = len(incident_data)
-
-                for idx, sector in enumerate(incident.affected_sectors.all(), start=1):
-                    incident_data[f"Impacted sectors {idx}"] = str(sector).replace(
-                        " → ", " -> "
-                    )
-
-                for answer in last_report.answer_set.all():
-                    question = answer.question_options.question
-                    str_answer = str(answer).replace(";", ",")
-                    if answer.predefined_answers.exists():
-                        for idx, pa in enumerate(
-                            answer.predefined_answers.all(), start=1
-                        ):
-                            pa_answer = str(pa).replace(";", ",")
-                            if question.question_type == "SO":
-                                incident_data[f"{question}"] = pa_answer
-                            elif question.question_type == "ST":
-                                if str_answer != "":
-                                    incident_data[f"{question}"] = (
-                                        f"{pa_answer} Details: {str_answer}"
-                                    )
-                                else:
-                                    incident_data[f"{question}"] = pa_answer
-                            else:
-                                incident_data[f"{question} {idx}"] = pa_answer
-                    elif (
-                        question.question_type == "CL" or question.question_type == "RL"
-                    ):
-                        for idx, item in enumerate(str_answer.split(","), start=1):
-                            incident_data[f"{question} {idx}"] = item.strip()
-                    else:
-                        incident_data[f"{question}"] = str_answer
-
-                lang = get_language() or "en"
-
-                impacts = translated_queryset(
-                    last_report.impacts,
-                    lang,
-                    PARLER_DEFAULT_LANGUAGE_CODE,
-                    ["label"],
-                    True,
-                ).order_by("_label_sort")
-
-                for idx, impact in enumerate(impacts, start=1):
-                    for sector in impact.sectors.all():
-                        incident_data[
-                            f"{sector.get_safe_translation()} Impact {idx}"
-                        ] = impact.label
-
-                data.append(incident_data)
-
-            if not data:
-                messages.error(request, _("No incidents available for export."))
+                )
                 rendered_messages = render_error_messages(request)
-                return JsonResponse({"messages": rendered_messages}, status=400)
-
-            keys = []
-            for entry in data:
-                for k in entry.keys():
-                    if k not in keys:
-                        keys.append(k)
-
-            keys = group_keys_by_index(keys, length_fixed_values)
-
-            if file_format == "xlsx":
-                wb = Workbook()
-                ws = wb.active
-                ws.title = "Incidents"
-
-                headers = keys
-                ws.append(headers)
-                for entry in data:
-                    row = [entry.get(key, "") for key in headers]
-                    ws.append(row)
-
-                for column_cells in ws.columns:
-                    length = max(
-                        len(str(cell.value)) if cell.value else 0
-                        for cell in column_cells
-                    )
-                    ws.column_dimensions[column_cells[0].column_letter].width = min(
-                        length + 2, 60
-                    )
-
-                response = HttpResponse(
-                    content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                return JsonResponse(
+                    {
+                        "messages": rendered_messages,
+                        "export": get_export_status(export),
+                        "status_url": reverse(
+                            "incident_export_status", args=[export.pk]
+                        ),
+                    },
+                    status=202,
                 )
-                response["Content-Disposition"] = 'attachment; filename="export.xlsx"'
-                wb.save(response)
 
-            else:
-                response = HttpResponse(content_type="text/csv")
-                response["Content-Disposition"] = 'attachment; filename="export.csv"'
-
-                writer = csv.DictWriter(
-                    response,
-                    fieldnames=keys,
-                    extrasaction="ignore",
-                    quoting=csv.QUOTE_ALL,
-                )
-                writer.writeheader()
-                for entry in data:
-                    row = {key: entry.get(key, "") for key in keys}
-                    writer.writerow(row)
-
-            LogEntry.objects.log_actions(
-                user_id=user.id,
-                queryset=incidents,
-                action_flag=7,
-                change_message=_(
-                    "A total of {count} incidents were exported from regulation "
-                    "{regulation} [{sectorregulation} - ({workflow})] within date range ({from_date} - {to_date}.)"
-                ).format(
-                    count=len(data),
-                    regulation=regulation,
-                    sectorregulation=sectorregulation,
-                    workflow=workflow,
-                    from_date=from_date,
-                    to_date=to_date,
-                ),
+            columns = get_export_columns(incidents, workflow, regulation)
+            rows = iter_export_rows(
+                incidents.order_by("-incident_notification_date"),
+                workflow,
+                columns,
+                lang,
             )
 
-            try:
-                platformAdmin_group = Group.objects.get(name="PlatformAdmin")
-            except Group.DoesNotExist:
-                platformAdmin_group = None
-
-            if platformAdmin_group:
-                email_list = User.objects.filter(
-                    groups=platformAdmin_group
-                ).values_list("email", flat=True)
-                html_message = render_to_string_multi_languages(
-                    "emails/incident_mass_export.html",
-                    {"regulation": str(regulation), "site_name": SITE_NAME},
-                )
-                with translation.override(settings.LANGUAGE_CODE):
-                    subject = _("[{site}] New incident mass export").format(
-                        site=SITE_NAME
-                    )
+            if file_format == "xlsx":
+                response = get_xlsx_response(rows, columns)
+            else:
+                # the rows are written while the response is sent
+                response = get_csv_response(rows, columns)
 
-                send_html_email(
-                    subject,
-                    html_message,
-                    email_list,
-                )
+            log_export(
+                user,
+                incidents,
+                count,
+                regulation,
+                sectorregulation,
+                workflow,
+                from_date,
+                to_date,
+            )
 
             return response
 
@@ -1090,28 +912,41 @@ def export_incidents(request):
         return render(request, "modals/export_incidents.html", {"form": form})
 
 
-def group_keys_by_index(keys, length_fixed_values):
-    fixed_keys = keys[:length_fixed_values]
-    dynamic_keys = keys[length_fixed_values:]
-    groups = OrderedDict()
-    for key in dynamic_keys:
-        match = re.match(r"^(.*\D)\s*:?\s*(\d+)$", key)
-        if match:
-            prefix = match.group(1).strip()
-            index = int(match.group(2))
-            if prefix not in groups:
-                groups[prefix] = []
-            groups[prefix].append((index, key))
-        else:
-            if key not in groups:
-                groups[key] = []
-            groups[key].append((0, key))
+@login_required
+@otp_required
+@check_user_is_correct
+def get_incident_exports(request):
+    """Returns the status of the mass exports of the user."""
+    exports = IncidentExport.objects.filter(user=request.user).order_by("-created_at")
+    return JsonResponse({"exports": [get_export_status(export) for export in exports]})
 
-    grouped_keys = []
-    for _prefix, items in groups.items():
-        items.sort(key=lambda x: x[0])
-        grouped_keys.extend([key for _, key in items])
-    return fixed_keys + grouped_keys
+
+@login_required
+@otp_required
+@check_user_is_correct
+def incident_export_status(request, export_id):
+    """Returns the status of a mass export of the user."""
+    export = get_object_or_404(IncidentExport, pk=export_id, user=request.user)
+    return JsonResponse(get_export_status(export))
+
+
+@login_required
+@otp_required
+@check_user_is_correct
+def download_incident_export(request, token):
+    export = get_export_from_token(token, request.user)
+    storage = get_export_storage()
+
+    if export is None or not storage.exists(export.file_name):
+        messages.error(request, _("The download link is not valid or has expired."))
+        return redirect("incidents")
+
+    return FileResponse(
+        storage.open(export.file_name, "rb"),
+        as_attachment=True,
+        filename=f"export.{export.file_format}",
+        content_type=EXPORT_CONTENT_TYPES[export.file_format],
+    )
 
 
 def is_incidents_report_limit_reached(request):
@@ -1241,7 +1076,7 @@ class FormWizardView(SessionWizardView):
             if not is_user_regulator(user)
             else None
         )
-        regulator = user.regulators.first() if is_user_regulator(user) else None
+        regulator = get_user_regulator(user) if is_user_regulator(user) else None
         sectors_id = extract_ids(data.get("sectors", []))
         regulators_id = extract_ids(data.get("regulators", []))
         regulations_id = extract_ids(data.get("regulations", []))
@@ -1434,7 +1269,7 @@ class WorkflowWizardView(SessionWizardView):
             self.workflow = self.incident_workflow.workflow
             self.is_regulator_incident = (
                 True
-                if self.incident.regulator == user.regulators.first()
+                if self.incident.regulator == get_user_regulator(user)
                 and is_regulator_incidents
                 else False
             )
@@ -1500,7 +1335,7 @@ class WorkflowWizardView(SessionWizardView):
             self.incident = Incident.objects.get(pk=self.request.incident)
             self.is_regulator_incident = (
                 True
-                if self.incident.regulator == user.regulators.first()
+                if self.incident.regulator == get_user_regulator(user)
                 and is_regulator_incidents
                 else False
             )
@@ -1853,17 +1688,17 @@ def convert_to_utc(date, local_tz):
 
 
 def create_entry_log(user, incident, incident_report, action, request=None):
-    role = user.groups.first().name if user.groups.exists() else ""
+    role = get_user_role(user)
     entity_name = ""
 
     if is_user_operator(user) and request:
         active_company = get_active_company_from_session(request)
         entity_name = active_company.name if active_company else ""
     elif is_user_regulator(user):
-        regulator = user.regulators.first()
+        regulator = get_user_regulator(user)
         entity_name = regulator.name if regulator else ""
     elif is_observer_user(user):
-        observer = user.observers.first()
+        observer = get_user_observer(user)
         entity_name = observer.name if observer else ""
 
     log = LogReportRead.objects.create(
@@ -1878,8 +1713,8 @@ def create_entry_log(user, incident, incident_report, action, request=None):
 
 
 def can_export_incidents(user):
-    regulator = user.regulators.first()
-    observer = user.observers.first()
+    regulator = get_user_regulator(user)
+    observer = get_user_observer(user)
     return (
         regulator
         and user.regulatoruser_set.filter(
@@ -1895,6 +1730,17 @@ def can_export_incidents(user):
     )
 
 
+def start_incident_export(export_id, lang):
+    try:
+        incident_export.run.delay(export_id, lang)
+    except Exception as e:
+        # the export is not left pending, the user can request it again
+        logger.exception("Failed to start the incident export job")
+        IncidentExport.objects.filter(pk=export_id, status="PENDING").update(
+            status="FAILED", error=str(e), finished_at=timezone.now()
+        )
+
+
 def render_error_messages(request):
     return render_to_string(
         "django_bootstrap5/messages.html",